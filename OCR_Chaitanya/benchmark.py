@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_FILE = os.path.join(SCRIPT_DIR, 'benchmark_golden.json')
+REPORT_FILE = os.path.join(SCRIPT_DIR, 'benchmark_report.json')
+
+# Fields scored against the golden labels; a null label is not scored
+SCORED_FIELDS = ['course_code', 'exam_type', 'semester_type', 'acad_year']
+
+
+def summarize(samples):
+    """Summary statistics of stage durations in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        'n': len(ordered),
+        'mean_ms': round(statistics.mean(ordered), 4),
+        'median_ms': round(statistics.median(ordered), 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'max_ms': round(ordered[-1], 4)
+    }
+
+
+def timed(samples, stage, func, *args):
+    """Call func, appending its duration in ms to samples[stage]"""
+    start = time.perf_counter()
+    result = func(*args)
+    samples.setdefault(stage, []).append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL).stdout.decode().strip() or None
+    except OSError:
+        return None
+
+
+def load_text(entry, config, samples, use_ocr, profile='none', adaptive=None):
+    """First-page text for a golden entry: live rasterise + OCR, or the stored raw OCR text
+
+    With an ``AdaptiveOCR``, the 'ocr' stage includes re-reading the low-confidence lines.
+    """
+    pdf_path = os.path.join(SCRIPT_DIR, entry['pdf']) if entry.get('pdf') else None
+    if use_ocr and pdf_path and os.path.exists(pdf_path):
+        from exam_ocr.engine import ocr_page_image
+        from exam_ocr.poppler import rasterise_page
+        from exam_ocr.preprocess import preprocess, profile_dpi
+        dpi = profile_dpi(profile, config.DETECT_DPI)
+        image = timed(samples, 'rasterise', lambda: rasterise_page(
+            pdf_path, 1, dpi=dpi, poppler_path=config.POPPLER_PATH))
+        image = timed(samples, 'preprocess', preprocess, image, profile)
+        text = timed(samples, 'ocr', ocr_page_image, image, pdf_path, 1, config.POPPLER_PATH, dpi, profile, adaptive)
+        return text, 'ocr'
+    with open(os.path.join(SCRIPT_DIR, entry['ocr_text']), 'r', encoding='utf-8') as f:
+        return f.read(), 'stored'
+
+
+def run_benchmark(golden, repeat, use_ocr, profile='none', adaptive=False):
+    # Imported here so --help works without the OCR dependencies
+    from exam_ocr import extract, ocr_backend
+    from exam_ocr.adaptive import AdaptiveOCR
+    from exam_ocr.catalogue import CourseCatalogue
+    from exam_ocr.config import Config
+    from exam_ocr.preprocess import profile_dpi
+
+    config = Config(SCRIPT_DIR)
+    ocr_backend.configure(config.OCR_BACKEND, config.TESSERACT_PATH)
+    catalogue = CourseCatalogue(config.COURSE_CATALOGUE_FILE)
+    adaptive_ocr = AdaptiveOCR(config.ADAPTIVE_DPI, config.ADAPTIVE_MIN_CONFIDENCE,
+                               config.ADAPTIVE_MAX_REGIONS) if adaptive else None
+
+    samples = {}
+    documents = []
+    scores = {field: {'correct': 0, 'total': 0} for field in SCORED_FIELDS}
+
+    for entry in golden:
+        text, source = load_text(entry, config, samples, use_ocr, profile, adaptive_ocr)
+
+        # The extractor is fast, so time it over several repetitions
+        for _ in range(repeat):
+            fields = timed(samples, 'extract', extract.extract_fields, text, catalogue)
+
+        detected = {field: fields[field]['value'] for field in SCORED_FIELDS}
+        confidence = {field: fields[field]['confidence'] for field in SCORED_FIELDS}
+        mismatches = {}
+        for field in SCORED_FIELDS:
+            expected = entry['expected'].get(field)
+            if expected is None:
+                continue
+            scores[field]['total'] += 1
+            if detected[field] == expected:
+                scores[field]['correct'] += 1
+            else:
+                mismatches[field] = {'expected': expected, 'detected': detected[field]}
+        documents.append({'name': entry['name'], 'text_source': source, 'detected': detected,
+                          'confidence': confidence, 'mismatches': mismatches})
+
+    # Metadata write into a scratch store so the real one is untouched
+    from exam_ocr.metadata_store import SQLiteMetadataStore
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteMetadataStore(os.path.join(tmp, 'metadata.db'))
+        for i in range(repeat * len(golden)):
+            entry = {'course_code': 'CSC208', 'exam_type': 'Mid_Semester', 'semester_type': 'Winter',
+                     'academic_year': '2023-24', 'pdf_file': f'bench_{i}.pdf', 'ocr_file': f'bench_{i}_ocr.txt',
+                     'processed_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            timed(samples, 'metadata_write', store.add, entry)
+
+    total_correct = sum(score['correct'] for score in scores.values())
+    total_scored = sum(score['total'] for score in scores.values())
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'config': {'repeat': repeat, 'ocr': use_ocr, 'profile': profile, 'adaptive': adaptive,
+                   'detect_dpi': profile_dpi(profile, config.DETECT_DPI), 'documents': len(golden)},
+        'stages': {stage: summarize(values) for stage, values in samples.items()},
+        'accuracy': {
+            **{field: {**score, 'accuracy': round(score['correct'] / score['total'], 4) if score['total'] else None}
+               for field, score in scores.items()},
+            'overall': round(total_correct / total_scored, 4) if total_scored else None
+        },
+        'documents': documents
+    }
+
+
+def compare(report, baseline):
+    """Print per-stage median and accuracy changes against a previous report"""
+    print(f"\n===== Compared with {baseline.get('git_commit') or 'baseline'} =====")
+    for stage, stats in report['stages'].items():
+        old = baseline.get('stages', {}).get(stage)
+        if old and old['median_ms']:
+            change = (stats['median_ms'] - old['median_ms']) / old['median_ms'] * 100
+            print(f"{stage:22s} {old['median_ms']:10.4f} -> {stats['median_ms']:10.4f} ms ({change:+.1f}%)")
+    old_accuracy = baseline.get('accuracy', {}).get('overall')
+    print(f"{'accuracy':22s} {old_accuracy} -> {report['accuracy']['overall']}")
+
+
+def print_report(report):
+    for stage, stats in report['stages'].items():
+        print(f"{stage:22s} median {stats['median_ms']:10.4f} ms   p95 {stats['p95_ms']:10.4f} ms   (n={stats['n']})")
+    print()
+    for field in SCORED_FIELDS:
+        score = report['accuracy'][field]
+        print(f"{field:22s} {score['correct']}/{score['total']}")
+    print(f"{'overall accuracy':22s} {report['accuracy']['overall']}")
+    for document in report['documents']:
+        for field, mismatch in document['mismatches'].items():
+            print(f"  ✗ {document['name']}: {field} expected {mismatch['expected']!r}, got {mismatch['detected']!r}")
+
+
+def compare_profiles(reports):
+    """Print rasterise/preprocess/OCR medians and accuracy side by side for each profile"""
+    print("\n===== Preprocessing profiles =====")
+    print(f"{'profile':10s} {'dpi':>5s} {'rasterise':>12s} {'preprocess':>12s} {'ocr':>12s} {'accuracy':>9s}")
+    for profile, report in reports.items():
+        medians = [report['stages'].get(stage, {}).get('median_ms') for stage in ('rasterise', 'preprocess', 'ocr')]
+        columns = ' '.join(f"{m:9.1f} ms" if m is not None else f"{'-':>12s}" for m in medians)
+        print(f"{profile:10s} {report['config']['detect_dpi']:5d} {columns} {report['accuracy']['overall']!s:>9s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the OCR metadata pipeline against the golden set')
+    parser.add_argument('--golden', default=GOLDEN_FILE, help='Golden set JSON file')
+    parser.add_argument('--output', default=REPORT_FILE, help='Where to write the JSON report')
+    parser.add_argument('--repeat', type=int, default=50, help='Repetitions for the parsing stages')
+    parser.add_argument('--ocr', action='store_true',
+                        help='Rasterise and OCR the sample PDFs (needs Poppler and Tesseract) '
+                             'instead of using the stored raw OCR text')
+    parser.add_argument('--profile', default='none',
+                        help='Comma-separated preprocessing profiles to OCR with, e.g. none,binary,deskew '
+                             '(needs --ocr); each profile is run and compared')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Re-read low-confidence lines at ADAPTIVE_DPI (needs --ocr), see exam_ocr/adaptive.py')
+    parser.add_argument('--compare', help='Previous report to compare against')
+    args = parser.parse_args()
+
+    profiles = [profile.strip() for profile in args.profile.split(',') if profile.strip()]
+    if profiles != ['none'] and not args.ocr:
+        parser.error('--profile only affects live OCR, add --ocr')
+    if args.adaptive and not args.ocr:
+        parser.error('--adaptive only affects live OCR, add --ocr')
+    from exam_ocr.preprocess import PROFILES
+    unknown = [profile for profile in profiles if profile not in PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s) {', '.join(unknown)} (choose from {', '.join(PROFILES)})")
+
+    with open(args.golden, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+
+    reports = {}
+    for profile in profiles:
+        reports[profile] = run_benchmark(golden, args.repeat, args.ocr, profile, args.adaptive)
+        print(f"===== OCR Metadata Pipeline Benchmark (profile: {profile}) =====")
+        print_report(reports[profile])
+        print()
+
+    if len(reports) > 1:
+        compare_profiles(reports)
+        report = {'generated_at': datetime.now().isoformat(timespec='seconds'),
+                  'git_commit': git_commit(), 'profiles': reports}
+    else:
+        report = reports[profiles[0]]
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for profile, profile_report in reports.items():
+            compare(profile_report, baseline.get('profiles', {}).get(profile, baseline))
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,7 @@
+"""Exam paper OCR.
+
+- ``exam_ocr.extract``: details (course code, exam type, ...) from page text, no Flask or OCR needed
+- ``exam_ocr.service.OCRService``: the OCR pipeline and its stores
+- ``exam_ocr.web.create_app``: the HTTP API around a service
+- ``python -m exam_ocr``: command line (serve, worker, detect, reindex, extract)
+"""
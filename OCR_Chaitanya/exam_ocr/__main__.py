@@ -0,0 +1,5 @@
+import sys
+
+from exam_ocr.cli import main
+
+sys.exit(main())
@@ -0,0 +1,116 @@
+from exam_ocr import ocr_backend
+
+# Tesseract page segmentation modes tried on a re-rendered line: a single
+# text line, then a uniform block (for lines Tesseract split or merged)
+RETRY_PSMS = (7, 6)
+
+# Padding around a line's box before it is cropped, as a share of the line height
+LINE_PADDING = 0.35
+
+
+def group_lines(words):
+    """Words of ``ocr_backend.image_to_data`` as ``[(line_key, [(text, confidence, box)])]`` in reading order"""
+    lines = {}
+    for key, text, confidence, box in words:
+        if text.strip():
+            lines.setdefault(key, []).append((text.strip(), confidence, box))
+    return list(lines.items())
+
+
+def lines_to_text(lines):
+    """Rebuild page text like Tesseract's plain output: lines, with a blank line between paragraphs"""
+    parts = []
+    previous = None
+    for key, text in lines:
+        if previous is not None:
+            parts.append('\n\n' if key[:2] != previous[:2] else '\n')
+        parts.append(text)
+        previous = key
+    return ''.join(parts) + '\n' if parts else ''
+
+
+def mean_confidence(words):
+    scores = [confidence for _, confidence, _ in words if confidence >= 0]
+    return sum(scores) / len(scores) if scores else 0.0
+
+
+def line_box(words, width, height):
+    """Union of a line's word boxes, padded and clipped to the image"""
+    left = min(box[0] for _, _, box in words)
+    top = min(box[1] for _, _, box in words)
+    right = max(box[2] for _, _, box in words)
+    bottom = max(box[3] for _, _, box in words)
+    pad = max(2, int((bottom - top) * LINE_PADDING))
+    return max(0, left - pad), max(0, top - pad), min(width, right + pad), min(height, bottom + pad)
+
+
+class AdaptiveOCR:
+    """OCR a page once, then re-OCR only the lines Tesseract was unsure of.
+
+    The page is read with word confidences. Lines holding a word below
+    ``min_confidence`` (at most ``max_regions`` of them, least confident
+    first) are cropped from a sharper rendering of the page and OCR'd again
+    as a single line and as a block of text (``RETRY_PSMS``). A line's text
+    is replaced when an attempt reads it with a higher mean confidence, so
+    merging never makes a line worse by Tesseract's own measure. Pages
+    without doubtful lines cost no more than plain OCR.
+
+    Instances are plain settings and can be sent to worker processes.
+    """
+
+    def __init__(self, dpi=300, min_confidence=60, max_regions=8, psms=RETRY_PSMS):
+        self.dpi = dpi
+        self.min_confidence = min_confidence
+        self.max_regions = max_regions
+        self.psms = tuple(psms)
+
+    def low_confidence_lines(self, lines):
+        """Indexes into ``lines`` worth another attempt, least confident first"""
+        ranked = sorted((min(confidence for _, confidence, _ in words), index)
+                        for index, (_, words) in enumerate(lines))
+        return [index for confidence, index in ranked if confidence < self.min_confidence][:self.max_regions]
+
+    def reread(self, crop):
+        """Best attempt at a cropped line as ``(text, mean confidence)``, or None if nothing was read
+
+        The segmentation modes are tried in order until one reads the line confidently.
+        """
+        best = None
+        for psm in self.psms:
+            words = [word for _, words in group_lines(ocr_backend.image_to_data(crop, psm=psm)) for word in words]
+            if words:
+                attempt = (' '.join(text for text, _, _ in words), mean_confidence(words))
+                if best is None or attempt[1] > best[1]:
+                    best = attempt
+                if best[1] >= self.min_confidence:
+                    break
+        return best
+
+    def ocr(self, image, render=None):
+        """Text of a preprocessed page image (or its top band), with doubtful lines re-read.
+
+        ``render()`` returns the same page preprocessed at ``self.dpi``; it
+        is only called when a line needs another attempt and its image is
+        closed afterwards. Without it, lines are re-read from ``image``
+        with the other segmentation modes only.
+        """
+        lines = group_lines(ocr_backend.image_to_data(image))
+        texts = [(key, ' '.join(text for text, _, _ in words)) for key, words in lines]
+        retry = self.low_confidence_lines(lines)
+        if not retry:
+            return lines_to_text(texts)
+
+        sharp = render() if render is not None else image
+        try:
+            scale = sharp.width / image.width
+            for index in retry:
+                key, words = lines[index]
+                left, top, right, bottom = line_box(words, image.width, image.height)
+                crop = sharp.crop((int(left * scale), int(top * scale), int(right * scale), int(bottom * scale)))
+                attempt = self.reread(crop)
+                if attempt is not None and attempt[1] > mean_confidence(words):
+                    texts[index] = (key, attempt[0])
+        finally:
+            if sharp is not image:
+                sharp.close()
+        return lines_to_text(texts)
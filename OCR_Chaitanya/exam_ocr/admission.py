@@ -0,0 +1,135 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Smoothing factor of the moving average of slot hold times
+SERVICE_TIME_ALPHA = 0.2
+
+
+class Saturated(Exception):
+    """Raised when a request cannot be admitted; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Caps how many requests run OCR at once.
+
+    Up to ``max_active`` requests hold a slot. Up to ``max_waiting`` more
+    wait for one for at most ``wait_timeout`` seconds and then get a 503.
+    Anything beyond that is turned away straight away with a 429.
+    Retry-After is estimated from the moving average of how long slots
+    are held, so clients back off for about as long as the backlog takes
+    to drain.
+    """
+
+    def __init__(self, max_active=2, max_waiting=8, wait_timeout=30.0):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.avg_seconds = None
+        self._cond = threading.Condition()
+
+    def retry_after(self):
+        """Seconds a turned-away client should wait before trying again"""
+        average = self.avg_seconds or 1.0
+        return max(1, math.ceil(average * (self.waiting + 1) / self.max_active))
+
+    def acquire(self):
+        """Take a slot, waiting if needed; returns the time it was taken (for ``release``)"""
+        with self._cond:
+            if self.active >= self.max_active:
+                if self.waiting >= self.max_waiting:
+                    self.rejected += 1
+                    raise Saturated("OCR service is busy, too many requests waiting", 429, self.retry_after())
+                self.waiting += 1
+                deadline = time.monotonic() + self.wait_timeout
+                try:
+                    while self.active >= self.max_active:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.rejected += 1
+                            raise Saturated("OCR service is busy, timed out waiting for a slot", 503,
+                                            self.retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+        return time.monotonic()
+
+    def release(self, started):
+        held = time.monotonic() - started
+        with self._cond:
+            self.active -= 1
+            if self.avg_seconds is None:
+                self.avg_seconds = held
+            else:
+                self.avg_seconds += SERVICE_TIME_ALPHA * (held - self.avg_seconds)
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        started = self.acquire()
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def load(self):
+        """Current load for /health"""
+        with self._cond:
+            if self.waiting >= self.max_waiting:
+                status = 'saturated'
+            elif self.active >= self.max_active:
+                status = 'busy'
+            else:
+                status = 'ok'
+            return {
+                'status': status,
+                'active': self.active,
+                'waiting': self.waiting,
+                'max_active': self.max_active,
+                'max_waiting': self.max_waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_seconds': round(self.avg_seconds, 3) if self.avg_seconds is not None else None,
+                'retry_after': self.retry_after()
+            }
+
+
+def init_app(app, controller, extra=None):
+    """Install the /health endpoint and turn ``Saturated`` into 429/503 responses.
+
+    ``extra()`` may return more fields for /health (e.g. the job queue depth).
+    /health answers 503 while the waiting room is full, so a load balancer
+    or the Node backend can route around a saturated instance.
+    """
+    from flask import jsonify
+
+    @app.errorhandler(Saturated)
+    def saturated(error):
+        response = jsonify({'success': False, 'error': str(error), 'retry_after': error.retry_after})
+        response.status_code = error.status
+        response.headers['Retry-After'] = str(error.retry_after)
+        return response
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        load = controller.load()
+        body = {'status': load['status'], 'ocr': load}
+        if extra is not None:
+            body.update(extra())
+        response = jsonify(body)
+        if load['status'] == 'saturated':
+            response.status_code = 503
+            response.headers['Retry-After'] = str(load['retry_after'])
+        return response
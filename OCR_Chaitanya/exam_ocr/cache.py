@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of an uploaded document"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file on disk"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def page_key(page_number):
+    """Cache key for the OCR text of a single page (1-based)"""
+    return f"page:{page_number}"
+
+
+def header_key(page_number=1):
+    """Cache key for the OCR text of only the header band of a page"""
+    return f"header:{page_number}"
+
+
+def details_key(version=''):
+    """Cache key for detected details; ``version`` ties them to the course catalogue"""
+    return f"details:{version}" if version else 'details'
+
+
+class OCRCache:
+    """Persistent OCR result cache keyed by document hash and entry key.
+
+    Entries live in a small SQLite database so they survive restarts. The
+    total size of the stored values is bounded by ``max_bytes``; once it is
+    exceeded the least recently used entries are evicted. The running total
+    is kept in a one-row ``ocr_cache_meta`` table, updated in the same
+    transaction as every insert, replace and delete, so a put never scans
+    the cache and processes sharing it (the web app and job workers) evict
+    against the same total.
+
+    A request probes several entries (header, page, details), so ``get``
+    does not count hits and misses; callers ``record`` one lookup per
+    document request.
+    """
+
+    def __init__(self, db_path, max_bytes=256 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                doc_hash TEXT NOT NULL,
+                entry_key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (doc_hash, entry_key)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used ON ocr_cache (last_used)"
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache_meta (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_bytes INTEGER NOT NULL
+            )
+        """)
+        # Caches from before the running total start from one full count
+        self._conn.execute(
+            "INSERT OR IGNORE INTO ocr_cache_meta (id, total_bytes) SELECT 0, COALESCE(SUM(size), 0) FROM ocr_cache"
+        )
+        self._conn.commit()
+
+    def record(self, hit):
+        """Count one document request as answered from the cache or not"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _total_bytes(self):
+        return self._conn.execute("SELECT total_bytes FROM ocr_cache_meta WHERE id = 0").fetchone()[0]
+
+    def _add_bytes(self, delta):
+        self._conn.execute("UPDATE ocr_cache_meta SET total_bytes = total_bytes + ? WHERE id = 0", (delta,))
+
+    def get(self, doc_hash, entry_key):
+        """Return the cached value or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM ocr_cache WHERE doc_hash = ? AND entry_key = ?",
+                (doc_hash, entry_key)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE ocr_cache SET last_used = ? WHERE doc_hash = ? AND entry_key = ?",
+                (time.time(), doc_hash, entry_key)
+            )
+            self._conn.commit()
+            return json.loads(row[0])
+
+    def put(self, doc_hash, entry_key, value):
+        """Store a JSON-serialisable value and evict old entries if needed"""
+        payload = json.dumps(value)
+        size = len(payload.encode('utf-8'))
+        with self._lock:
+            # Take the write lock first so the replaced entry's size cannot change under us
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT size FROM ocr_cache WHERE doc_hash = ? AND entry_key = ?",
+                    (doc_hash, entry_key)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (doc_hash, entry_key, value, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (doc_hash, entry_key, payload, size, time.time())
+                )
+                self._add_bytes(size - (row[0] if row else 0))
+                self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _evict(self):
+        """Drop least recently used entries until the size budget is met (inside the write transaction)"""
+        total = self._total_bytes()
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT doc_hash, entry_key, size FROM ocr_cache ORDER BY last_used LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for doc_hash, entry_key, size in rows:
+                self._conn.execute(
+                    "DELETE FROM ocr_cache WHERE doc_hash = ? AND entry_key = ?",
+                    (doc_hash, entry_key)
+                )
+                self._add_bytes(-size)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def stats(self):
+        """Return hit/miss counters and current cache size"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'entries': entries,
+                'bytes': self._total_bytes(),
+                'max_bytes': self.max_bytes
+            }
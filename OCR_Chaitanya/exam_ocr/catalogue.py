@@ -0,0 +1,155 @@
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from exam_ocr.course_codes import CourseCodeMatcher
+
+logger = logging.getLogger(__name__)
+
+# The bundled catalogue, next to the exam_ocr package
+DEFAULT_CATALOGUE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'course_codes.csv')
+
+
+def read_catalogue_file(path):
+    """Read course entries ({'code', 'title', 'department'}) from a CSV or JSON file"""
+    if path.lower().endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            # {"CSC208": "Theory of Computation", ...}
+            data = [{'code': code, 'title': title} for code, title in data.items()]
+        entries = data
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            entries = list(csv.DictReader(f))
+
+    courses = []
+    for entry in entries:
+        code = ''.join((entry.get('code') or '').split()).upper()
+        if code:
+            courses.append({
+                'code': code,
+                'title': (entry.get('title') or '').strip(),
+                'department': (entry.get('department') or '').strip()
+            })
+    return courses
+
+
+# One loaded version of the catalogue; reloading builds a new one and swaps it in
+CatalogueSnapshot = namedtuple('CatalogueSnapshot', ['codes', 'code_set', 'titles', 'prefix_index', 'matcher', 'mtime'])
+
+
+class CourseCatalogue:
+    """Course codes and titles loaded from a data file, reloaded when it changes.
+
+    Codes are held in a set for O(1) validation, indexed by department
+    prefix, and compiled into a CourseCodeMatcher. The file's mtime is
+    checked at most every ``check_interval`` seconds; a changed file is
+    reloaded without restarting the app. Each load is published as one
+    ``CatalogueSnapshot``, so a reader that takes ``snapshot`` once sees a
+    single version throughout.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._last_check = 0.0
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        courses = read_catalogue_file(self.path)
+
+        codes = []
+        titles = {}
+        prefixes = {}
+        for course in courses:
+            if course['code'] in titles:
+                continue
+            codes.append(course['code'])
+            titles[course['code']] = course['title']
+            prefixes.setdefault(course['code'][:3], []).append(course['code'])
+
+        # A single assignment, so readers never see a half-built catalogue
+        self.snapshot = CatalogueSnapshot(tuple(codes), frozenset(codes), titles, prefixes,
+                                          CourseCodeMatcher(codes), mtime)
+        self._mtime = mtime
+        logger.info(f"Loaded {len(codes)} course codes from {self.path}")
+
+    @property
+    def version(self):
+        """Changes whenever the catalogue is reloaded"""
+        return f"{self.snapshot.mtime:.6f}"
+
+    @property
+    def codes(self):
+        return self.snapshot.codes
+
+    @property
+    def code_set(self):
+        return self.snapshot.code_set
+
+    @property
+    def titles(self):
+        return self.snapshot.titles
+
+    @property
+    def prefix_index(self):
+        return self.snapshot.prefix_index
+
+    @property
+    def matcher(self):
+        return self.snapshot.matcher
+
+    def reload_if_changed(self):
+        """Reload the data file if its mtime changed since the last load"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        with self._lock:
+            self._last_check = now
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return False
+            if mtime == self._mtime:
+                return False
+            try:
+                self._load()
+            except Exception as e:
+                # Keep serving the previous catalogue if the new file is broken
+                logger.error(f"Failed to reload course catalogue: {str(e)}")
+                self._mtime = mtime
+                return False
+            return True
+
+    def __contains__(self, code):
+        return code in self.code_set
+
+    def title(self, code):
+        """Course title for a code, or '' if unknown"""
+        return self.titles.get(code, '') if code else ''
+
+    def codes_with_prefix(self, prefix):
+        """Known codes starting with the given department prefix, e.g. 'CSD'"""
+        prefix = prefix.upper()
+        prefix_index = self.snapshot.prefix_index
+        if len(prefix) <= 3:
+            return [code for dept, codes in prefix_index.items() if dept.startswith(prefix) for code in codes]
+        return [code for code in prefix_index.get(prefix[:3], []) if code.startswith(prefix)]
+
+    def find_course_code(self, text, variants=True):
+        """Find a course code in OCR text using the current catalogue"""
+        self.reload_if_changed()
+        return self.matcher.find(text, variants=variants)
+
+    def match_course_code(self, text, variants=True):
+        """``(code, start, end, how)`` for the course code in OCR text, or None (see CourseCodeMatcher.match)"""
+        self.reload_if_changed()
+        return self.matcher.match(text, variants=variants)
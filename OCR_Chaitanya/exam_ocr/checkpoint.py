@@ -0,0 +1,62 @@
+import sqlite3
+import threading
+import time
+
+
+class PageCheckpoints:
+    """OCR text of each finished page of documents that are still being processed.
+
+    Pages are saved as soon as they are OCR'd and keyed by the document's
+    SHA-256, so a failed or interrupted run of the same PDF resumes from
+    the first page without a checkpoint. Unlike the OCR cache, checkpoints
+    are never evicted; they are cleared once the document is committed,
+    and ``prune`` drops those of documents that were abandoned.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_checkpoints (
+                doc_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                saved_at REAL NOT NULL,
+                PRIMARY KEY (doc_hash, page)
+            )
+        """)
+        self._conn.commit()
+
+    def save(self, doc_hash, page, text):
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO page_checkpoints (doc_hash, page, text, saved_at) VALUES (?, ?, ?, ?)",
+                    (doc_hash, page, text, time.time())
+                )
+
+    def load(self, doc_hash):
+        """``{page: text}`` of the pages already done for a document"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT page, text FROM page_checkpoints WHERE doc_hash = ?", (doc_hash,)
+            ).fetchall())
+
+    def clear(self, doc_hash):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM page_checkpoints WHERE doc_hash = ?", (doc_hash,))
+
+    def prune(self, max_age, now=None):
+        """Drop checkpoints of documents untouched for ``max_age`` seconds; returns the pages removed"""
+        cutoff = (now or time.time()) - max_age
+        with self._lock:
+            with self._conn:
+                cursor = self._conn.execute(
+                    "DELETE FROM page_checkpoints WHERE doc_hash IN "
+                    "(SELECT doc_hash FROM page_checkpoints GROUP BY doc_hash HAVING MAX(saved_at) < ?)",
+                    (cutoff,)
+                )
+        return cursor.rowcount
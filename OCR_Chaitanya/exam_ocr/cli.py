@@ -0,0 +1,195 @@
+"""Command line entry point: ``python -m exam_ocr <command>``.
+
+    serve [--debug]          HTTP API (waitress, or Flask's reloader with --debug)
+    worker                   dedicated job worker; run the web app with JOB_WORKERS=0
+    detect PATH...           NDJSON details for PDF files and directories of PDFs
+    reindex                  index _ocr.txt files that are new or changed since last time
+    extract [FILE...]        details from already extracted text (no OCR, stores or Flask)
+    migrate-text [--delete]  move the text files in uploads/ into the OCR text archive
+    compact                  reclaim the space of deleted and replaced texts in the archive
+
+Each command imports only what it needs, so ``extract`` starts without
+Flask, Tesseract or the SQLite stores.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+
+def _service(args):
+    from exam_ocr.config import Config
+    from exam_ocr.service import OCRService
+    return OCRService(Config(args.base_dir))
+
+
+def serve_waitress(app, service):
+    """Serve ``app`` with waitress on HOST:PORT (background threads are the caller's job)"""
+    from waitress import serve
+
+    config = service.config
+    host = config.HOST or '0.0.0.0'
+    logging.info(f"Serving on {host}:{config.PORT} with {config.WSGI_THREADS} threads, "
+                 f"{service.admission.max_active} concurrent OCR request(s), "
+                 f"{service.detect_admission.max_active} concurrent detection(s) and "
+                 f"{service.admission.max_waiting + service.detect_admission.max_waiting} waiting")
+    serve(app, host=host, port=config.PORT, threads=config.WSGI_THREADS)
+
+
+def cmd_serve(args):
+    from exam_ocr.web import create_app
+
+    service = _service(args)
+    config = service.config
+    app = create_app(service=service)
+    logging.info(f"Upload folder: {config.UPLOAD_FOLDER}")
+    logging.info(f"Metadata store: {config.METADATA_DB if config.METADATA_BACKEND == 'sqlite' else config.METADATA_FILE}")
+
+    if args.debug:
+        # With the debug reloader only the serving child process runs jobs and sweeps uploads
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            service.start_background()
+        logging.info(f"Starting Flask application on port {config.PORT}...")
+        app.run(debug=True, host=config.HOST, port=config.PORT)
+        return 0
+
+    service.start_background()
+    serve_waitress(app, service)
+    return 0
+
+
+def cmd_worker(args):
+    service = _service(args)
+    workers = max(service.config.JOB_WORKERS, 1)
+    logging.info(f"Starting OCR job worker with {workers} thread(s)...")
+    service.job_workers.workers = workers
+    service.job_workers.start()
+    try:
+        service.job_workers.join()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_detect(args):
+    from exam_ocr.service import allowed_file, detection_response
+
+    service = _service(args)
+    pdf_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            pdf_paths.extend(os.path.join(path, name) for name in sorted(os.listdir(path)) if allowed_file(name))
+        else:
+            pdf_paths.append(path)
+
+    failures = 0
+    for pdf_path, details, error in service.detect_many(pdf_paths):
+        if error is not None:
+            failures += 1
+            result = {'success': False, 'error': f"Failed to detect document details: {str(error)}"}
+        else:
+            result = detection_response(details)
+        print(json.dumps({'file': pdf_path, **result}), flush=True)
+    return 1 if failures else 0
+
+
+def cmd_reindex(args):
+    indexed, fingerprinted = _service(args).reindex()
+    print(f"Indexed {indexed} OCR text files")
+    print(f"Fingerprinted {fingerprinted} papers")
+    return 0
+
+
+def cmd_extract(args):
+    from exam_ocr.extract import extract_details
+
+    catalogue = None
+    if args.catalogue:
+        from exam_ocr.catalogue import CourseCatalogue
+        catalogue = CourseCatalogue(args.catalogue)
+
+    for path in args.files or ['-']:
+        if path == '-':
+            text = sys.stdin.read()
+        else:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        print(json.dumps({'file': path, **extract_details(text, catalogue)}), flush=True)
+    return 0
+
+
+def _text_archive(args):
+    from exam_ocr.config import Config
+    from exam_ocr.text_store import open_text_store
+
+    config = Config(args.base_dir)
+    archive = open_text_store('archive', config.TEXT_ARCHIVE_FOLDER, config.TEXT_ARCHIVE_INDEX_FILE,
+                              segment_bytes=config.TEXT_SEGMENT_BYTES)
+    return config, archive
+
+
+def cmd_migrate_text(args):
+    from exam_ocr.text_store import migrate_files_to_archive
+
+    config, archive = _text_archive(args)
+    migrated = migrate_files_to_archive(config.UPLOAD_FOLDER, archive, delete=args.delete)
+    print(f"Archived {migrated} OCR text files")
+    print(json.dumps(archive.stats()))
+    return 0
+
+
+def cmd_compact(args):
+    from exam_ocr.text_store import EXPIRING_PREFIXES
+
+    config, archive = _text_archive(args)
+    expired = archive.expire(EXPIRING_PREFIXES, config.UPLOAD_SWEEP_MAX_AGE, config.UPLOAD_SWEEP_MAX_BYTES)
+    reclaimed = archive.compact(config.TEXT_COMPACT_GARBAGE)
+    print(f"Expired {expired} raw OCR texts, reclaimed {reclaimed} bytes")
+    print(json.dumps(archive.stats()))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m exam_ocr', description='Exam paper OCR service')
+    parser.add_argument('--base-dir', default=None,
+                        help='Folder for uploads and the SQLite stores (default: next to the OCR service)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help='Run the HTTP API')
+    serve.add_argument('--debug', action='store_true', help="Flask's development server with the reloader")
+    serve.set_defaults(func=cmd_serve)
+
+    worker = commands.add_parser('worker', help='Run queued OCR jobs')
+    worker.set_defaults(func=cmd_worker)
+
+    detect = commands.add_parser('detect', help='Detect details of PDFs, one JSON line per file')
+    detect.add_argument('paths', nargs='+', metavar='PATH', help='PDF file or directory of PDFs')
+    detect.set_defaults(func=cmd_detect)
+
+    reindex = commands.add_parser('reindex', help='Update the search and duplicate indexes')
+    reindex.set_defaults(func=cmd_reindex)
+
+    extract = commands.add_parser('extract', help='Detect details from text files (- for stdin)')
+    extract.add_argument('files', nargs='*', metavar='FILE')
+    extract.add_argument('--catalogue', help='Course catalogue CSV or JSON (default: the bundled one)')
+    extract.set_defaults(func=cmd_extract)
+
+    migrate_text = commands.add_parser('migrate-text', help='Move uploads/ text files into the OCR text archive')
+    migrate_text.add_argument('--delete', action='store_true',
+                              help='Delete each file once its archived copy reads back identical')
+    migrate_text.set_defaults(func=cmd_migrate_text)
+
+    compact = commands.add_parser('compact', help='Expire raw OCR text and compact the OCR text archive')
+    compact.set_defaults(func=cmd_compact)
+    return parser
+
+
+def main(argv=None, base_dir=None):
+    """Run a command; ``base_dir`` is the default for --base-dir"""
+    args = build_parser().parse_args(argv)
+    if args.base_dir is None:
+        from exam_ocr.config import SERVICE_DIR
+        args.base_dir = base_dir or SERVICE_DIR
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return args.func(args)
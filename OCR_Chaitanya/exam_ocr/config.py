@@ -0,0 +1,96 @@
+import os
+
+from exam_ocr.catalogue import DEFAULT_CATALOGUE_FILE
+
+# Folder of the OCR service, holding the bundled templates and course catalogue
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _env_path(name, default):
+    """Path setting from the environment; an empty value means "use PATH" (None)"""
+    return os.environ.get(name, default) or None
+
+
+class Config:
+    """Settings of one OCR service instance.
+
+    Data files (uploads, SQLite stores) live under ``base_dir``; every
+    setting can be overridden by an environment variable of the same name
+    or by a keyword argument, e.g. ``Config(tmp, JOB_WORKERS=0)``.
+    """
+
+    def __init__(self, base_dir=SERVICE_DIR, **overrides):
+        self.BASE_DIR = base_dir
+        self.UPLOAD_FOLDER = os.path.join(base_dir, 'uploads')
+        self.METADATA_FILE = os.path.join(base_dir, 'document_metadata.json')
+        self.METADATA_DB = os.path.join(base_dir, 'document_metadata.db')
+        self.METADATA_BACKEND = os.environ.get('METADATA_BACKEND', 'sqlite')  # 'sqlite' or legacy 'json'
+        # CSV (code,title,department) or JSON; reloaded when it changes
+        self.COURSE_CATALOGUE_FILE = os.environ.get('COURSE_CATALOGUE_FILE', DEFAULT_CATALOGUE_FILE)
+        self.OCR_CACHE_FILE = os.path.join(base_dir, 'ocr_cache.db')
+        self.OCR_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Evict least recently used OCR results beyond this
+        self.OCR_WORKERS = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))  # Parallel Tesseract processes
+        self.TEXT_LAYER_FAST_PATH = os.environ.get('TEXT_LAYER_FAST_PATH', '1') == '1'  # Skip OCR for born-digital PDFs
+        self.DETECT_DPI = int(os.environ.get('DETECT_DPI', 150))  # Resolution for first-page detection OCR
+        self.HEADER_FRACTION = float(os.environ.get('HEADER_FRACTION', 0.35))  # Top share of page 1 OCR'd first (1 = full page)
+        self.SEARCH_INDEX_FILE = os.path.join(base_dir, 'search_index.db')
+        self.DUPLICATE_INDEX_FILE = os.path.join(base_dir, 'duplicates.db')
+        self.DEDUP_ENABLED = os.environ.get('DEDUP_ENABLED', '1') == '1'  # Match re-uploaded scans against processed papers
+        self.DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0.5))  # Minimum estimated Jaccard similarity
+        # 'archive' (compressed segments with an offset index) or legacy 'files' (one .txt per text in uploads/)
+        self.OCR_TEXT_BACKEND = os.environ.get('OCR_TEXT_BACKEND', 'archive')
+        self.TEXT_ARCHIVE_FOLDER = os.path.join(base_dir, 'ocr_archive')
+        self.TEXT_ARCHIVE_INDEX_FILE = os.path.join(base_dir, 'ocr_archive.db')
+        self.TEXT_SEGMENT_BYTES = int(os.environ.get('TEXT_SEGMENT_BYTES', 64 * 1024 * 1024))  # Segment size before a new one
+        self.TEXT_COMPACT_GARBAGE = float(os.environ.get('TEXT_COMPACT_GARBAGE', 0.5))  # Dead share that gets a segment rewritten
+        self.TEXT_COMPACT_INTERVAL = int(os.environ.get('TEXT_COMPACT_INTERVAL', 3600))  # Seconds between compactions
+        self.JOB_QUEUE_FILE = os.path.join(base_dir, 'ocr_jobs.db')
+        self.CHECKPOINT_FILE = os.path.join(base_dir, 'ocr_checkpoints.db')
+        self.CHECKPOINT_MAX_AGE = int(os.environ.get('CHECKPOINT_MAX_AGE', 7 * 24 * 3600))  # Seconds before unfinished pages are dropped
+        self.JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Background job threads (0 when using `python -m exam_ocr worker`)
+        self.JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 60))  # Running jobs not renewed for this long are requeued
+        self.JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 7 * 24 * 3600))  # Seconds finished and failed jobs are kept
+        self.METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'  # Stage histograms, /metrics and Server-Timing
+        self.UPLOAD_SPILL_BYTES = int(os.environ.get('UPLOAD_SPILL_BYTES', 8 * 1024 * 1024))  # Larger uploads are detected from disk
+        self.UPLOAD_SWEEP_MAX_AGE = int(os.environ.get('UPLOAD_SWEEP_MAX_AGE', 24 * 3600))  # Seconds before temp_/raw_ocr_ files are removed
+        self.UPLOAD_SWEEP_MAX_BYTES = int(os.environ.get('UPLOAD_SWEEP_MAX_BYTES', 512 * 1024 * 1024))  # Size budget for those files
+        self.MAX_CONCURRENT_OCR = int(os.environ.get('MAX_CONCURRENT_OCR', 2))  # Requests running OCR at once
+        self.MAX_OCR_WAITING = int(os.environ.get('MAX_OCR_WAITING', 8))  # Requests waiting for a slot before 429s
+        self.OCR_ADMISSION_TIMEOUT = float(os.environ.get('OCR_ADMISSION_TIMEOUT', 30))  # Seconds to wait for a slot before a 503
+        self.MAX_CONCURRENT_DETECT = int(os.environ.get('MAX_CONCURRENT_DETECT', 2))  # Single detections running at once, besides the above
+        self.MAX_DETECT_WAITING = int(os.environ.get('MAX_DETECT_WAITING', 8))  # Detections waiting for one of those before 429s
+        self.INTERACTIVE_WEIGHT = int(os.environ.get('INTERACTIVE_WEIGHT', 4))  # Detection pages started per bulk page while both wait
+        self.INTERACTIVE_MAX_WAIT = float(os.environ.get('INTERACTIVE_MAX_WAIT', 0.5))  # Seconds a detection waits for a busy worker
+        self.MAX_QUEUED_JOBS = int(os.environ.get('MAX_QUEUED_JOBS', 100))  # Async submissions get 503s beyond this (0: no limit)
+        self.THUMBNAIL_FOLDER = os.path.join(base_dir, 'thumbnails')  # Content-addressed page previews
+        self.THUMBNAIL_INDEX_FILE = os.path.join(base_dir, 'thumbnails.db')
+        # Preview widths in pixels, written while papers are processed (empty: no previews)
+        self.THUMBNAIL_WIDTHS = tuple(int(width) for width in os.environ.get('THUMBNAIL_WIDTHS', '200,800').split(',')
+                                      if width.strip())
+        self.THUMBNAIL_QUALITY = int(os.environ.get('THUMBNAIL_QUALITY', 60))  # WebP (or JPEG) quality
+        self.THUMBNAIL_DPI = int(os.environ.get('THUMBNAIL_DPI', 100))  # For pages whose text needed no rendering
+        self.PREVIEW_MAX_AGE = int(os.environ.get('PREVIEW_MAX_AGE', 24 * 3600))  # Cache-Control max-age of /preview
+        self.POPPLER_PATH = _env_path('POPPLER_PATH', r'C:\Users\saika\Downloads\Release-24.08.0-0\poppler-24.08.0\Library\bin')
+        self.TESSERACT_PATH = _env_path('TESSERACT_PATH', r'C:\Program Files\Tesseract-OCR\tesseract.exe')
+        self.OCR_BACKEND = os.environ.get('OCR_BACKEND', 'auto')  # 'tesserocr' (persistent, in-memory), 'pytesseract' or 'auto'
+        self.OCR_PROFILE = os.environ.get('OCR_PROFILE', 'none')  # Page preprocessing before OCR, see exam_ocr/preprocess.py
+        self.OCR_ADAPTIVE = os.environ.get('OCR_ADAPTIVE', '0') == '1'  # Re-read low-confidence lines, see exam_ocr/adaptive.py
+        self.ADAPTIVE_DPI = int(os.environ.get('ADAPTIVE_DPI', 300))  # Resolution those lines are re-rendered at
+        self.ADAPTIVE_MIN_CONFIDENCE = float(os.environ.get('ADAPTIVE_MIN_CONFIDENCE', 60))  # Word confidence (0-100) below which a line is re-read
+        self.ADAPTIVE_MAX_REGIONS = int(os.environ.get('ADAPTIVE_MAX_REGIONS', 8))  # Lines re-read per page at most
+        self.TEMPLATE_FOLDER = os.path.join(SERVICE_DIR, 'templates')
+        self.SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-here')
+        self.MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+        self.HOST = os.environ.get('HOST')  # Interface to serve on (None: localhost for debug, 0.0.0.0 for waitress)
+        self.PORT = int(os.environ.get('PORT', 5001))
+        self.WSGI_THREADS = None  # waitress threads (None: derived from the OCR slots below)
+
+        for name, value in overrides.items():
+            if not hasattr(self, name):
+                raise ValueError(f"Unknown setting: {name}")
+            setattr(self, name, value)
+
+        # Room for every OCR and detection slot and waiter plus light requests like /health
+        if self.WSGI_THREADS is None:
+            self.WSGI_THREADS = int(os.environ.get('WSGI_THREADS', self.MAX_CONCURRENT_OCR + self.MAX_OCR_WAITING +
+                                                   self.MAX_CONCURRENT_DETECT + self.MAX_DETECT_WAITING + 4))
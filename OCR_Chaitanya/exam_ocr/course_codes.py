@@ -0,0 +1,151 @@
+import re
+
+# Anything that looks like a course code, used as the last resort
+PARTIAL_CODE_PATTERN = re.compile(r'[A-Z]{2,3}\s*\d{3}')
+
+
+def code_prefix(code):
+    """The department prefix of a course code, e.g. 'EEE' for 'EEE202', or None"""
+    match = re.match(r'([A-Z]+)\d{3}', code)
+    return match.group(1) if match else None
+
+
+def direct_code_pattern(prefixes):
+    """Pattern for codes printed with one of the given prefixes, allowing a space before the number"""
+    prefixes = sorted(set(prefixes), key=lambda prefix: (-len(prefix), prefix))
+    if not prefixes:
+        return None
+    return re.compile('(?:' + '|'.join(re.escape(prefix) for prefix in prefixes) + r')\s*\d{3}')
+
+
+def standardize_code(raw_code):
+    """A printed code such as 'EEE 202' without its whitespace, or None if it has no three-digit number"""
+    cleaned_code = ''.join(raw_code.split())
+    return cleaned_code if re.search(r'\d{3}', cleaned_code) else None
+
+
+def code_variants(code):
+    """Spellings of a course code that OCR commonly produces"""
+    dept_code = code[:3]
+    number_part = code[3:]
+
+    # Common misrecognitions of CSC/CSI/etc.
+    dept_variations = [
+        dept_code,
+        dept_code.replace('S', '5'),
+        dept_code.replace('S', '$'),
+        dept_code.replace('O', '0'),
+        dept_code.replace('I', '1'),
+        dept_code.replace('C', 'G')
+    ]
+
+    # Common misrecognitions of numbers
+    number_variations = [
+        number_part,
+        number_part.replace('0', 'O'),
+        number_part.replace('1', 'I'),
+        number_part.replace('1', 'l')
+    ]
+
+    return {dept_var + num_var for dept_var in dept_variations for num_var in number_variations}
+
+
+class CourseCodeMatcher:
+    """Course code finder compiled once for a fixed list of codes.
+
+    Every OCR variant of every code is folded into one precompiled
+    pattern plus a lookup table, so the text is scanned once regardless of
+    how many codes are known. Membership checks use a set instead of
+    scanning the list.
+    """
+
+    def __init__(self, codes):
+        self.codes = list(codes)
+        self.code_set = set(self.codes)
+        self._order = {code: i for i, code in enumerate(self.codes)}
+
+        # Correctly printed codes are found by the prefixes the codes actually use
+        self.prefixes = {prefix for prefix in map(code_prefix, self.codes) if prefix}
+        self._direct_pattern = direct_code_pattern(self.prefixes)
+
+        # Variant spelling -> course code; the first code in the list wins a clash
+        self.variants = {}
+        for code in self.codes:
+            for variant in code_variants(code):
+                self.variants.setdefault(variant, code)
+
+        # One positional character-class pattern per variant length; a window
+        # matching it is a candidate and the dict lookup confirms it. The
+        # lookahead reports overlapping windows like a plain substring scan.
+        self._variant_patterns = []
+        for length in sorted({len(v) for v in self.variants}, reverse=True):
+            columns = [set() for _ in range(length)]
+            for variant in self.variants:
+                if len(variant) == length:
+                    for i, char in enumerate(variant):
+                        columns[i].add(char)
+            classes = ''.join('[' + ''.join(re.escape(c) for c in sorted(column)) + ']' for column in columns)
+            self._variant_patterns.append(re.compile(f'(?=({classes}))'))
+
+    def find_direct(self, text):
+        """Return the first correctly printed code (after prefix clean-up) that is known"""
+        match = self._match_direct(text)
+        return match[0] if match else None
+
+    def _match_direct(self, text):
+        if self._direct_pattern is None:
+            return None
+        for match in self._direct_pattern.finditer(text):
+            std_code = standardize_code(match.group())
+            if std_code in self.code_set:
+                return std_code, match.start(), match.end()
+        return None
+
+    def variant_candidates(self, text):
+        """All known codes whose OCR variants occur in the text, as (position, code).
+
+        Candidates are ranked by first position in the text, ties broken by
+        the order of the code list.
+        """
+        return [(start, code) for start, _, code in self._variant_matches(text)]
+
+    def _variant_matches(self, text):
+        first_seen = {}
+        for pattern in self._variant_patterns:
+            for match in pattern.finditer(text):
+                code = self.variants.get(match.group(1))
+                if code is not None and (code not in first_seen or match.start() < first_seen[code][0]):
+                    first_seen[code] = (match.start(), match.end(1))
+        return sorted(((start, end, code) for code, (start, end) in first_seen.items()),
+                      key=lambda candidate: (candidate[0], self._order[candidate[2]]))
+
+    def match(self, text, variants=True):
+        """The course code in the text as ``(code, start, end, how)``, or None.
+
+        ``how`` is 'direct' for a correctly printed known code, 'variant' for
+        an OCR misspelling of one and 'partial' for an unknown code-like
+        string. Whitespace inside a code may include line breaks, so the
+        offsets refer to ``text`` as given.
+        """
+        # Try direct regex pattern first
+        direct = self._match_direct(text)
+        if direct:
+            return (*direct, 'direct')
+
+        if variants:
+            candidates = self._variant_matches(text)
+            if candidates:
+                start, end, code = candidates[0]
+                return code, start, end, 'direct' if text[start:end] == code else 'variant'
+
+        # If no match found, look for partial matches
+        potential = PARTIAL_CODE_PATTERN.search(text)
+        if potential:
+            return ''.join(potential.group().split()), potential.start(), potential.end(), 'partial'
+
+        return None
+
+    def find(self, text, variants=True):
+        """Search for course codes in the text, handling possible OCR variations"""
+        match = self.match(text, variants=variants)
+        return match[0] if match else None
@@ -0,0 +1,279 @@
+import multiprocessing
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
+
+from exam_ocr import ocr_backend
+from exam_ocr.poppler import rasterise_page
+from exam_ocr.preprocess import preprocess, profile_dpi
+from exam_ocr.thumbnails import make_thumbnails
+
+
+def _init_worker(tesseract_cmd, backend):
+    """Set up the OCR backend once inside a freshly started worker process"""
+    ocr_backend.configure(backend, tesseract_cmd)
+
+
+def crop_top(image, fraction):
+    """Top band of a page image, e.g. the header where course code and date are printed"""
+    width, height = image.size
+    return image.crop((0, 0, width, max(1, int(height * fraction))))
+
+
+def ocr_page_image(image, pdf, page, poppler_path, dpi, profile='none', adaptive=None):
+    """OCR a preprocessed page image (or its top band) rendered at ``dpi``.
+
+    With an ``adaptive`` ``AdaptiveOCR``, low-confidence lines are re-read
+    from the page rendered again at ``adaptive.dpi`` (only if that is
+    sharper and only when some line needs it).
+    """
+    if adaptive is None:
+        return ocr_backend.image_to_string(image)
+    render = None
+    if adaptive.dpi > dpi:
+        def render():
+            return preprocess(rasterise_page(pdf, page, dpi=adaptive.dpi, poppler_path=poppler_path), profile)
+    return adaptive.ocr(image, render)
+
+
+def _rasterise_and_ocr(pdf, page, poppler_path, dpi, top_fraction=None, profile='none', thumbnails=None,
+                       adaptive=None):
+    """Rasterise a single page, OCR it (or only its top band) and free the image (runs in a worker)
+
+    With ``thumbnails`` as ``(widths, quality)`` the page image is also
+    encoded by ``make_thumbnails`` before OCR; returns ``(text, thumbnails)``.
+    ``adaptive`` is passed on to ``ocr_page_image``.
+    """
+    dpi = profile_dpi(profile, dpi)
+    image = rasterise_page(pdf, page, dpi=dpi, poppler_path=poppler_path)
+    try:
+        try:
+            encoded = make_thumbnails(image, *thumbnails) if thumbnails else None
+        except Exception:
+            encoded = None  # Previews are best effort; the page is rendered again for them later
+        # Preprocess the whole page before cropping, as detection does in the web process: the skew
+        # of a deskewed band would differ from the full page that adaptive OCR re-renders
+        page_image = preprocess(image, profile)
+        if top_fraction:
+            page_image = crop_top(page_image, top_fraction)
+        return ocr_page_image(page_image, pdf, page, poppler_path, dpi, profile, adaptive), encoded
+    finally:
+        image.close()
+
+
+def _timed_rasterise_and_ocr(*args):
+    """``_rasterise_and_ocr`` returning ``(text, thumbnails, seconds)`` so the parent can record page timings"""
+    start = time.perf_counter()
+    text, encoded = _rasterise_and_ocr(*args)
+    return text, encoded, time.perf_counter() - start
+
+
+def _rasterise_thumbnails(pdf, page, poppler_path, dpi, widths, quality):
+    """Thumbnails of a page whose text is already known, without OCR"""
+    image = rasterise_page(pdf, page, dpi=dpi, poppler_path=poppler_path)
+    try:
+        return make_thumbnails(image, widths, quality)
+    finally:
+        image.close()
+
+
+class OCREngine:
+    """Page-level OCR engine that fans pages out to a pool of Tesseract workers.
+
+    The process pool is started on first use and reused across requests.
+    ``max_workers`` bounds the number of concurrent Tesseract processes and
+    ``window`` bounds how many pages of one document are in flight at once,
+    so at most ``window`` page images exist at any time regardless of the
+    document length.
+
+    Workers keep their OCR ``backend`` (see ``exam_ocr.ocr_backend``)
+    initialised for the life of the pool, and every page goes through the
+    ``profile`` of ``exam_ocr.preprocess`` before OCR.
+
+    ``observer(stage, seconds)``, if given, receives the rasterise plus OCR
+    time of every page under the stage name ``'page'``.
+
+    ``thumbnail_widths`` and ``thumbnail_quality`` are used when a caller
+    of ``ocr_pdf_pages`` wants page thumbnails (see ``exam_ocr.thumbnails``);
+    they are encoded from the image that is OCR'd, so they cost no extra
+    Poppler run.
+
+    With ``adaptive`` (an ``exam_ocr.adaptive.AdaptiveOCR``), pages are
+    OCR'd with word confidences and their doubtful lines re-read at a
+    higher resolution.
+
+    With a ``scheduler`` (see ``exam_ocr.scheduler``), every page waits for
+    a worker of the ``priority`` class its caller passes before it is
+    submitted, so bulk documents cannot crowd interactive pages out of the
+    pool. Without one, or without a priority, pages are submitted directly.
+    """
+
+    def __init__(self, tesseract_cmd, max_workers=None, window=None, observer=None, backend='auto', profile='none',
+                 thumbnail_widths=(), thumbnail_quality=60, scheduler=None, adaptive=None):
+        self.tesseract_cmd = tesseract_cmd
+        self.backend = backend
+        self.profile = profile
+        self.thumbnail_widths = tuple(thumbnail_widths)
+        self.thumbnail_quality = thumbnail_quality
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.window = window or self.max_workers
+        self.observer = observer
+        self.scheduler = scheduler
+        self.adaptive = adaptive
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _text(self, result, page=None, on_thumbnails=None):
+        """Unwrap a ``(text, thumbnails, seconds)`` worker result, reporting the page time and thumbnails"""
+        text, encoded, seconds = result
+        if self.observer is not None:
+            self.observer('page', seconds)
+        if on_thumbnails is not None and encoded:
+            on_thumbnails(page, encoded)
+        return text
+
+    def scheduled(self, priority):
+        """Hold a worker of the scheduler for in-process OCR of one page"""
+        if self.scheduler is None or priority is None:
+            return nullcontext()
+        return self.scheduler.slot(priority)
+
+    def _submit(self, executor, priority, *args):
+        """Submit a page once the scheduler grants it a worker; the worker is freed when the page finishes"""
+        if self.scheduler is None or priority is None:
+            return executor.submit(_timed_rasterise_and_ocr, *args)
+        self.scheduler.acquire(priority)
+        try:
+            future = executor.submit(_timed_rasterise_and_ocr, *args)
+        except BaseException:
+            self.scheduler.release(priority)
+            raise
+        future.add_done_callback(lambda _: self.scheduler.release(priority))
+        return future
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers forked from this threaded process could inherit the exec pipe of a Poppler
+                # subprocess another thread is starting, leaving that thread waiting on it forever
+                context = multiprocessing.get_context('forkserver') \
+                    if 'forkserver' in multiprocessing.get_all_start_methods() else None
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    initargs=(self.tesseract_cmd, self.backend)
+                )
+            return self._executor
+
+    def ocr_pdf_pages(self, pdf_path, pages, poppler_path=None, dpi=200, on_thumbnails=None, priority=None):
+        """Yield ``(page, text)`` for the given 1-based pages, in order.
+
+        ``pdf_path`` may also be the document's bytes. Each page is
+        rasterised and OCR'd on its own, so only a bounded window of page
+        images is ever held in memory. ``on_thumbnails(page, thumbnails)``,
+        if given, receives each page's thumbnails before the page is yielded.
+        Each page waits for a worker of the scheduler's ``priority`` class.
+        """
+        pages = list(pages)
+        thumbnails = (self.thumbnail_widths, self.thumbnail_quality) \
+            if on_thumbnails is not None and self.thumbnail_widths else None
+        if len(pages) <= 1 or self.max_workers == 1:
+            # Not worth a round trip through the pool; uses this process's backend
+            for page in pages:
+                with self.scheduled(priority):
+                    result = _timed_rasterise_and_ocr(pdf_path, page, poppler_path, dpi, None, self.profile,
+                                                      thumbnails, self.adaptive)
+                yield page, self._text(result, page, on_thumbnails)
+            return
+
+        executor = self._get_executor()
+        in_flight = deque()
+        remaining = iter(pages)
+        try:
+            for page in remaining:
+                in_flight.append((page, self._submit(executor, priority, pdf_path, page, poppler_path, dpi, None,
+                                                     self.profile, thumbnails, self.adaptive)))
+                if len(in_flight) >= self.window:
+                    break
+            while in_flight:
+                page, future = in_flight.popleft()
+                text = self._text(future.result(), page, on_thumbnails)
+                # Keep the window full while the caller consumes this page
+                next_page = next(remaining, None)
+                if next_page is not None:
+                    in_flight.append((next_page, self._submit(executor, priority, pdf_path, next_page, poppler_path,
+                                                              dpi, None, self.profile, thumbnails, self.adaptive)))
+                yield page, text
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    def ocr_first_pages(self, pdfs, poppler_path=None, dpi=200, window=None, top_fraction=None, priority=None):
+        """Yield ``(index, text, error)`` for page 1 of each PDF (path or bytes) as it finishes.
+
+        ``index`` is the document's position in ``pdfs``. Documents are
+        scheduled across the shared worker pool with at most ``window``
+        (default: twice the worker count) in flight, and results are
+        yielded in completion order rather than input order. With
+        ``top_fraction`` only that top band of the page is OCR'd. Each page
+        waits for a worker of the scheduler's ``priority`` class.
+        """
+        pdfs = list(pdfs)
+        if self.max_workers == 1:
+            for index, pdf in enumerate(pdfs):
+                try:
+                    with self.scheduled(priority):
+                        result = _timed_rasterise_and_ocr(pdf, 1, poppler_path, dpi, top_fraction, self.profile,
+                                                          None, self.adaptive)
+                    yield index, self._text(result), None
+                except Exception as e:
+                    yield index, None, e
+            return
+
+        executor = self._get_executor()
+        window = window or self.max_workers * 2
+        remaining = iter(enumerate(pdfs))
+        in_flight = {}
+        try:
+            while True:
+                while len(in_flight) < window:
+                    item = next(remaining, None)
+                    if item is None:
+                        break
+                    index, pdf = item
+                    future = self._submit(executor, priority, pdf, 1, poppler_path, dpi, top_fraction, self.profile,
+                                          None, self.adaptive)
+                    in_flight[future] = index
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    error = future.exception()
+                    yield index, None if error else self._text(future.result()), error
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def thumbnail_pages(self, pdf_path, pages, poppler_path=None, dpi=100, priority=None):
+        """Yield ``(page, thumbnails)`` for pages whose text came from elsewhere (cache, text layer).
+
+        Pages are rendered at the low ``dpi`` thumbnails need, one at a time
+        in this process.
+        """
+        for page in pages:
+            with self.scheduled(priority):
+                encoded = _rasterise_thumbnails(pdf_path, page, poppler_path, dpi, self.thumbnail_widths,
+                                                self.thumbnail_quality)
+            yield page, encoded
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
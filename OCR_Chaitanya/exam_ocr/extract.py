@@ -0,0 +1,308 @@
+"""Document details from first-page text.
+
+Pure Python (no Flask, Poppler or Tesseract), so the parsers can be used
+from scripts, workers and the benchmark as well as from the web app::
+
+    from exam_ocr.extract import extract_details
+    details = extract_details(text)
+"""
+import re
+from datetime import datetime
+
+# Bump when the extracted fields change, so cached details are recomputed
+EXTRACTOR_VERSION = 3
+
+# Canonical exam and semester types, as used in processed paper file names
+EXAM_TYPES = ('Mid_Semester', 'End_Semester', 'Quiz')
+SEMESTER_TYPES = ('Winter', 'Summer', 'Monsoon')
+DEFAULT_EXAM_TYPE = 'End_Semester'
+DEFAULT_SEMESTER_TYPE = 'Winter'
+
+# Exam type values of the Node backend's question paper model
+EXAM_TYPE_SLUGS = {'Mid_Semester': 'mid-semester', 'End_Semester': 'end-semester', 'Quiz': 'quiz'}
+
+# Spellings of each exam type once lowercased and stripped of everything but letters
+EXAM_TYPE_ALIASES = {
+    'endsemester': 'End_Semester', 'endsem': 'End_Semester',
+    'midsemester': 'Mid_Semester', 'midsem': 'Mid_Semester',
+    'quiz': 'Quiz', 'quizz': 'Quiz'
+}
+
+# Keywords found anywhere in the text (case-insensitive, also inside longer
+# words: 'end sem' matches 'End Semester'), in order of precedence per field
+KEYWORDS = {
+    'exam_type': [
+        ('End_Semester', ['end sem', 'end-sem', 'endsem']),
+        ('Mid_Semester', ['mid sem', 'mid-sem', 'midsem']),
+        ('Quiz', ['quiz'])
+    ],
+    'semester_type': [
+        ('Winter', ['winter sem']),
+        ('Summer', ['summer sem']),
+        ('Monsoon', ['monsoon sem'])
+    ]
+}
+
+# Month names as accepted by strptime's %B
+MONTHS = {name: number for number, name in enumerate(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+     'august', 'september', 'october', 'november', 'december'], start=1)}
+
+# Date formats, in order of precedence: group name -> (pattern, confidence).
+# Each pattern captures day, month (number or name) and year.
+DATE_FORMATS = {
+    'date_labelled': (r'Date:?\s*(\d{1,2})[\s-]*([A-Za-z]+)[\s-]*(\d{4})', 0.95),  # e.g., Date: 12 May 2023
+    'date_numeric': (r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})', 0.75),  # e.g., 12/05/2023
+    'date_words': (r'(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]+)\s+(\d{4})', 0.85)  # e.g., 12th May 2023
+}
+
+# How much each kind of evidence is trusted (0 to 1)
+CODE_CONFIDENCE = {'direct': 0.95, 'variant': 0.7, 'partial': 0.3}
+KEYWORD_CONFIDENCE = 0.9
+CONFLICT_CONFIDENCE = 0.6  # Keywords for more than one value were found
+DEFAULT_CONFIDENCE = 0.2  # Nothing found, the default was used
+YEAR_ONLY_CONFIDENCE = 0.5  # A bare year, not part of a date
+
+DETAIL_FIELDS = ('course_code', 'exam_type', 'semester_type', 'acad_year', 'year')
+
+ACAD_YEAR_PATTERN = re.compile(r'^(\d{4})\s*[-/–]\s*(\d{2}|\d{4})$')
+
+
+def _trie_pattern(words, ignore_case=False):
+    """Regex alternation of literal words factored into a prefix trie.
+
+    The engine then follows one branch per character instead of trying
+    every word in turn, so adding keywords barely changes the scan cost.
+    With ``ignore_case`` letters become ``[aA]`` classes, which scan faster
+    than the IGNORECASE flag.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        end = '' in node
+        branches = [(f'[{char}{char.upper()}]' if ignore_case and char.isalpha() else re.escape(char)) + build(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if end:
+            body = '(?:' + body + ')?'
+        return body
+
+    return build(trie)
+
+
+def _keyword_values():
+    """Keyword -> (field, precedence, value)"""
+    return {word: (name, rank, value)
+            for name, entries in KEYWORDS.items()
+            for rank, (value, words) in enumerate(entries)
+            for word in words}
+
+
+_KEYWORD_VALUES = _keyword_values()
+
+KEYWORD_PATTERN = re.compile(_trie_pattern(_KEYWORD_VALUES, ignore_case=True))
+
+# Everything the extractor looks for, scanned in one pass over the text.
+# Dates and years are matched by lookaheads, so they never hide a keyword
+# or another date starting inside them. Every field starts with a digit,
+# 'D' or a keyword's first letter, and checking that first lets the engine
+# skip all other positions cheaply. Course codes depend on the
+# (reloadable) catalogue and use its own matcher.
+_FIRST_CHARS = ''.join(sorted({char for word in _KEYWORD_VALUES for char in (word[0].lower(), word[0].upper())}))
+FIELD_PATTERN = re.compile(f"(?=[\\dD{re.escape(_FIRST_CHARS)}])(?:" + '|'.join(
+    [f"(?P<keyword>{KEYWORD_PATTERN.pattern})"] +
+    [f"(?=(?P<{name}>{pattern}))" for name, (pattern, _) in DATE_FORMATS.items()] +
+    [r'(?=\b(?P<year>20\d{2})\b)']
+) + ')')
+
+# Group numbers of each date format's day, month and year
+_DATE_GROUPS = {name: tuple(range(FIELD_PATTERN.groupindex[name] + 1, FIELD_PATTERN.groupindex[name] + 4))
+                for name in DATE_FORMATS}
+_DATE_RANK = {name: rank for rank, name in enumerate(DATE_FORMATS)}
+
+_default_catalogue = None
+
+
+def default_catalogue():
+    """The bundled course catalogue, loaded on first use"""
+    global _default_catalogue
+    if _default_catalogue is None:
+        from exam_ocr.catalogue import DEFAULT_CATALOGUE_FILE, CourseCatalogue
+        _default_catalogue = CourseCatalogue(DEFAULT_CATALOGUE_FILE)
+    return _default_catalogue
+
+
+def field(value, confidence, span=None):
+    """One extracted field: its value, how sure we are (0 to 1) and the (start, end) it came from"""
+    return {'value': value, 'confidence': round(confidence, 2), 'span': span}
+
+
+def _to_date(day, month, year):
+    """A datetime for matched date parts, or None if they are not a real date"""
+    month = int(month) if month.isdigit() else MONTHS.get(month.lower())
+    if month is None:
+        return None
+    try:
+        return datetime(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+def scan(text, now=None):
+    """Keyword, date and year fields from one pass over the text (no course code)"""
+    latest = (now or datetime.now()).year + 1
+    keywords = {name: {} for name in KEYWORDS}  # field -> {rank: (value, span)} of first hits
+    date_ends = dict.fromkeys(DATE_FORMATS, 0)  # Dates of one format do not overlap, as with re.findall
+    best_date = None  # (rank, start, date, span, confidence)
+    best_year = None  # (year, span)
+
+    for match in FIELD_PATTERN.finditer(text):
+        kind = match.lastgroup
+        span = match.span(kind)
+        if kind == 'keyword':
+            name, rank, value = _KEYWORD_VALUES[match.group().lower()]
+            keywords[name].setdefault(rank, (value, span))
+        elif kind == 'year':
+            year = int(match.group(kind))
+            if year <= latest and (best_year is None or year > best_year[0]):
+                best_year = (year, span)
+        elif span[0] >= date_ends[kind]:
+            date_ends[kind] = span[1]
+            candidate = (_DATE_RANK[kind], span[0])
+            if best_date is None or candidate < best_date[:2]:
+                date = _to_date(*(match.group(i) for i in _DATE_GROUPS[kind]))
+                if date is not None:
+                    best_date = (*candidate, date, span, DATE_FORMATS[kind][1])
+
+    fields = {}
+    for name, hits in keywords.items():
+        if hits:
+            value, span = hits[min(hits)]
+            fields[name] = field(value, KEYWORD_CONFIDENCE if len(hits) == 1 else CONFLICT_CONFIDENCE, span)
+        else:
+            default = DEFAULT_EXAM_TYPE if name == 'exam_type' else DEFAULT_SEMESTER_TYPE
+            fields[name] = field(default, DEFAULT_CONFIDENCE)
+    fields['date'] = field(best_date[2], best_date[4], best_date[3]) if best_date else field(None, 0)
+    fields['year_mention'] = field(best_year[0], YEAR_ONLY_CONFIDENCE, best_year[1]) if best_year else field(None, 0)
+    return fields
+
+
+def extract_fields(text, catalogue=None, now=None):
+    """Every detail field of the text as ``{name: {'value', 'confidence', 'span'}}``.
+
+    Spans are ``(start, end)`` offsets into ``text`` (None for defaults and
+    derived values without a source). Besides DETAIL_FIELDS the result has
+    ``date`` (a datetime) and ``subject``.
+    """
+    catalogue = catalogue or default_catalogue()
+    fields = scan(text, now)
+
+    code = catalogue.match_course_code(text)
+    if code:
+        fields['course_code'] = field(code[0], CODE_CONFIDENCE[code[3]], (code[1], code[2]))
+    else:
+        fields['course_code'] = field(None, 0)
+    fields['subject'] = field(catalogue.title(fields['course_code']['value']),
+                              fields['course_code']['confidence'], fields['course_code']['span'])
+
+    date, semester = fields['date'], fields['semester_type']
+    if date['value'] is not None:
+        fields['acad_year'] = field(determine_academic_year(date['value'], semester['value']),
+                                    min(date['confidence'], semester['confidence']), date['span'])
+        fields['year'] = field(date['value'].year, date['confidence'], date['span'])
+    else:
+        fields['acad_year'] = field(None, 0)
+        fields['year'] = fields['year_mention']
+    del fields['year_mention']
+    return fields
+
+
+def detect_exam_type(text):
+    """Detect the type of examination from the text"""
+    return scan(text)['exam_type']['value']
+
+
+def detect_semester_type(text):
+    """Detect the semester type from the text"""
+    return scan(text)['semester_type']['value']
+
+
+def extract_date(text):
+    """Extract date from text using various formats"""
+    return scan(text)['date']['value']
+
+
+def determine_academic_year(date, semester_type):
+    """Determine academic year based on date and semester type"""
+    if not date:
+        return None
+
+    year = date.year
+
+    if semester_type == 'Monsoon':
+        return f"{year}-{str(year+1)[2:]}"
+    else:  # Winter or Summer
+        return f"{year-1}-{str(year)[2:]}"
+
+
+def extract_year(text, now=None):
+    """Most recent plausible 4-digit year (2000 to next year) in the text, or None"""
+    return scan(text, now)['year_mention']['value']
+
+
+def find_course_code(text, catalogue=None):
+    """Search for course codes in the text, handling possible OCR variations"""
+    return (catalogue or default_catalogue()).find_course_code(text)
+
+
+def extract_details(text, catalogue=None):
+    """All document details found in first-page text.
+
+    ``exam_type`` and ``semester_type`` are canonical values (see
+    EXAM_TYPES), ``acad_year`` is e.g. '2023-24' and ``year`` is the
+    calendar year of the exam; either may be None when no date is found.
+    ``confidence`` and ``spans`` give each field's score and source
+    offsets, see ``extract_fields``.
+    """
+    fields = extract_fields(text, catalogue)
+    return {
+        **{name: fields[name]['value'] for name in ('course_code', 'subject') + DETAIL_FIELDS[1:]},
+        'confidence': {name: fields[name]['confidence'] for name in DETAIL_FIELDS},
+        'spans': {name: fields[name]['span'] and list(fields[name]['span']) for name in DETAIL_FIELDS}
+    }
+
+
+def normalise_exam_type(value):
+    """Canonical exam type for any spelling ('end-semester', 'Mid Sem', 'QUIZ'...), or None"""
+    if not value:
+        return None
+    return EXAM_TYPE_ALIASES.get(re.sub(r'[^a-z]', '', str(value).lower()))
+
+
+def exam_type_slug(value):
+    """The Node backend's exam type for any spelling; 'other' if it is not recognised"""
+    return EXAM_TYPE_SLUGS.get(normalise_exam_type(value), 'other')
+
+
+def normalise_acad_year(value):
+    """'2023-24' for '2023-24', '2023-2024', '2023/24' or a starting year of 2023; None if not recognised"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    if re.fullmatch(r'\d{4}', text):
+        start = int(text)
+    else:
+        match = ACAD_YEAR_PATTERN.match(text)
+        if match is None:
+            return None
+        start, end = int(match.group(1)), match.group(2)
+        if int(end) % 100 != (start + 1) % 100:
+            return None
+    return f"{start}-{str(start + 1)[2:]}"
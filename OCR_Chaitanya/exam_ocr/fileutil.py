@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+
+
+def write_atomic(path, text):
+    """Write text to ``path`` via a temp file and rename, so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def copy_atomic(src, dest):
+    """Copy ``src`` to ``dest`` via a temp file and rename"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stage_copy(src, folder, prefix='temp_'):
+    """Copy ``src`` to a new file in ``folder`` that is later moved into place with ``os.replace``; returns its path"""
+    fd, path = tempfile.mkstemp(dir=folder, prefix=prefix, suffix=os.path.splitext(src)[1])
+    os.close(fd)
+    try:
+        shutil.copyfile(src, path)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
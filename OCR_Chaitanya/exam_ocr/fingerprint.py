@@ -0,0 +1,226 @@
+import hashlib
+import json
+import re
+import sqlite3
+import struct
+import threading
+import time
+
+from exam_ocr.search import OCR_FILE_SUFFIX, paper_from_filename
+
+# MinHash signature length (a power of two), split into LSH bands of
+# ROWS_PER_BAND values. 32 bands of 4 rows make pairs with Jaccard
+# similarity >= 0.5 candidates with probability ~0.87 (>= 0.6: ~0.98)
+# while unrelated papers (~0.1) almost never collide.
+NUM_PERM = 128
+ROWS_PER_BAND = 4
+NUM_BANDS = NUM_PERM // ROWS_PER_BAND
+
+# Character shingle length over the text with spaces and punctuation
+# removed; a misread character only breaks a handful of shingles, which
+# keeps different scans of the same paper at similarity ~0.7-0.85
+SHINGLE_CHARS = 5
+
+# Below this many shingles a text is too short to fingerprint reliably
+MIN_SHINGLES = 64
+
+_BIN_BITS = NUM_PERM.bit_length() - 1
+_EMPTY = (1 << 64) - 1
+
+WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+PAGE_MARKER = re.compile(r'^=== Page (\d+) ===$', re.MULTILINE)
+
+
+def shingles(text, size=SHINGLE_CHARS):
+    """Set of character n-grams of the text, lowercased with only letters and digits kept"""
+    normalised = ''.join(WORD_PATTERN.findall(text.lower()))
+    return {normalised[i:i + size] for i in range(len(normalised) - size + 1)}
+
+
+def minhash_signature(text):
+    """MinHash signature (NUM_PERM ints) of the text, or None if it is too short.
+
+    Uses one-permutation hashing: every shingle is hashed once and the
+    hash picks both its bin and its value, so a page costs a few ms in
+    pure Python instead of NUM_PERM hashes per shingle. Empty bins borrow
+    from the next filled bin (rotation densification).
+    """
+    grams = shingles(text)
+    if len(grams) < MIN_SHINGLES:
+        return None
+    bins = [_EMPTY] * NUM_PERM
+    for gram in grams:
+        value = int.from_bytes(hashlib.blake2b(gram.encode('utf-8'), digest_size=8).digest(), 'little')
+        index = value & (NUM_PERM - 1)
+        value >>= _BIN_BITS
+        if value < bins[index]:
+            bins[index] = value
+    if _EMPTY in bins:
+        signature = list(bins)
+        for index, value in enumerate(bins):
+            if value == _EMPTY:
+                distance = 1
+                while bins[(index + distance) % NUM_PERM] == _EMPTY:
+                    distance += 1
+                # Offset by distance so borrowed values rarely equal real ones
+                signature[index] = bins[(index + distance) % NUM_PERM] + (distance << (64 - _BIN_BITS))
+        bins = signature
+    return bins
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+
+def jaccard(text, other):
+    """Exact Jaccard similarity of two texts' shingle sets (0 if either has none)"""
+    grams, other_grams = shingles(text), shingles(other)
+    if not grams or not other_grams:
+        return 0.0
+    return len(grams & other_grams) / len(grams | other_grams)
+
+
+def band_keys(signature):
+    """One bucket key per LSH band, as signed 64-bit ints for SQLite"""
+    keys = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f'<{ROWS_PER_BAND}Q', *rows), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def first_page(ocr_text):
+    """Page 1 of a ``=== Page N ===`` formatted _ocr.txt file"""
+    markers = list(PAGE_MARKER.finditer(ocr_text))
+    if not markers:
+        return ocr_text
+    end = markers[1].start() if len(markers) > 1 else len(ocr_text)
+    return ocr_text[markers[0].end():end]
+
+
+class DuplicateIndex:
+    """MinHash/LSH index of processed papers' first-page text.
+
+    Each paper is stored under one or more ``kind``s of text ('page' for
+    the whole first page, 'header' for its header band) because the two
+    are not comparable with each other. A lookup only compares the
+    signatures that share an LSH bucket with the query, so its cost does
+    not grow with the number of papers.
+    """
+
+    def __init__(self, db_path, threshold=0.5):
+        self.db_path = db_path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                paper TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                metadata TEXT NOT NULL,
+                source_mtime REAL,
+                created_at REAL NOT NULL,
+                UNIQUE (paper, kind)
+            )
+        """)
+        # Indexes created before signatures recorded the text they came from
+        if 'source_mtime' not in {row[1] for row in self._conn.execute("PRAGMA table_info(signatures)")}:
+            self._conn.execute("ALTER TABLE signatures ADD COLUMN source_mtime REAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                kind TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                signature_id INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (kind, band, bucket)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_signature ON lsh_buckets (signature_id)")
+        self._conn.commit()
+
+    def _add(self, paper, kind, signature, metadata, source_mtime=None):
+        row = self._conn.execute("SELECT id FROM signatures WHERE paper = ? AND kind = ?", (paper, kind)).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM lsh_buckets WHERE signature_id = ?", (row[0],))
+            self._conn.execute("DELETE FROM signatures WHERE id = ?", (row[0],))
+        cursor = self._conn.execute(
+            "INSERT INTO signatures (paper, kind, signature, metadata, source_mtime, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (paper, kind, struct.pack(f'<{NUM_PERM}Q', *signature), json.dumps(metadata), source_mtime, time.time())
+        )
+        self._conn.executemany(
+            "INSERT INTO lsh_buckets (kind, band, bucket, signature_id) VALUES (?, ?, ?, ?)",
+            [(kind, band, key, cursor.lastrowid) for band, key in enumerate(band_keys(signature))]
+        )
+
+    def add(self, paper, kind, text, metadata, source_mtime=None):
+        """Fingerprint a paper's text; returns False if the text is too short.
+
+        ``source_mtime`` is the stored text's mtime, which ``backfill`` uses
+        to spot texts that changed since they were fingerprinted.
+        """
+        signature = minhash_signature(text)
+        if signature is None:
+            return False
+        with self._lock:
+            with self._conn:
+                self._add(paper, kind, signature, metadata, source_mtime)
+        return True
+
+    def find(self, text, kinds=('page',)):
+        """The most similar indexed paper at or above the threshold, or None.
+
+        Returns ``{'paper', 'kind', 'similarity', 'metadata'}``.
+        """
+        signature = minhash_signature(text)
+        if signature is None:
+            return None
+        keys = band_keys(signature)
+        best = None
+        with self._lock:
+            for kind in kinds:
+                candidates = set()
+                for band, key in enumerate(keys):
+                    candidates.update(row[0] for row in self._conn.execute(
+                        "SELECT signature_id FROM lsh_buckets WHERE kind = ? AND band = ? AND bucket = ?",
+                        (kind, band, key)
+                    ))
+                for signature_id in candidates:
+                    paper, blob, metadata = self._conn.execute(
+                        "SELECT paper, signature, metadata FROM signatures WHERE id = ?", (signature_id,)
+                    ).fetchone()
+                    score = similarity(signature, struct.unpack(f'<{NUM_PERM}Q', blob))
+                    if score >= self.threshold and (best is None or score > best['similarity']):
+                        best = {'paper': paper, 'kind': kind, 'similarity': round(score, 3),
+                                'metadata': json.loads(metadata)}
+        return best
+
+    def backfill(self, text_store, entries=()):
+        """Fingerprint page 1 of every ``*_ocr.txt`` in ``text_store`` that is new or changed; returns the count"""
+        known = {entry['ocr_file']: entry for entry in entries if entry.get('ocr_file')}
+        with self._lock:
+            indexed = dict(self._conn.execute("SELECT paper, source_mtime FROM signatures WHERE kind = 'page'"))
+
+        count = 0
+        with self._lock:
+            with self._conn:
+                for name in text_store.names(OCR_FILE_SUFFIX):
+                    mtime = text_store.mtime(name)
+                    if name in indexed and indexed[name] == mtime:
+                        continue
+                    metadata = known.get(name) or paper_from_filename(name)
+                    if metadata is None:
+                        continue
+                    page = text_store.get_page(name, 1)
+                    signature = minhash_signature(page if page is not None else first_page(text_store.get(name) or ''))
+                    if signature is not None:
+                        self._add(name, 'page', signature, metadata, mtime)
+                        count += 1
+        return count
@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Columns added after the first release, with their definitions
+_ADDED_COLUMNS = {'owner': 'TEXT', 'lease_until': 'REAL'}
+
+
+class JobQueue:
+    """Durable OCR job queue backed by a local SQLite database.
+
+    Jobs survive restarts. A claimed job belongs to this queue's ``owner``
+    for ``lease_seconds``, and its worker renews the lease with
+    ``heartbeat`` while the job runs; ``recover_interrupted`` only requeues
+    running jobs whose lease has run out, so several processes can share
+    the queue without running a job twice. ``priorities`` maps a job kind
+    to a rank; lower ranks are claimed first and other kinds come last,
+    oldest first within a rank.
+    """
+
+    def __init__(self, db_path, priorities=None, lease_seconds=60.0, owner=None):
+        self.db_path = db_path
+        self.priorities = dict(priorities or {})
+        self.lease_seconds = lease_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Kinds come from code, not requests, so they are spelled into the ORDER BY
+        ranks = ' '.join(f"WHEN '{kind}' THEN {int(rank)}" for kind, rank in self.priorities.items())
+        last = max(self.priorities.values(), default=0) + 1
+        self._claim_order = f"CASE kind {ranks} ELSE {last} END, created_at" if ranks else 'created_at'
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                pages_done INTEGER NOT NULL DEFAULT 0,
+                pages_total INTEGER,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                owner TEXT,
+                lease_until REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, definition in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def submit(self, kind, payload):
+        """Queue a job and return its ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload), now, now)
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Return the public view of a job, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, result, error, pages_done, pages_total, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'result': json.loads(row[3]) if row[3] else None,
+            'error': row[4],
+            'progress': {'done': row[5], 'total': row[6]},
+            'created_at': row[7],
+            'updated_at': row[8]
+        }
+
+    def depth(self):
+        """Number of jobs waiting to be picked up"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+    def active_payloads(self):
+        """Payloads of the jobs that are queued or running"""
+        with self._lock:
+            rows = self._conn.execute("SELECT payload FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def claim(self):
+        """Atomically take the oldest queued job of the best rank; returns (id, kind, payload) or None"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT id, kind, payload FROM jobs WHERE status = ? ORDER BY {self._claim_order} LIMIT 1",
+                    (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, updated_at = ? WHERE id = ?",
+                        (RUNNING, self.owner, now + self.lease_seconds, now, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def heartbeat(self, job_ids):
+        """Renew the lease of running jobs this owner claimed; returns the IDs whose lease was lost"""
+        lost = []
+        now = time.time()
+        with self._lock:
+            for job_id in job_ids:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                    (now + self.lease_seconds, job_id, self.owner, RUNNING)
+                )
+                if not cursor.rowcount:
+                    lost.append(job_id)
+        return lost
+
+    def set_progress(self, job_id, done, total):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET pages_done = ?, pages_total = ?, updated_at = ? WHERE id = ?",
+                (done, total, time.time(), job_id)
+            )
+
+    def complete(self, job_id, result):
+        """Store a job's result, unless its lease was lost and another owner has it by now"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND (owner = ? OR owner IS NULL)",
+                (DONE, json.dumps(result), time.time(), job_id, self.owner)
+            )
+
+    def fail(self, job_id, error):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? "
+                "WHERE id = ? AND (owner = ? OR owner IS NULL)",
+                (FAILED, error, time.time(), job_id, self.owner)
+            )
+
+    def retry(self, job_id):
+        """Put a failed job back on the queue; returns False if it has not failed"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, owner = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                (QUEUED, time.time(), job_id, FAILED)
+            )
+        if cursor.rowcount:
+            self._wakeup.set()
+        return bool(cursor.rowcount)
+
+    def recover_interrupted(self, now=None):
+        """Requeue running jobs whose owner stopped renewing their lease; returns how many"""
+        now = now or time.time()
+        with self._lock:
+            # Jobs from before leases existed have none; they can only be left over from a stopped process
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, now, RUNNING, now)
+            )
+        if cursor.rowcount:
+            logger.info(f"Requeued {cursor.rowcount} interrupted OCR job(s)")
+            self._wakeup.set()
+        return cursor.rowcount
+
+    def prune(self, max_age, now=None):
+        """Delete finished and failed jobs not updated for ``max_age`` seconds; returns how many"""
+        cutoff = (now or time.time()) - max_age
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff)
+            )
+        return cursor.rowcount
+
+    def wait_for_work(self, timeout):
+        """Block until a job is submitted in this process or the timeout expires"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
+
+
+class JobWorkerPool:
+    """Background threads that run queued jobs outside the request threads.
+
+    ``handlers`` maps a job kind to ``handler(payload, progress)`` where
+    ``progress(done, total)`` records page progress; the handler's return
+    value is stored as the job result.
+
+    A heartbeat thread renews the leases of the jobs running here, requeues
+    jobs whose owner stopped renewing theirs (a crashed process) and drops
+    finished jobs older than ``retention`` seconds.
+    """
+
+    def __init__(self, queue, handlers, workers=2, poll_interval=1.0, retention=7 * 24 * 3600,
+                 prune_interval=3600):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.prune_interval = prune_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._running = set()
+        self._running_lock = threading.Lock()
+
+    def start(self):
+        self.queue.recover_interrupted()
+        self.queue.prune(self.retention)
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"ocr-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._maintain, name='ocr-job-heartbeat', daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def join(self):
+        """Block until the worker threads exit"""
+        for thread in self._threads:
+            thread.join()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                self.queue.wait_for_work(self.poll_interval)
+                continue
+            self.run_job(*job)
+
+    def _maintain(self):
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            try:
+                self.heartbeat()
+                self.queue.recover_interrupted()
+                if time.monotonic() - last_prune >= self.prune_interval:
+                    last_prune = time.monotonic()
+                    self.queue.prune(self.retention)
+            except Exception as e:
+                logger.error(f"OCR job heartbeat failed: {str(e)}")
+
+    def heartbeat(self):
+        """Renew the leases of the jobs running in this pool"""
+        with self._running_lock:
+            running = list(self._running)
+        for job_id in self.queue.heartbeat(running):
+            logger.warning(f"OCR job {job_id} lost its lease; its result will not be stored")
+
+    def run_job(self, job_id, kind, payload):
+        handler = self.handlers.get(kind)
+        if handler is None:
+            self.queue.fail(job_id, f"Unknown job type: {kind}")
+            return
+        with self._running_lock:
+            self._running.add(job_id)
+        try:
+            result = handler(payload, lambda done, total: self.queue.set_progress(job_id, done, total))
+            self.queue.complete(job_id, result)
+        except Exception as e:
+            logger.error(f"OCR job {job_id} failed: {str(e)}")
+            self.queue.fail(job_id, str(e))
+        finally:
+            with self._running_lock:
+                self._running.discard(job_id)
@@ -0,0 +1,142 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Fields stored for every processed paper, in column order
+FIELDS = ['course_code', 'exam_type', 'semester_type', 'academic_year', 'pdf_file', 'ocr_file', 'processed_date']
+
+# Columns that can be used as filters in find()
+INDEXED_FIELDS = ['course_code', 'exam_type', 'semester_type', 'academic_year']
+
+
+class MetadataStore:
+    """Interface for storing processed document metadata"""
+
+    def add(self, entry):
+        """Append one document entry"""
+        raise NotImplementedError
+
+    def find(self, **filters):
+        """Return entries matching all of the given indexed field values"""
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+
+class JSONMetadataStore(MetadataStore):
+    """Legacy store: a single JSON array rewritten on every insert.
+
+    Writes are serialised with a lock and replaced atomically, but each
+    insert still costs O(N). Kept for compatibility and as the migration
+    source.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            self._write([])
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                metadata = json.load(f)
+            return metadata if isinstance(metadata, list) else []
+        except (OSError, json.JSONDecodeError):
+            return []
+
+    def _write(self, metadata):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(metadata, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def add(self, entry):
+        with self._lock:
+            metadata = self._read()
+            metadata.append(entry)
+            self._write(metadata)
+
+    def find(self, **filters):
+        with self._lock:
+            metadata = self._read()
+        return [entry for entry in metadata
+                if all(entry.get(field) == value for field, value in filters.items())]
+
+    def count(self):
+        with self._lock:
+            return len(self._read())
+
+
+class SQLiteMetadataStore(MetadataStore):
+    """Append-only SQLite store with WAL and indexes on the lookup fields"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {', '.join(f'{field} TEXT' for field in FIELDS)}
+            )
+        """)
+        for field in INDEXED_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{field} ON documents ({field})")
+        self._conn.commit()
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        rows = [tuple(entry.get(field) for field in FIELDS) for entry in entries]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO documents ({', '.join(FIELDS)}) VALUES ({', '.join('?' for _ in FIELDS)})",
+                    rows
+                )
+
+    def find(self, **filters):
+        unknown = set(filters) - set(INDEXED_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter on: {', '.join(sorted(unknown))}")
+        where = ' AND '.join(f"{field} = ?" for field in filters)
+        query = f"SELECT {', '.join(FIELDS)} FROM documents"
+        if where:
+            query += f" WHERE {where}"
+        query += " ORDER BY id"
+        with self._lock:
+            rows = self._conn.execute(query, tuple(filters.values())).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+def open_metadata_store(backend, path):
+    """Create the metadata store for the configured backend ('sqlite' or 'json')"""
+    if backend == 'sqlite':
+        return SQLiteMetadataStore(path)
+    if backend == 'json':
+        return JSONMetadataStore(path)
+    raise ValueError(f"Unknown metadata backend: {backend}")
+
+
+def migrate_json_to_sqlite(json_path, store):
+    """Copy the entries of a legacy document_metadata.json into a SQLite store.
+
+    Returns the number of migrated entries. Entries without a course code
+    (e.g. leftovers from test_paths.py) are skipped.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    entries = [entry for entry in JSONMetadataStore(json_path).find() if entry.get('course_code')]
+    store.add_many(entries)
+    return len(entries)
@@ -0,0 +1,196 @@
+import bisect
+import sys
+import threading
+import time
+
+from exam_ocr.timing import StageTimer
+
+# Latency buckets in seconds, from sub-millisecond parsing up to whole documents
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Upload size buckets in bytes, up to the 16MB request limit
+SIZE_BUCKETS = (64 * 1024, 256 * 1024, 512 * 1024, 1024 * 1024, 2 * 1024 * 1024, 4 * 1024 * 1024,
+                8 * 1024 * 1024, 16 * 1024 * 1024)
+
+
+def _format_labels(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = ','.join(f'{name}="{str(value)}"' for name, value in zip(labelnames, values))
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labelvalues, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    labels = _format_labels(self.labelnames + ('le',), labelvalues + (le,))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class CallbackGauge:
+    """Gauge (or counter) whose value is read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {value}"]
+
+
+class MetricsRegistry:
+    """Collection of metrics exposed on /metrics.
+
+    When disabled nothing is recorded and no request hooks are installed,
+    so instrumentation costs a single attribute check.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+        self.stage_seconds = self.register(Histogram(
+            'ocr_stage_seconds', 'Time spent in each stage of the OCR pipeline', ['stage']))
+        self.page_ocr_seconds = self.register(Histogram(
+            'ocr_page_seconds', 'Rasterise plus OCR time per page'))
+        self.upload_bytes = self.register(Histogram(
+            'ocr_upload_bytes', 'Size of uploaded request bodies', ['endpoint'], buckets=SIZE_BUCKETS))
+        self.request_seconds = self.register(Histogram(
+            'ocr_http_request_seconds', 'HTTP request latency', ['endpoint', 'status']))
+        self.queue_wait_seconds = self.register(Histogram(
+            'ocr_queue_wait_seconds', 'Time a page waited for an OCR worker', ['priority']))
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, documentation, callback, kind='gauge'):
+        """Register a value that is read when /metrics is scraped"""
+        return self.register(CallbackGauge(name, documentation, callback, kind))
+
+    def observe_stage(self, stage, seconds):
+        if self.enabled:
+            self.stage_seconds.observe(seconds, stage)
+            if stage == 'page':
+                self.page_ocr_seconds.observe(seconds)
+
+    def observe_queue_wait(self, priority, seconds):
+        if self.enabled:
+            self.queue_wait_seconds.observe(seconds, priority)
+
+    def timer(self):
+        """A StageTimer that also feeds the stage histogram when metrics are enabled"""
+        return StageTimer(observer=self.observe_stage if self.enabled else None)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing_header(stages):
+    """Format stage durations (ms) as a Server-Timing header value"""
+    return ', '.join(f"{name};dur={ms:.1f}" for name, ms in stages.items())
+
+
+def request_timer(registry):
+    """The StageTimer of the current request, or a fresh one outside a request"""
+    # Only look for a request if Flask is loaded; workers and the CLI never import it
+    flask = sys.modules.get('flask')
+    if flask is not None and flask.has_request_context():
+        timer = flask.g.get('stage_timer')
+        if timer is None:
+            timer = flask.g.stage_timer = registry.timer()
+        return timer
+    return registry.timer()
+
+
+def init_app(app, registry):
+    """Install per-request timing, the Server-Timing header and the /metrics endpoint"""
+    from flask import Response, g, request
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        if not registry.enabled:
+            return Response('metrics disabled\n', status=404, mimetype='text/plain')
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+    if not registry.enabled:
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        g.stage_timer = registry.timer()
+        if request.method == 'POST' and request.content_length:
+            registry.upload_bytes.observe(request.content_length, request.endpoint or 'unknown')
+
+    @app.after_request
+    def finish_request_timer(response):
+        started = g.get('request_started')
+        if started is not None and request.endpoint != 'metrics':
+            registry.request_seconds.observe(time.perf_counter() - started,
+                                             request.endpoint or 'unknown', str(response.status_code))
+        timer = g.get('stage_timer')
+        if timer is not None and timer.stages:
+            response.headers['Server-Timing'] = server_timing_header(timer.stages)
+        return response
@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Word level of Tesseract's TSV output (page, block, paragraph, line, word)
+WORD_LEVEL = 5
+
+
+class PytesseractBackend:
+    """Runs the tesseract executable once per image (writes a temp file per call)"""
+
+    name = 'pytesseract'
+
+    def __init__(self, tesseract_cmd=None, lang='eng'):
+        self.tesseract_cmd = tesseract_cmd
+        self.lang = lang
+
+    def image_to_string(self, image):
+        import pytesseract
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        return pytesseract.image_to_string(image, lang=self.lang)
+
+    def image_to_data(self, image, psm=None):
+        import pytesseract
+        if self.tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
+        data = pytesseract.image_to_data(image, lang=self.lang, config=f'--psm {psm}' if psm else '',
+                                         output_type=pytesseract.Output.DICT)
+        words = []
+        for i, level in enumerate(data['level']):
+            if int(level) != WORD_LEVEL:
+                continue
+            left, top = int(data['left'][i]), int(data['top'][i])
+            words.append(((int(data['block_num'][i]), int(data['par_num'][i]), int(data['line_num'][i])),
+                          data['text'][i] or '', float(data['conf'][i]),
+                          (left, top, left + int(data['width'][i]), top + int(data['height'][i]))))
+        return words
+
+
+class TesserocrBackend:
+    """Keeps an initialised Tesseract API per thread and passes images in memory.
+
+    The language model is loaded once per thread instead of once per page,
+    and no temp image files are written. The C API is not thread safe, so
+    every thread that OCRs gets its own instance.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, tessdata_path=None, lang='eng'):
+        try:
+            import tesserocr
+        except ImportError:  # Optional: pip install tesserocr
+            raise RuntimeError("tesserocr is not installed")
+        self._tesserocr = tesserocr
+        self.tessdata_path = tessdata_path
+        self.lang = lang
+        self._local = threading.local()
+        # Fail now rather than on the first page if the model cannot be loaded
+        self._api()
+
+    def _api(self):
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            kwargs = {'lang': self.lang}
+            if self.tessdata_path:
+                kwargs['path'] = self.tessdata_path
+            api = self._local.api = self._tesserocr.PyTessBaseAPI(**kwargs)
+        return api
+
+    def image_to_string(self, image):
+        api = self._api()
+        api.SetImage(image)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image, psm=None):
+        RIL = self._tesserocr.RIL
+        api = self._api()
+        if psm is not None:
+            api.SetPageSegMode(psm)
+        api.SetImage(image)
+        try:
+            api.Recognize()
+            iterator = api.GetIterator()
+            if iterator is None:
+                return []
+            # Numbered like Tesseract's TSV output: paragraphs within blocks, lines within paragraphs
+            words = []
+            block = paragraph = line = 0
+            for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+                if word.IsAtBeginningOf(RIL.BLOCK):
+                    block, paragraph, line = block + 1, 0, 0
+                if word.IsAtBeginningOf(RIL.PARA):
+                    paragraph, line = paragraph + 1, 0
+                if word.IsAtBeginningOf(RIL.TEXTLINE):
+                    line += 1
+                words.append(((block, paragraph, line), word.GetUTF8Text(RIL.WORD) or '',
+                              word.Confidence(RIL.WORD), word.BoundingBox(RIL.WORD)))
+            return words
+        finally:
+            api.Clear()
+            if psm is not None:
+                api.SetPageSegMode(self._tesserocr.PSM.AUTO)
+
+
+def tessdata_dir(tesseract_cmd=None):
+    """The tessdata directory: $TESSDATA_PREFIX, or the one next to the tesseract executable"""
+    if os.environ.get('TESSDATA_PREFIX'):
+        return os.environ['TESSDATA_PREFIX']
+    if tesseract_cmd and os.path.dirname(tesseract_cmd):
+        candidate = os.path.join(os.path.dirname(tesseract_cmd), 'tessdata')
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+def create_backend(name='auto', tesseract_cmd=None, lang='eng'):
+    """Build an OCR backend: 'tesserocr', 'pytesseract' or 'auto' (tesserocr if it loads)"""
+    if name not in ('auto', 'tesserocr', 'pytesseract'):
+        raise ValueError(f"Unknown OCR backend: {name}")
+    if name in ('auto', 'tesserocr'):
+        try:
+            return TesserocrBackend(tessdata_dir(tesseract_cmd), lang=lang)
+        except Exception as e:
+            if name == 'tesserocr':
+                raise
+            logger.info(f"tesserocr unavailable ({str(e)}), falling back to pytesseract")
+    return PytesseractBackend(tesseract_cmd, lang=lang)
+
+
+_settings = None
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def configure(name='auto', tesseract_cmd=None, lang='eng'):
+    """Select the OCR backend used by ``image_to_string`` in this process.
+
+    The backend (and Tesseract with it) is only loaded on first use, so
+    processes that never OCR do not pay for it.
+    """
+    global _settings, _backend
+    if name not in ('auto', 'tesserocr', 'pytesseract'):
+        raise ValueError(f"Unknown OCR backend: {name}")
+    with _backend_lock:
+        _settings = (name, tesseract_cmd, lang)
+        _backend = None
+
+
+def get_backend():
+    """The configured backend, created on first use (pytesseract if none was configured)"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(*_settings) if _settings else PytesseractBackend()
+                logger.info(f"OCR backend: {_backend.name}")
+    return _backend
+
+
+def image_to_string(image):
+    """OCR a PIL image with the process-wide backend"""
+    return get_backend().image_to_string(image)
+
+
+def image_to_data(image, psm=None):
+    """OCR a PIL image into words with their confidence and position.
+
+    Returns ``[((block, paragraph, line), text, confidence, (left, top,
+    right, bottom))]`` in reading order; confidence is 0-100, or -1 for
+    layout entries without text. ``psm`` selects Tesseract's page
+    segmentation mode (e.g. 7 for a single text line).
+    """
+    return get_backend().image_to_data(image, psm)
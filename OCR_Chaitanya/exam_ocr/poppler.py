@@ -0,0 +1,90 @@
+import io
+import os
+import re
+import subprocess
+
+# A page needs at least this many real words before its text layer is trusted
+MIN_TEXT_LAYER_WORDS = 25
+
+WORD_PATTERN = re.compile(r'[A-Za-z0-9]{2,}')
+
+
+def poppler_tool(name, poppler_path=None):
+    """Path of a Poppler command line tool, honouring a configured install directory"""
+    return os.path.join(poppler_path, name) if poppler_path else name
+
+
+def pdf_input(pdf):
+    """Command line argument and stdin data for a PDF given as a path or as bytes.
+
+    Poppler tools read the document from stdin when the file name is '-',
+    so in-memory uploads never have to touch the disk.
+    """
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return '-', bytes(pdf)
+    return pdf, None
+
+
+def rasterise_page(pdf, page=1, dpi=200, poppler_path=None, timeout=120):
+    """Render one page of a PDF (path or bytes) to a PIL image with pdftoppm"""
+    from PIL import Image
+    arg, data = pdf_input(pdf)
+    result = subprocess.run(
+        [poppler_tool('pdftoppm', poppler_path), '-f', str(page), '-l', str(page), '-r', str(dpi), arg],
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+    )
+    if result.returncode != 0 or not result.stdout:
+        error = result.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"Failed to convert page {page} to image: {error or 'no output'}")
+    image = Image.open(io.BytesIO(result.stdout))
+    image.load()
+    return image
+
+
+def page_count(pdf, poppler_path=None, timeout=30):
+    """Number of pages of a PDF (path or bytes), read with pdfinfo"""
+    arg, data = pdf_input(pdf)
+    result = subprocess.run(
+        [poppler_tool('pdfinfo', poppler_path), arg],
+        input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+    )
+    match = re.search(r'^Pages:\s*(\d+)', result.stdout.decode('utf-8', errors='replace'), re.MULTILINE)
+    if result.returncode != 0 or match is None:
+        error = result.stderr.decode('utf-8', errors='replace').strip()
+        raise Exception(f"Failed to read the page count: {error or 'no output'}")
+    return int(match.group(1))
+
+
+def extract_text_layer(pdf, first_page=1, last_page=1, poppler_path=None, timeout=30):
+    """Return the embedded text of the given pages using pdftotext, or '' if there is none"""
+    arg, data = pdf_input(pdf)
+    try:
+        result = subprocess.run(
+            [poppler_tool('pdftotext', poppler_path), '-f', str(first_page), '-l', str(last_page),
+             '-layout', '-enc', 'UTF-8', arg, '-'],
+            input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return ''
+    if result.returncode != 0:
+        return ''
+    return result.stdout.decode('utf-8', errors='replace')
+
+
+def text_layer_quality(text):
+    """Measure how much usable text a page's text layer holds"""
+    words = WORD_PATTERN.findall(text)
+    visible = sum(1 for char in text if not char.isspace())
+    alnum = sum(len(word) for word in words)
+    return {
+        'words': len(words),
+        'chars': visible,
+        'alnum_ratio': round(alnum / visible, 3) if visible else 0.0
+    }
+
+
+def has_usable_text(text, min_words=MIN_TEXT_LAYER_WORDS):
+    """True if the text layer is rich enough to skip OCR"""
+    quality = text_layer_quality(text)
+    # Mostly symbols usually means a broken font encoding rather than real text
+    return quality['words'] >= min_words and quality['alnum_ratio'] >= 0.5
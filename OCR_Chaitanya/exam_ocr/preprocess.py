@@ -0,0 +1,102 @@
+# NumPy and PIL are imported by the functions that need them, so the
+# profile table can be read without loading either
+
+# Preprocessing steps per profile. ``dpi`` overrides the rasterisation
+# resolution, which is cheaper than rendering large and downscaling.
+PROFILES = {
+    'none': {},
+    'gray': {'grayscale': True},
+    'binary': {'grayscale': True, 'binarise': True},
+    'deskew': {'grayscale': True, 'deskew': True, 'binarise': True},
+    'fast': {'grayscale': True, 'binarise': True, 'dpi': 150},
+}
+
+# Skew search range and the smallest correction worth a rotation, in degrees
+MAX_SKEW = 5.0
+MIN_SKEW = 0.3
+
+# Pages are downscaled to this width before the skew search
+SKEW_SAMPLE_WIDTH = 800
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown preprocessing profile: {name} (choose from {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def profile_dpi(name, default):
+    """Rasterisation DPI for a profile, falling back to the caller's default"""
+    return get_profile(name).get('dpi') or default
+
+
+def otsu_threshold(histogram):
+    """Otsu's threshold for a 256-bin grayscale histogram"""
+    import numpy as np
+    histogram = np.asarray(histogram, dtype=np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(histogram)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(histogram * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between))
+
+
+def binarise(image):
+    """Black text on white using a global Otsu threshold"""
+    gray = image.convert('L')
+    threshold = otsu_threshold(gray.histogram())
+    return gray.point([255 if level > threshold else 0 for level in range(256)])
+
+
+def estimate_skew(image, max_angle=MAX_SKEW):
+    """Angle (degrees) that best aligns text lines with the rows of the image.
+
+    For small angles a rotation is close to shifting each column up or
+    down, so the dark pixels are sheared in NumPy for each candidate angle
+    and the angle whose row profile has the sharpest peaks wins.
+    """
+    import numpy as np
+    scale = min(1.0, SKEW_SAMPLE_WIDTH / image.width)
+    sample = image.convert('L')
+    if scale < 1.0:
+        sample = sample.resize((int(image.width * scale), max(1, int(image.height * scale))))
+    gray = np.asarray(sample)
+    ys, xs = np.nonzero(gray <= otsu_threshold(sample.histogram()))
+    if len(ys) < 100:
+        return 0.0
+
+    def score(angle):
+        rows = ys + np.round(xs * np.tan(np.radians(angle))).astype(np.int64)
+        counts = np.bincount(rows - rows.min())
+        return float(np.sum(counts.astype(np.float64) ** 2))
+
+    # Coarse 1 degree search, then refine around the best angle
+    best = max(np.arange(-max_angle, max_angle + 0.5, 1.0), key=score)
+    best = max(np.arange(best - 0.8, best + 0.9, 0.2), key=score)
+    return float(best)
+
+
+def deskew(image):
+    """Rotate the page so text lines are horizontal (no-op for tiny angles)"""
+    from PIL import Image
+    angle = estimate_skew(image)
+    if abs(angle) < MIN_SKEW:
+        return image
+    fill = 255 if image.mode in ('L', '1') else (255,) * len(image.getbands())
+    # The shear above moved rows down by x*tan(angle); rotating by angle undoes that
+    return image.rotate(-angle, resample=Image.BILINEAR, expand=False, fillcolor=fill)
+
+
+def preprocess(image, profile='none'):
+    """Apply a profile's steps to a page image before OCR"""
+    steps = get_profile(profile)
+    if steps.get('grayscale') and image.mode != 'L':
+        image = image.convert('L')
+    if steps.get('deskew'):
+        image = deskew(image)
+    if steps.get('binarise'):
+        image = binarise(image)
+    return image
@@ -0,0 +1,155 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Priority classes: a user waiting on the upload form, and full-document processing or batches
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+
+# Smoothing factor of the moving average of queue waits
+WAIT_ALPHA = 0.2
+
+
+class _Waiter:
+    __slots__ = ('enqueued', 'granted')
+
+    def __init__(self, enqueued):
+        self.enqueued = enqueued
+        self.granted = False
+
+
+class PriorityClass:
+    """Share of the OCR workers given to one kind of work.
+
+    When several classes have pages waiting, freed workers go to them in
+    proportion to ``weight``. A page that has waited ``max_wait`` seconds
+    starts anyway, one above the worker count, so the class's queueing
+    delay stays bounded however saturated the other classes are.
+    """
+
+    def __init__(self, weight=1, max_wait=None):
+        self.weight = weight
+        self.max_wait = max_wait
+        self.queue = deque()
+        self.pass_value = 0.0
+        self.active = 0
+        self.started = 0
+        self.overdue = 0
+        self.avg_wait = None
+        self.max_wait_seen = 0.0
+
+    def record_wait(self, seconds):
+        self.started += 1
+        self.max_wait_seen = max(self.max_wait_seen, seconds)
+        if self.avg_wait is None:
+            self.avg_wait = seconds
+        else:
+            self.avg_wait += WAIT_ALPHA * (seconds - self.avg_wait)
+
+
+class PriorityScheduler:
+    """Hands out the ``capacity`` OCR workers one page at a time, by priority class.
+
+    Every rasterise plus OCR of a page holds a worker from ``acquire`` to
+    ``release``. Waiting pages are served by stride scheduling: each class
+    advances its pass by ``1 / weight`` per page started and the class with
+    the lowest pass goes next, so backlogged classes share workers by
+    weight and an idle class builds up no credit. Since a page is the unit,
+    an interactive page overtakes a bulk document at its next page
+    boundary rather than after the whole document.
+
+    ``observer(name, seconds)``, if given, receives every page's queue wait.
+    """
+
+    def __init__(self, capacity, classes, observer=None):
+        self.capacity = capacity
+        self.classes = classes
+        self.observer = observer
+        self.active = 0
+        self._virtual = 0.0
+        self._cond = threading.Condition()
+
+    def _dispatch(self):
+        """Start waiting pages, lowest pass first, while workers are free (lock held)"""
+        granted = False
+        while self.active < self.capacity:
+            backlogged = [priority for priority in self.classes.values() if priority.queue]
+            if not backlogged:
+                break
+            priority = min(backlogged, key=lambda c: c.pass_value)
+            self._grant(priority, priority.queue.popleft())
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _grant(self, priority, waiter):
+        self._virtual = priority.pass_value
+        priority.pass_value += 1.0 / priority.weight
+        priority.active += 1
+        self.active += 1
+        waiter.granted = True
+
+    def acquire(self, name):
+        """Wait for a worker for a page of class ``name``; returns the seconds waited"""
+        priority = self.classes[name]
+        enqueued = time.monotonic()
+        waiter = _Waiter(enqueued)
+        with self._cond:
+            if not priority.queue:
+                # A class that was idle starts level with the others instead of with saved-up credit
+                priority.pass_value = max(priority.pass_value, self._virtual)
+            priority.queue.append(waiter)
+            self._dispatch()
+            while not waiter.granted:
+                if priority.max_wait is None:
+                    self._cond.wait()
+                    continue
+                remaining = enqueued + priority.max_wait - time.monotonic()
+                if remaining <= 0:
+                    # Past the class's bound: run beside the busy workers rather than wait longer
+                    priority.queue.remove(waiter)
+                    priority.overdue += 1
+                    self._grant(priority, waiter)
+                    break
+                self._cond.wait(remaining)
+            waited = time.monotonic() - enqueued
+            priority.record_wait(waited)
+        if self.observer is not None:
+            self.observer(name, waited)
+        return waited
+
+    def release(self, name):
+        with self._cond:
+            self.classes[name].active -= 1
+            self.active -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, name):
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self):
+        """Workers in use and per-class queue waits, for /health"""
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'active': self.active,
+                'classes': {
+                    name: {
+                        'weight': priority.weight,
+                        'max_wait': priority.max_wait,
+                        'active': priority.active,
+                        'waiting': len(priority.queue),
+                        'started': priority.started,
+                        'overdue': priority.overdue,
+                        'avg_wait_seconds': round(priority.avg_wait, 3) if priority.avg_wait is not None else None,
+                        'max_wait_seconds': round(priority.max_wait_seen, 3)
+                    }
+                    for name, priority in self.classes.items()
+                }
+            }
@@ -0,0 +1,159 @@
+import re
+import sqlite3
+import threading
+import time
+
+# Paper columns returned with every hit; all but the file names can be filtered on
+PAPER_FIELDS = ['course_code', 'exam_type', 'semester_type', 'academic_year', 'pdf_file', 'ocr_file']
+FILTER_FIELDS = ['course_code', 'exam_type', 'semester_type', 'academic_year']
+
+OCR_FILE_SUFFIX = '_ocr.txt'
+
+TERM_PATTERN = re.compile(r'\w+\*?', re.UNICODE)
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that matches all of its words.
+
+    Each word is quoted so that OCR noise and FTS syntax characters cannot
+    cause query errors; a trailing ``*`` keeps prefix matching.
+    """
+    terms = []
+    for term in TERM_PATTERN.findall(text):
+        if term.endswith('*'):
+            terms.append(f'"{term[:-1]}"*')
+        else:
+            terms.append(f'"{term}"')
+    if not terms:
+        raise ValueError("Search query has no words")
+    return ' '.join(terms)
+
+
+def paper_from_filename(ocr_file):
+    """Metadata encoded in a ``<course>_<exam_type>_<semester>_<year>_ocr.txt`` name"""
+    parts = ocr_file[:-len(OCR_FILE_SUFFIX)].split('_')
+    if len(parts) < 4:
+        return None
+    return {
+        'course_code': parts[0],
+        'exam_type': '_'.join(parts[1:-2]),
+        'semester_type': parts[-2],
+        'academic_year': parts[-1],
+        'pdf_file': ocr_file[:-len(OCR_FILE_SUFFIX)] + '.pdf',
+        'ocr_file': ocr_file
+    }
+
+
+class SearchIndex:
+    """Full-text index of processed papers' OCR text in SQLite FTS5.
+
+    ``papers`` holds one row per ``_ocr.txt`` file with the filterable
+    metadata; ``papers_fts`` holds the text under the same rowid and is
+    ranked with bm25 (``score`` in results, higher is better). Papers are
+    indexed one at a time as they are processed, and ``backfill`` indexes
+    existing files in bulk.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS papers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {', '.join(f'{field} TEXT' for field in PAPER_FIELDS)},
+                source_mtime REAL,
+                indexed_at REAL NOT NULL,
+                UNIQUE (ocr_file)
+            )
+        """)
+        for field in FILTER_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_papers_{field} ON papers ({field})")
+        # Prefix indexes keep "algo*"-style queries from scanning every matching term
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts "
+            "USING fts5(text, tokenize = 'porter unicode61', prefix = '2 3 4')"
+        )
+        self._conn.commit()
+
+    def _upsert(self, entry, text, source_mtime=None):
+        row = self._conn.execute("SELECT id FROM papers WHERE ocr_file = ?", (entry['ocr_file'],)).fetchone()
+        values = [entry.get(field) for field in PAPER_FIELDS] + [source_mtime, time.time()]
+        if row is None:
+            cursor = self._conn.execute(
+                f"INSERT INTO papers ({', '.join(PAPER_FIELDS)}, source_mtime, indexed_at) "
+                f"VALUES ({', '.join('?' for _ in values)})",
+                values
+            )
+            paper_id = cursor.lastrowid
+        else:
+            paper_id = row[0]
+            self._conn.execute(
+                f"UPDATE papers SET {', '.join(f'{field} = ?' for field in PAPER_FIELDS)}, "
+                f"source_mtime = ?, indexed_at = ? WHERE id = ?",
+                values + [paper_id]
+            )
+            self._conn.execute("DELETE FROM papers_fts WHERE rowid = ?", (paper_id,))
+        self._conn.execute("INSERT INTO papers_fts (rowid, text) VALUES (?, ?)", (paper_id, text))
+
+    def add(self, entry, text, source_mtime=None):
+        """Index (or re-index) one paper; ``entry`` needs at least ``ocr_file``"""
+        with self._lock:
+            with self._conn:
+                self._upsert(entry, text, source_mtime)
+
+    def backfill(self, text_store, entries=()):
+        """Index every ``*_ocr.txt`` in ``text_store`` that is new or changed since it was indexed.
+
+        Metadata comes from ``entries`` (e.g. the metadata store) when they
+        name the file, otherwise from the file name. Returns the number of
+        papers indexed.
+        """
+        known = {entry['ocr_file']: entry for entry in entries if entry.get('ocr_file')}
+        with self._lock:
+            indexed = dict(self._conn.execute("SELECT ocr_file, source_mtime FROM papers").fetchall())
+
+        count = 0
+        with self._lock:
+            with self._conn:
+                for name in text_store.names(OCR_FILE_SUFFIX):
+                    mtime = text_store.mtime(name)
+                    if indexed.get(name) == mtime:
+                        continue
+                    entry = known.get(name) or paper_from_filename(name)
+                    if entry is None:
+                        continue
+                    self._upsert(entry, text_store.get(name) or '', mtime)
+                    count += 1
+        return count
+
+    def search(self, query, limit=20, offset=0, **filters):
+        """Ranked papers matching all words of ``query``, with a highlighted snippet each"""
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Cannot filter on: {', '.join(sorted(unknown))}")
+        filters = {field: value for field, value in filters.items() if value}
+        sql = (
+            f"SELECT {', '.join(f'p.{field}' for field in PAPER_FIELDS)}, "
+            f"snippet(papers_fts, 0, '[', ']', '...', 16), papers_fts.rank "
+            f"FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid "
+            f"WHERE papers_fts MATCH ?"
+        )
+        for field in filters:
+            sql += f" AND p.{field} = ?"
+        # rank is bm25 by default, and ordering by it lets FTS5 skip a separate sort
+        sql += " ORDER BY papers_fts.rank LIMIT ? OFFSET ?"
+        params = [fts_query(query), *filters.values(), limit, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{
+            **dict(zip(PAPER_FIELDS, row)),
+            'snippet': row[len(PAPER_FIELDS)],
+            'score': round(-row[len(PAPER_FIELDS) + 1], 4)
+        } for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
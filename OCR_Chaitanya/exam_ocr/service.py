@@ -0,0 +1,661 @@
+import logging
+import os
+import uuid
+from datetime import datetime
+from functools import partial
+from urllib.parse import quote
+
+from exam_ocr import ocr_backend
+from exam_ocr.adaptive import AdaptiveOCR
+from exam_ocr.admission import AdmissionController, Saturated
+from exam_ocr.cache import OCRCache, hash_file, page_key, header_key, details_key
+from exam_ocr.catalogue import CourseCatalogue
+from exam_ocr.checkpoint import PageCheckpoints
+from exam_ocr.engine import OCREngine, crop_top, ocr_page_image
+from exam_ocr.extract import EXTRACTOR_VERSION, DETAIL_FIELDS, extract_details, extract_fields
+from exam_ocr.fileutil import stage_copy
+from exam_ocr.fingerprint import DuplicateIndex, jaccard
+from exam_ocr.jobs import JobQueue, JobWorkerPool
+from exam_ocr.metadata_store import open_metadata_store, migrate_json_to_sqlite
+from exam_ocr.metrics import MetricsRegistry, request_timer
+from exam_ocr.poppler import extract_text_layer, has_usable_text, rasterise_page, page_count
+from exam_ocr.preprocess import preprocess, profile_dpi
+from exam_ocr.scheduler import BULK, INTERACTIVE, PriorityClass, PriorityScheduler
+from exam_ocr.search import SearchIndex
+from exam_ocr.text_store import ArchiveCompactor, open_text_store, migrate_files_to_archive
+from exam_ocr.thumbnails import ThumbnailStore
+from exam_ocr.uploads import PDFSource, UploadSweeper
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_EXTENSIONS = {'pdf'}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def ocr_text_url(name):
+    """URL of a stored OCR text, served by GET /ocr_text/<name>"""
+    return f"/ocr_text/{quote(name)}"
+
+
+def detection_response(details):
+    """Shape detected details into the /detect_details response"""
+    return {
+        'success': True,
+        'course_code': details['course_code'],
+        'subject': details['subject'],
+        'exam_type': details['exam_type'],
+        'semester_type': details['semester_type'],
+        'acad_year': details['acad_year'],
+        'year': details['year'],
+        'confidence': details['confidence'],
+        'spans': details['spans'],
+        'text_source': details['text_source'],
+        'duplicate_of': details['duplicate_of'],
+        'timings': details['timings'],
+        'raw_ocr_text': details['raw_ocr_text']
+    }
+
+
+class OCRService:
+    """The OCR pipeline and its stores, independent of any web framework.
+
+    Opening a service creates the upload folder and the SQLite stores
+    under ``config.BASE_DIR``; nothing runs in the background until
+    ``start_background`` is called. Tesseract, Poppler, PIL and NumPy are
+    only loaded once a document actually needs OCR.
+    """
+
+    def __init__(self, config):
+        self.config = config
+
+        # Per-stage timing histograms served on /metrics
+        self.metrics = MetricsRegistry(enabled=config.METRICS_ENABLED)
+
+        # Caps concurrent OCR requests and answers 429/503 with Retry-After when saturated;
+        # single detections have their own slots so bulk processing cannot hold them all
+        self.admission = AdmissionController(config.MAX_CONCURRENT_OCR, config.MAX_OCR_WAITING,
+                                             config.OCR_ADMISSION_TIMEOUT)
+        self.detect_admission = AdmissionController(config.MAX_CONCURRENT_DETECT, config.MAX_DETECT_WAITING,
+                                                    config.OCR_ADMISSION_TIMEOUT)
+
+        # Shares the OCR workers page by page, interactive detections ahead of bulk documents
+        self.ocr_scheduler = PriorityScheduler(config.OCR_WORKERS, {
+            INTERACTIVE: PriorityClass(config.INTERACTIVE_WEIGHT, max_wait=config.INTERACTIVE_MAX_WAIT),
+            BULK: PriorityClass(1)
+        }, observer=self.metrics.observe_queue_wait)
+
+        os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+        if config.METADATA_BACKEND == 'sqlite':
+            metadata_is_new = not os.path.exists(config.METADATA_DB)
+            self.metadata_store = open_metadata_store('sqlite', config.METADATA_DB)
+            if metadata_is_new:
+                # One-shot import of the legacy JSON metadata
+                migrated = migrate_json_to_sqlite(config.METADATA_FILE, self.metadata_store)
+                if migrated:
+                    logger.info(f"Migrated {migrated} metadata entries from {config.METADATA_FILE}")
+        else:
+            self.metadata_store = open_metadata_store(config.METADATA_BACKEND, config.METADATA_FILE)
+
+        # OCR text of papers and uploads: compressed segments, or legacy files in uploads/
+        self.text_compactor = None
+        if config.OCR_TEXT_BACKEND == 'archive':
+            archive_is_new = not os.path.exists(config.TEXT_ARCHIVE_INDEX_FILE)
+            self.text_store = open_text_store('archive', config.TEXT_ARCHIVE_FOLDER, config.TEXT_ARCHIVE_INDEX_FILE,
+                                              segment_bytes=config.TEXT_SEGMENT_BYTES)
+            if archive_is_new:
+                # One-shot import of the text files; they are only deleted by `python -m exam_ocr migrate-text`
+                migrated = migrate_files_to_archive(config.UPLOAD_FOLDER, self.text_store)
+                if migrated:
+                    logger.info(f"Archived {migrated} OCR text files from {config.UPLOAD_FOLDER}")
+            self.text_compactor = ArchiveCompactor(self.text_store, max_age=config.UPLOAD_SWEEP_MAX_AGE,
+                                                   min_garbage=config.TEXT_COMPACT_GARBAGE,
+                                                   interval=config.TEXT_COMPACT_INTERVAL,
+                                                   max_bytes=config.UPLOAD_SWEEP_MAX_BYTES)
+        else:
+            self.text_store = open_text_store(config.OCR_TEXT_BACKEND, config.UPLOAD_FOLDER)
+
+        # Tesseract is loaded on the first OCR call
+        ocr_backend.configure(config.OCR_BACKEND, config.TESSERACT_PATH)
+
+        # Re-reads the lines Tesseract is unsure of at a higher resolution, instead of whole pages
+        self.adaptive_ocr = AdaptiveOCR(config.ADAPTIVE_DPI, config.ADAPTIVE_MIN_CONFIDENCE,
+                                        config.ADAPTIVE_MAX_REGIONS) if config.OCR_ADAPTIVE else None
+
+        # OCR results keyed by the SHA-256 of the uploaded PDF
+        self.ocr_cache = OCRCache(config.OCR_CACHE_FILE, max_bytes=config.OCR_CACHE_MAX_BYTES)
+
+        # Shared pool of Tesseract workers for multi-page documents
+        self.ocr_engine = OCREngine(config.TESSERACT_PATH, max_workers=config.OCR_WORKERS,
+                                    observer=self.metrics.observe_stage, backend=config.OCR_BACKEND,
+                                    profile=config.OCR_PROFILE, thumbnail_widths=config.THUMBNAIL_WIDTHS,
+                                    thumbnail_quality=config.THUMBNAIL_QUALITY, scheduler=self.ocr_scheduler,
+                                    adaptive=self.adaptive_ocr)
+
+        # Durable queue for OCR requests submitted in async mode; detections are picked up first
+        self.job_queue = JobQueue(config.JOB_QUEUE_FILE, priorities={'detect': 0, 'process': 1},
+                                  lease_seconds=config.JOB_LEASE_SECONDS)
+
+        # Page text of documents still being processed, so a retry resumes where it failed
+        self.page_checkpoints = PageCheckpoints(config.CHECKPOINT_FILE)
+        self.page_checkpoints.prune(config.CHECKPOINT_MAX_AGE)
+
+        # Course codes and titles, compiled into a matcher and reloaded when the file changes
+        self.course_catalogue = CourseCatalogue(config.COURSE_CATALOGUE_FILE)
+
+        # Page previews, encoded from the images that are OCR'd anyway
+        self.thumbnails = ThumbnailStore(config.THUMBNAIL_FOLDER, config.THUMBNAIL_INDEX_FILE)
+
+        # Full-text index over the processed papers' OCR text
+        search_index_is_new = not os.path.exists(config.SEARCH_INDEX_FILE)
+        self.search_index = SearchIndex(config.SEARCH_INDEX_FILE)
+        if search_index_is_new:
+            # One-shot bulk index of the papers processed before the index existed
+            indexed = self.search_index.backfill(self.text_store, self.metadata_store.find())
+            if indexed:
+                logger.info(f"Indexed {indexed} existing OCR text files for search")
+
+        # MinHash/LSH fingerprints of processed papers' first pages
+        duplicate_index_is_new = not os.path.exists(config.DUPLICATE_INDEX_FILE)
+        self.duplicate_index = DuplicateIndex(config.DUPLICATE_INDEX_FILE, threshold=config.DUPLICATE_THRESHOLD)
+        if duplicate_index_is_new:
+            fingerprinted = self.duplicate_index.backfill(self.text_store, self.metadata_store.find())
+            if fingerprinted:
+                logger.info(f"Fingerprinted {fingerprinted} existing papers for duplicate detection")
+
+        # Reclaims stale temp_ and raw_ocr_ files in the upload folder, except the inputs of pending jobs
+        self.upload_sweeper = UploadSweeper(config.UPLOAD_FOLDER, max_age=config.UPLOAD_SWEEP_MAX_AGE,
+                                            max_bytes=config.UPLOAD_SWEEP_MAX_BYTES, keep=self.job_inputs)
+
+        self.job_workers = JobWorkerPool(self.job_queue, {
+            'detect': self.run_detect_job,
+            'process': self.run_process_job
+        }, workers=config.JOB_WORKERS, retention=config.JOB_RETENTION)
+
+        metrics, admission, detect_admission, ocr_cache = self.metrics, self.admission, self.detect_admission, \
+            self.ocr_cache
+        metrics.gauge('ocr_job_queue_depth', 'Jobs waiting for a worker', self.job_queue.depth)
+        metrics.gauge('ocr_admission_active', 'Requests holding an OCR slot', lambda: admission.active)
+        metrics.gauge('ocr_admission_waiting', 'Requests waiting for an OCR slot', lambda: admission.waiting)
+        metrics.gauge('ocr_admission_rejected_total', 'Requests turned away with 429/503',
+                      lambda: admission.rejected, kind='counter')
+        metrics.gauge('ocr_detect_admission_active', 'Detections holding a detection slot',
+                      lambda: detect_admission.active)
+        metrics.gauge('ocr_detect_admission_waiting', 'Detections waiting for a detection slot',
+                      lambda: detect_admission.waiting)
+        metrics.gauge('ocr_detect_admission_rejected_total', 'Detections turned away with 429/503',
+                      lambda: detect_admission.rejected, kind='counter')
+        metrics.gauge('ocr_cache_hits_total', 'OCR cache hits since start', lambda: ocr_cache.hits, kind='counter')
+        metrics.gauge('ocr_cache_misses_total', 'OCR cache misses since start', lambda: ocr_cache.misses,
+                      kind='counter')
+        metrics.gauge('ocr_cache_hit_ratio', 'Share of OCR cache lookups that hit',
+                      lambda: ocr_cache.stats()['hit_rate'])
+        metrics.gauge('ocr_cache_bytes', 'Size of the cached OCR results', lambda: ocr_cache.stats()['bytes'])
+
+    def start_background(self, workers=None):
+        """Start the job workers (``workers`` overrides JOB_WORKERS) and the upload sweeper"""
+        if workers is not None:
+            self.job_workers.workers = workers
+        if self.job_workers.workers > 0:
+            self.job_workers.start()
+        self.upload_sweeper.start()
+        if self.text_compactor is not None:
+            self.text_compactor.start()
+
+    def stop_background(self):
+        self.job_workers.stop()
+        self.upload_sweeper.stop()
+        if self.text_compactor is not None:
+            self.text_compactor.stop()
+        self.ocr_engine.shutdown()
+
+    def health(self):
+        """Detection slots, worker scheduling and job backlog reported on /health next to the OCR slots"""
+        return {'detect': self.detect_admission.load(),
+                'scheduler': self.ocr_scheduler.stats(),
+                'jobs': {'queued': self.job_queue.depth(), 'max_queued': self.config.MAX_QUEUED_JOBS,
+                         'workers': self.job_workers.workers}}
+
+    def job_inputs(self):
+        """Uploaded files of queued and running jobs, which the sweeper must leave alone"""
+        return [payload['pdf_path'] for payload in self.job_queue.active_payloads() if payload.get('pdf_path')]
+
+    def reindex(self):
+        """Index and fingerprint _ocr.txt files that are new or changed; returns (indexed, fingerprinted)"""
+        entries = self.metadata_store.find()
+        return (self.search_index.backfill(self.text_store, entries),
+                self.duplicate_index.backfill(self.text_store, entries))
+
+    def first_page_text_without_ocr(self, pdf, doc_hash):
+        """Page 1 text from the cache or the PDF's own text layer; (None, None) if OCR is needed
+
+        ``pdf`` is a file path or the document's bytes. Counts as the
+        detection's one cache lookup.
+        """
+        text = self.ocr_cache.get(doc_hash, page_key(1))
+        if text is None:
+            text = self.ocr_cache.get(doc_hash, header_key(1))
+        self.ocr_cache.record(text is not None)
+        if text is not None:
+            return text, 'cache'
+
+        if self.config.TEXT_LAYER_FAST_PATH:
+            # Born-digital papers (Word, LaTeX) already carry their text
+            text = extract_text_layer(pdf, poppler_path=self.config.POPPLER_PATH)
+            if has_usable_text(text):
+                self.ocr_cache.put(doc_hash, page_key(1), text)
+                return text, 'text_layer'
+
+        return None, None
+
+    def save_thumbnails(self, doc_hash, page, thumbnails):
+        """Store a page's encoded thumbnails; previews never fail the OCR around them"""
+        try:
+            self.thumbnails.put(doc_hash, page, thumbnails)
+        except Exception as e:
+            logger.error(f"Error saving thumbnails: {str(e)}")
+
+    def header_is_sufficient(self, text):
+        """True if the header band alone yields a course code and a date"""
+        fields = extract_fields(text, self.course_catalogue)
+        return bool(fields['course_code']['value']) and fields['date']['value'] is not None
+
+    def find_duplicate(self, text, text_source, details=None):
+        """An already processed paper whose first page matches this text, or None
+
+        Header bands are only compared with header bands. Headers of different
+        papers from the same course look alike, so a header match also needs
+        the detected ``details`` to agree with the stored paper.
+        """
+        if not self.config.DEDUP_ENABLED:
+            return None
+        if text_source == 'ocr_header':
+            kinds = ('header',)
+        elif text_source == 'cache':
+            kinds = ('page', 'header')
+        else:
+            kinds = ('page',)
+        match = self.duplicate_index.find(text, kinds)
+        if match and match['kind'] == 'header':
+            existing = match['metadata']
+            if details is None or (existing.get('course_code'), existing.get('exam_type'),
+                                   existing.get('semester_type'), existing.get('academic_year')) != (
+                    details['course_code'], details['exam_type'], details['semester_type'], details['acad_year']):
+                return None
+        return match
+
+    def details_from_text(self, pdf_name, doc_hash, text, text_source, timer=None):
+        """Save the raw first-page text and detect document details from it"""
+        timer = timer or self.metrics.timer()
+
+        # Save raw OCR text to file
+        with timer.stage('write_raw'):
+            raw_text_name = f"raw_ocr_{os.path.basename(pdf_name).replace('.pdf', '.txt')}"
+            self.text_store.put(raw_text_name, text)
+
+        # Reuse previously detected details for the same document, catalogue and extractor
+        self.course_catalogue.reload_if_changed()
+        cache_key = details_key(f"{EXTRACTOR_VERSION}:{self.course_catalogue.version}")
+        details = self.ocr_cache.get(doc_hash, cache_key)
+        if details is None:
+            with timer.stage('parse'):
+                details = extract_details(text, self.course_catalogue)
+            self.ocr_cache.put(doc_hash, cache_key, details)
+
+        # A re-upload of a processed paper gets that paper's confirmed details
+        with timer.stage('dedupe'):
+            duplicate = self.find_duplicate(text, text_source, details)
+        if duplicate:
+            existing = duplicate['metadata']
+            details = {
+                'course_code': existing.get('course_code'),
+                'subject': self.course_catalogue.title(existing.get('course_code')),
+                'exam_type': existing.get('exam_type'),
+                'semester_type': existing.get('semester_type'),
+                'acad_year': existing.get('academic_year'),
+                'year': details['year'],
+                # Confirmed when that paper was processed
+                'confidence': {**details['confidence'], **dict.fromkeys(DETAIL_FIELDS[:4], 1.0)},
+                'spans': {**details['spans'], **dict.fromkeys(DETAIL_FIELDS[:4])}
+            }
+
+        return {
+            **details,
+            'duplicate_of': {
+                'pdf_file': duplicate['metadata'].get('pdf_file'),
+                'ocr_file': duplicate['metadata'].get('ocr_file'),
+                'similarity': duplicate['similarity']
+            } if duplicate else None,
+            'text_source': text_source,
+            'timings': timer.as_dict(),
+            'raw_ocr_file': raw_text_name,
+            'raw_ocr_text': text
+        }
+
+    def detect_document_details(self, pdf, priority=INTERACTIVE):
+        """Detect all document details from the PDF (a file path or a PDFSource)
+
+        OCR starts with the header band of page 1 at DETECT_DPI and only
+        expands to the full page when the header lacks a course code or date.
+        The page holds an OCR worker of the scheduler's ``priority`` class.
+        """
+        config = self.config
+        source = pdf if isinstance(pdf, PDFSource) else PDFSource.from_path(pdf)
+        timer = request_timer(self.metrics)
+        try:
+            with timer.stage('hash'):
+                doc_hash = source.hash()
+            with timer.stage('text_layer'):
+                text, text_source = self.first_page_text_without_ocr(source.pdf, doc_hash)
+
+            if text is None:
+                with timer.stage('queue'):
+                    self.ocr_scheduler.acquire(priority)
+                try:
+                    # Convert first page of PDF to image; in-memory uploads are piped to Poppler
+                    dpi = profile_dpi(config.OCR_PROFILE, config.DETECT_DPI)
+                    with timer.stage('rasterise'):
+                        image = rasterise_page(source.pdf, 1, dpi=dpi, poppler_path=config.POPPLER_PATH)
+                    with timer.stage('preprocess'):
+                        image = preprocess(image, config.OCR_PROFILE)
+
+                    # Perform OCR on the header band first
+                    if config.HEADER_FRACTION < 1:
+                        with timer.stage('ocr_header'):
+                            header_text = ocr_page_image(crop_top(image, config.HEADER_FRACTION), source.pdf, 1,
+                                                         config.POPPLER_PATH, dpi, config.OCR_PROFILE,
+                                                         self.adaptive_ocr)
+                        with timer.stage('parse_header'):
+                            if self.header_is_sufficient(header_text):
+                                text, text_source = header_text, 'ocr_header'
+                                self.ocr_cache.put(doc_hash, header_key(1), text)
+
+                    # Fall back to the whole first page
+                    if text is None:
+                        with timer.stage('ocr_full'):
+                            text = ocr_page_image(image, source.pdf, 1, config.POPPLER_PATH, dpi, config.OCR_PROFILE,
+                                                  self.adaptive_ocr)
+                        text_source = 'ocr'
+                        self.ocr_cache.put(doc_hash, page_key(1), text)
+                finally:
+                    self.ocr_scheduler.release(priority)
+
+            return self.details_from_text(source.name, doc_hash, text, text_source, timer)
+
+        except Exception as e:
+            raise Exception(f"Failed to detect document details: {str(e)}")
+
+    def detect_many(self, pdfs, priority=BULK):
+        """Detect details for many PDFs, yielding (pdf, details, error) as each finishes
+
+        ``pdfs`` are file paths or PDFSources and are yielded back unchanged.
+        Cached and born-digital documents are answered straight away; the rest
+        share the OCR worker pool for their first page, as ``priority`` work.
+        """
+        config = self.config
+        pending = []
+        for pdf in pdfs:
+            try:
+                source = pdf if isinstance(pdf, PDFSource) else PDFSource.from_path(pdf)
+                text, text_source = self.first_page_text_without_ocr(source.pdf, source.hash())
+                if text is None:
+                    pending.append((pdf, source))
+                    continue
+                yield pdf, self.details_from_text(source.name, source.hash(), text, text_source), None
+            except Exception as e:
+                yield pdf, None, e
+
+        header_only = config.HEADER_FRACTION < 1
+        ocr_results = self.ocr_engine.ocr_first_pages(
+            [source.pdf for _, source in pending], poppler_path=config.POPPLER_PATH, dpi=config.DETECT_DPI,
+            top_fraction=config.HEADER_FRACTION if header_only else None, priority=priority)
+        for index, text, error in ocr_results:
+            pdf, source = pending[index]
+            if error is not None:
+                yield pdf, None, error
+                continue
+            try:
+                doc_hash = source.hash()
+                if header_only and self.header_is_sufficient(text):
+                    text_source = 'ocr_header'
+                    self.ocr_cache.put(doc_hash, header_key(1), text)
+                else:
+                    if header_only:
+                        # The header was not enough; OCR the whole first page
+                        _, text = next(self.ocr_engine.ocr_pdf_pages(source.pdf, [1], poppler_path=config.POPPLER_PATH,
+                                                                     dpi=config.DETECT_DPI, priority=priority))
+                    text_source = 'ocr'
+                    self.ocr_cache.put(doc_hash, page_key(1), text)
+                yield pdf, self.details_from_text(source.name, doc_hash, text, text_source), None
+            except Exception as e:
+                yield pdf, None, e
+
+    def save_document_metadata(self, details, pdf_filename, ocr_filename):
+        """Save document metadata to the metadata store and return the entry"""
+        document_info = {
+            'course_code': details['course_code'],
+            'exam_type': details['exam_type'],
+            'semester_type': details['semester_type'],
+            'academic_year': details['acad_year'],
+            'pdf_file': pdf_filename,
+            'ocr_file': ocr_filename,
+            'processed_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self.metadata_store.add(document_info)
+        return document_info
+
+    def process_confirmed_pdf(self, pdf_path, details, progress=None, priority=BULK):
+        """Process PDF with confirmed details
+
+        Each page's text is checkpointed as soon as it is OCR'd. If processing
+        fails, the uploaded PDF is kept and running it again (a job retry or
+        the same upload) resumes from the first page without a checkpoint.
+        The ``_ocr.txt`` text (in the text store), the renamed PDF and the
+        metadata entry are only written once every page is done; text and
+        PDF are staged and only replace a paper of the same name once the
+        metadata entry is written.
+
+        Thumbnails of every page are written from the images that are OCR'd
+        (see ``exam_ocr.thumbnails``) and served under the paper's name.
+
+        Pages are OCR'd as ``priority`` work of the scheduler, so interactive
+        detections go ahead of them at every page boundary.
+
+        ``progress(done, total)`` is called after each page is finished.
+        Returns the name the OCR text is stored under in the text store.
+        """
+        config = self.config
+        ocr_cache, page_checkpoints, ocr_engine = self.ocr_cache, self.page_checkpoints, self.ocr_engine
+        text_store = self.text_store
+        timer = request_timer(self.metrics)
+        try:
+            with timer.stage('hash'):
+                doc_hash = hash_file(pdf_path)
+            on_thumbnails = partial(self.save_thumbnails, doc_hash) if config.THUMBNAIL_WIDTHS else None
+            with timer.stage('pdfinfo'):
+                total_pages = page_count(pdf_path, poppler_path=config.POPPLER_PATH)
+
+            # Pages finished by an earlier attempt, or already OCR'd (e.g. page 1 during detection)
+            checkpoints = page_checkpoints.load(doc_hash)
+            page_texts = {page: checkpoints.get(page) or ocr_cache.get(doc_hash, page_key(page))
+                          for page in range(1, total_pages + 1)}
+            # One cache lookup per document: a hit when no page is left to OCR
+            ocr_cache.record(all(text is not None for text in page_texts.values()))
+            if checkpoints:
+                logger.info(f"Resuming {os.path.basename(pdf_path)}: "
+                            f"{len(checkpoints)}/{total_pages} pages already done")
+
+            # Create filename with confirmed details
+            base_name = f"{details['course_code']}_{details['exam_type']}_{details['semester_type']}_{details['acad_year']}"
+            new_pdf_path = os.path.join(config.UPLOAD_FOLDER, f"{base_name}.pdf")
+            new_text_name = f"{base_name}_ocr.txt"
+
+            # Another scan of an already processed paper reuses that paper's OCR text
+            duplicate = None
+            if config.DEDUP_ENABLED:
+                if page_texts[1] is None:
+                    with timer.stage('ocr_pages'):
+                        _, page_texts[1] = next(ocr_engine.ocr_pdf_pages(pdf_path, [1],
+                                                                         poppler_path=config.POPPLER_PATH,
+                                                                         on_thumbnails=on_thumbnails,
+                                                                         priority=priority))
+                    ocr_cache.put(doc_hash, page_key(1), page_texts[1])
+                    page_checkpoints.save(doc_hash, 1, page_texts[1])
+                with timer.stage('dedupe'):
+                    duplicate = self.find_duplicate(page_texts[1], 'ocr')
+                existing_text_name = duplicate['metadata'].get('ocr_file') if duplicate else None
+                if duplicate and not (existing_text_name and text_store.exists(existing_text_name)):
+                    duplicate = None
+
+                # Papers can share a cover or instructions page, so the page counts and last pages must match too
+                if duplicate and text_store.page_count(existing_text_name) != total_pages:
+                    duplicate = None
+                if duplicate and total_pages > 1:
+                    if page_texts[total_pages] is None:
+                        with timer.stage('ocr_pages'):
+                            _, page_texts[total_pages] = next(ocr_engine.ocr_pdf_pages(
+                                pdf_path, [total_pages], poppler_path=config.POPPLER_PATH,
+                                on_thumbnails=on_thumbnails, priority=priority))
+                        ocr_cache.put(doc_hash, page_key(total_pages), page_texts[total_pages])
+                        page_checkpoints.save(doc_hash, total_pages, page_texts[total_pages])
+                    with timer.stage('dedupe'):
+                        last_page_similarity = jaccard(page_texts[total_pages],
+                                                       text_store.get_page(existing_text_name, total_pages) or '')
+                    if last_page_similarity < self.duplicate_index.threshold:
+                        duplicate = None
+            first_page_text = page_texts[1]
+
+            if duplicate:
+                logger.info(f"{os.path.basename(pdf_path)} duplicates {duplicate['paper']} "
+                            f"(similarity {duplicate['similarity']}); skipping OCR")
+                if progress:
+                    progress(total_pages, total_pages)
+            else:
+                # Remaining pages are rasterised and OCR'd one at a time in the worker pool
+                missing = [page for page, text in page_texts.items() if text is None]
+                ocr_results = ocr_engine.ocr_pdf_pages(pdf_path, missing, poppler_path=config.POPPLER_PATH,
+                                                       on_thumbnails=on_thumbnails, priority=priority)
+
+                # Checkpoint each page's OCR text as soon as it is available
+                document_pages = []
+                with timer.stage('ocr_pages'):
+                    for page in range(1, total_pages + 1):
+                        text = page_texts.pop(page)
+                        if text is None:
+                            _, text = next(ocr_results)
+                            ocr_cache.put(doc_hash, page_key(page), text)
+                        if page not in checkpoints:
+                            page_checkpoints.save(doc_hash, page, text)
+                        document_pages.append(text)
+                        if progress:
+                            progress(page, total_pages)
+
+            # Commit: OCR text and PDF are staged under temp_ names and moved into place once the
+            # metadata entry is written, so a failure never touches a paper already stored under these names
+            with timer.stage('commit'):
+                staged_text_name = staged_pdf_path = None
+                try:
+                    if duplicate:
+                        # Shares the existing paper's text (in the archive without copying any bytes)
+                        if existing_text_name != new_text_name:
+                            staged_text_name = f"temp_{uuid.uuid4().hex}_{base_name}.txt"
+                            text_store.copy(existing_text_name, staged_text_name)
+                    else:
+                        staged_text_name = f"temp_{uuid.uuid4().hex}_{base_name}.txt"
+                        text_store.put_pages(staged_text_name, document_pages)
+                    if os.path.abspath(pdf_path) != os.path.abspath(new_pdf_path):
+                        staged_pdf_path = stage_copy(pdf_path, config.UPLOAD_FOLDER)
+                    document_info = self.save_document_metadata(
+                        details,
+                        os.path.basename(new_pdf_path),
+                        new_text_name
+                    )
+                    if staged_text_name is not None:
+                        text_store.rename(staged_text_name, new_text_name)
+                        staged_text_name = None
+                    if staged_pdf_path is not None:
+                        os.replace(staged_pdf_path, new_pdf_path)
+                        staged_pdf_path = None
+                except Exception:
+                    if staged_text_name is not None:
+                        text_store.delete(staged_text_name)
+                    if staged_pdf_path is not None and os.path.exists(staged_pdf_path):
+                        os.remove(staged_pdf_path)
+                    raise
+                page_checkpoints.clear(doc_hash)
+                if os.path.abspath(pdf_path) != os.path.abspath(new_pdf_path):
+                    os.remove(pdf_path)
+
+            # Make the paper searchable straight away
+            with timer.stage('search_index'):
+                try:
+                    self.search_index.add(document_info, text_store.get(new_text_name),
+                                          text_store.mtime(new_text_name))
+                except Exception as e:
+                    logger.error(f"Error indexing OCR text: {str(e)}")
+
+            # Previews of pages that needed no rendering (cached or resumed text), under the paper's name
+            if config.THUMBNAIL_WIDTHS:
+                with timer.stage('thumbnails'):
+                    try:
+                        # A duplicate shows the scan whose text it reuses, if that one has previews
+                        preview_hash = duplicate and self.thumbnails.paper_document(
+                            duplicate['metadata'].get('pdf_file') or '')
+                        if not preview_hash:
+                            preview_hash = doc_hash
+                            unrendered = self.thumbnails.missing_pages(doc_hash, range(1, total_pages + 1))
+                            for page, encoded in ocr_engine.thumbnail_pages(new_pdf_path, unrendered,
+                                                                            poppler_path=config.POPPLER_PATH,
+                                                                            dpi=config.THUMBNAIL_DPI,
+                                                                            priority=priority):
+                                self.thumbnails.put(doc_hash, page, encoded)
+                        self.thumbnails.link(base_name, preview_hash)
+                    except Exception as e:
+                        logger.error(f"Error creating page previews: {str(e)}")
+
+            # Fingerprint the first page (and its header band, if detection OCR'd one) for later re-uploads
+            if config.DEDUP_ENABLED:
+                with timer.stage('fingerprint'):
+                    try:
+                        self.duplicate_index.add(document_info['ocr_file'], 'page', first_page_text, document_info,
+                                                 text_store.mtime(new_text_name))
+                        header_text = ocr_cache.get(doc_hash, header_key(1))
+                        if header_text:
+                            self.duplicate_index.add(document_info['ocr_file'], 'header', header_text, document_info)
+                    except Exception as e:
+                        logger.error(f"Error fingerprinting paper: {str(e)}")
+
+            return new_text_name
+
+        except Exception as e:
+            # The upload is kept so that a retry can resume from the checkpointed pages
+            raise Exception(f"PDF processing failed: {str(e)}")
+
+    def run_detect_job(self, payload, progress):
+        """Job handler for async /detect_details requests"""
+        filepath = payload['pdf_path']
+        progress(0, 1)
+        try:
+            details = self.detect_document_details(filepath)
+        finally:
+            # Detection never keeps the upload; the client sends it again with /process_file
+            if os.path.exists(filepath):
+                os.remove(filepath)
+        progress(1, 1)
+        return detection_response(details)
+
+    def run_process_job(self, payload, progress):
+        """Job handler for async /process_file requests"""
+        ocr_file = self.process_confirmed_pdf(payload['pdf_path'], payload['details'], progress=progress)
+        return {
+            'message': 'File processed successfully',
+            'ocr_file': ocr_file,
+            'ocr_url': ocr_text_url(ocr_file)
+        }
+
+    def admit_job(self):
+        """Refuse async submissions while the job queue is full"""
+        if self.config.MAX_QUEUED_JOBS and self.job_queue.depth() >= self.config.MAX_QUEUED_JOBS:
+            raise Saturated("OCR job queue is full", 503, self.admission.retry_after())
@@ -0,0 +1,549 @@
+import fnmatch
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+from exam_ocr.fileutil import write_atomic, copy_atomic
+
+logger = logging.getLogger(__name__)
+
+# Text files of the legacy layout, all in the upload folder
+TEXT_FILE_PATTERNS = ('*_ocr.txt', 'raw_ocr_*', 'manual_ocr_*')
+
+# Leftovers that expire like the upload sweeper's files: raw detection text,
+# and text staged by a commit that never finished
+EXPIRING_PREFIXES = ('raw_ocr_', 'temp_')
+
+# A new segment is started once the active one reaches this size
+SEGMENT_BYTES = 64 * 1024 * 1024
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+PAGE_HEADER = re.compile(r'^=== Page (\d+) ===\n', re.MULTILINE)
+
+
+def format_pages(pages):
+    """A processed paper's text: each page under an ``=== Page N ===`` line"""
+    return ''.join(f"=== Page {number} ===\n{text}\n\n" for number, text in enumerate(pages, start=1))
+
+
+def split_pages(text):
+    """The page texts of ``format_pages`` output, or None if ``text`` is not exactly that"""
+    headers = list(PAGE_HEADER.finditer(text))
+    if not headers or headers[0].start() != 0:
+        return None
+    pages = []
+    for number, header in enumerate(headers, start=1):
+        if int(header.group(1)) != number:
+            return None
+        end = headers[number].start() if number < len(headers) else len(text)
+        pages.append(text[header.end():end][:-2])
+    return pages if format_pages(pages) == text else None
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:  # Optional: pip install zstandard
+        return None
+    return zstandard
+
+
+def compress(data):
+    """``(codec, compressed)``: zstd when the zstandard package is installed, else zlib"""
+    zstandard = _zstd()
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return 'zlib', zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        zstandard = _zstd()
+        if zstandard is None:
+            raise RuntimeError("This archive holds zstd records; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+class TextStore:
+    """Interface for OCR text kept under file names like ``CSC201_..._ocr.txt``.
+
+    Processed papers are stored page by page with ``put_pages``; anything
+    else (raw detection text, manual corrections) as a whole with ``put``.
+    """
+
+    def put(self, name, text, mtime=None):
+        raise NotImplementedError
+
+    def put_pages(self, name, pages, mtime=None):
+        raise NotImplementedError
+
+    def get(self, name):
+        """The whole text, or None"""
+        raise NotImplementedError
+
+    def get_page(self, name, page):
+        """One page (1-based) of a processed paper, or None"""
+        raise NotImplementedError
+
+    def page_count(self, name):
+        """Number of pages of a processed paper, or None if it is not stored page by page"""
+        raise NotImplementedError
+
+    def copy(self, name, new_name):
+        raise NotImplementedError
+
+    def rename(self, name, new_name):
+        """Move ``name`` to ``new_name`` in one step, replacing what is stored there"""
+        raise NotImplementedError
+
+    def delete(self, name):
+        raise NotImplementedError
+
+    def mtime(self, name):
+        """When the text was last written, or None if there is none"""
+        raise NotImplementedError
+
+    def names(self, suffix=''):
+        """Stored names ending in ``suffix``, sorted"""
+        raise NotImplementedError
+
+    def exists(self, name):
+        return self.mtime(name) is not None
+
+
+class FileTextStore(TextStore):
+    """Legacy layout: one .txt file per text, all in the upload folder"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def location(self, name):
+        """Path of the file holding a text"""
+        return os.path.join(self.folder, name)
+
+    def put(self, name, text, mtime=None):
+        write_atomic(self.location(name), text)
+        if mtime is not None:
+            os.utime(self.location(name), (mtime, mtime))
+
+    def put_pages(self, name, pages, mtime=None):
+        self.put(name, format_pages(pages), mtime)
+
+    def get(self, name):
+        try:
+            with open(self.location(name), 'r', encoding='utf-8', errors='replace') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def get_page(self, name, page):
+        pages = split_pages(self.get(name) or '')
+        return pages[page - 1] if pages and 0 < page <= len(pages) else None
+
+    def page_count(self, name):
+        pages = split_pages(self.get(name) or '')
+        return len(pages) if pages else None
+
+    def copy(self, name, new_name):
+        copy_atomic(self.location(name), self.location(new_name))
+
+    def rename(self, name, new_name):
+        os.replace(self.location(name), self.location(new_name))
+
+    def delete(self, name):
+        if os.path.exists(self.location(name)):
+            os.remove(self.location(name))
+
+    def mtime(self, name):
+        try:
+            return os.path.getmtime(self.location(name))
+        except OSError:
+            return None
+
+    def names(self, suffix=''):
+        return sorted(name for name in os.listdir(self.folder) if name.endswith(suffix)
+                      and any(fnmatch.fnmatch(name, pattern) for pattern in TEXT_FILE_PATTERNS))
+
+
+class TextArchive(TextStore):
+    """Append-only, compressed segment files with an SQLite offset index.
+
+    Every text (every page of a processed paper) is compressed on its own
+    and appended to the active ``segment-<n>.dat`` in ``folder``; the index
+    maps ``(name, page)`` to its segment, offset and length. A read is one
+    index lookup and one slice of the memory-mapped segment, whatever the
+    size of the archive. Overwritten and deleted texts leave dead bytes
+    behind, which ``compact`` reclaims by copying the live records of
+    mostly dead segments forward and deleting those segments.
+
+    Appends happen inside an SQLite write transaction, so several processes
+    (the web app and ``python -m exam_ocr worker``) can share an archive.
+    """
+
+    def __init__(self, folder, index_path, segment_bytes=SEGMENT_BYTES):
+        self.folder = folder
+        self.index_path = index_path
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._maps = {}  # segment -> mmap, remapped when the segment has grown
+        self._maps_lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        # Transactions are managed explicitly (BEGIN IMMEDIATE takes the write lock up front)
+        self._conn = sqlite3.connect(index_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                size INTEGER NOT NULL,
+                sealed INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS texts (
+                name TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec TEXT NOT NULL,
+                stored_at REAL NOT NULL,
+                PRIMARY KEY (name, page)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_texts_segment ON texts (segment)")
+
+    def segment_path(self, segment):
+        return os.path.join(self.folder, f"segment-{segment:06d}.dat")
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction (call with ``self._lock`` held)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _append(self, conn, blobs):
+        """Write blobs to the end of the active segment; returns ``[(segment, offset)]``.
+
+        Runs inside a write transaction, so the recorded size is the true end
+        of the segment; bytes a crashed writer left past it are overwritten.
+        """
+        row = conn.execute("SELECT id, size FROM segments WHERE sealed = 0 ORDER BY id DESC LIMIT 1").fetchone()
+        if row is not None and row[1] >= self.segment_bytes:
+            conn.execute("UPDATE segments SET sealed = 1 WHERE id = ?", (row[0],))
+            row = None
+        if row is None:
+            segment = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM segments").fetchone()[0]) + 1
+            conn.execute("INSERT INTO segments (id, size) VALUES (?, 0)", (segment,))
+            size = 0
+        else:
+            segment, size = row
+
+        path = self.segment_path(segment)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(size)
+            positions = []
+            for blob in blobs:
+                positions.append((segment, f.tell()))
+                f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+            conn.execute("UPDATE segments SET size = ? WHERE id = ?", (f.tell(), segment))
+        return positions
+
+    def _put_records(self, name, records, mtime=None):
+        """Replace everything stored under ``name`` with ``[(page, text)]``"""
+        compressed = [(page, *compress(text.encode('utf-8'))) for page, text in records]
+        stored_at = mtime if mtime is not None else time.time()
+        with self._lock:
+            with self._transaction() as conn:
+                positions = self._append(conn, [blob for _, _, blob in compressed])
+                conn.execute("DELETE FROM texts WHERE name = ?", (name,))
+                conn.executemany(
+                    "INSERT INTO texts (name, page, segment, offset, length, codec, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(name, page, segment, offset, len(blob), codec, stored_at)
+                     for (page, codec, blob), (segment, offset) in zip(compressed, positions)]
+                )
+
+    def put(self, name, text, mtime=None):
+        self._put_records(name, [(0, text)], mtime)
+
+    def put_pages(self, name, pages, mtime=None):
+        self._put_records(name, list(enumerate(pages, start=1)), mtime)
+
+    def _read(self, segment, offset, length, codec):
+        """Decompress one record from the memory-mapped segment"""
+        with self._maps_lock:
+            view = self._maps.get(segment)
+            if view is None or len(view) < offset + length:
+                if view is not None:
+                    view.close()
+                with open(self.segment_path(segment), 'rb') as f:
+                    view = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = view[offset:offset + length]
+        return decompress(codec, data).decode('utf-8')
+
+    def _records(self, name):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT page, segment, offset, length, codec FROM texts WHERE name = ? ORDER BY page", (name,)
+            ).fetchall()
+
+    def get(self, name):
+        records = self._records(name)
+        if not records:
+            return None
+        texts = [self._read(*record[1:]) for record in records]
+        return texts[0] if records[0][0] == 0 else format_pages(texts)
+
+    def get_page(self, name, page):
+        if page < 1:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT segment, offset, length, codec FROM texts WHERE name = ? AND page = ?", (name, page)
+            ).fetchone()
+        return self._read(*row) if row else None
+
+    def page_count(self, name):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM texts WHERE name = ? AND page > 0", (name,)).fetchone()[0]
+        return count or None
+
+    def copy(self, name, new_name):
+        """Store ``name`` again as ``new_name``; the records are shared, nothing is rewritten"""
+        with self._lock:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM texts WHERE name = ?", (new_name,))
+                conn.execute(
+                    "INSERT INTO texts (name, page, segment, offset, length, codec, stored_at) "
+                    "SELECT ?, page, segment, offset, length, codec, ? FROM texts WHERE name = ?",
+                    (new_name, time.time(), name)
+                )
+
+    def rename(self, name, new_name):
+        with self._lock:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM texts WHERE name = ?", (new_name,))
+                conn.execute("UPDATE texts SET name = ? WHERE name = ?", (new_name, name))
+
+    def delete(self, name):
+        with self._lock:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM texts WHERE name = ?", (name,))
+
+    def expire(self, prefixes, max_age, max_bytes=None, now=None):
+        """Delete texts whose name starts with one of ``prefixes``; returns the number deleted.
+
+        Like ``uploads.sweep_folder``: texts older than ``max_age`` seconds
+        go, then the oldest of the rest until their compressed size fits in
+        ``max_bytes`` (if given).
+        """
+        cutoff = (now or time.time()) - max_age
+        matches = ' OR '.join(['substr(name, 1, ?) = ?'] * len(prefixes))
+        params = [value for prefix in prefixes for value in (len(prefix), prefix)]
+        removed = 0
+        with self._lock:
+            with self._transaction() as conn:
+                rows = conn.execute(
+                    f"SELECT name, MAX(stored_at), SUM(length) FROM texts WHERE {matches} "
+                    "GROUP BY name ORDER BY MAX(stored_at) DESC", params
+                ).fetchall()
+                total = 0
+                for name, stored_at, size in rows:
+                    total += size
+                    if stored_at < cutoff or (max_bytes is not None and total > max_bytes):
+                        conn.execute("DELETE FROM texts WHERE name = ?", (name,))
+                        removed += 1
+        return removed
+
+    def mtime(self, name):
+        with self._lock:
+            return self._conn.execute("SELECT MAX(stored_at) FROM texts WHERE name = ?", (name,)).fetchone()[0]
+
+    def names(self, suffix=''):
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT name FROM texts ORDER BY name").fetchall()
+        return [row[0] for row in rows if row[0].endswith(suffix)]
+
+    def stats(self):
+        """Segment count, bytes on disk and bytes still referenced by the index"""
+        with self._lock:
+            segments, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM segments").fetchone()
+            texts = self._conn.execute("SELECT COUNT(DISTINCT name) FROM texts").fetchone()[0]
+            # Copies share records, so each record counts once
+            live = self._conn.execute(
+                "SELECT COALESCE(SUM(length), 0) FROM (SELECT DISTINCT segment, offset, length FROM texts)"
+            ).fetchone()[0]
+        return {'segments': segments, 'bytes': size, 'live_bytes': live, 'texts': texts}
+
+    def _forget_segment(self, segment):
+        """Unmap and delete a segment that the index no longer uses"""
+        with self._maps_lock:
+            view = self._maps.pop(segment, None)
+            if view is not None:
+                view.close()
+        try:
+            os.remove(self.segment_path(segment))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. still mapped by another process on Windows; removed by a later compaction
+            logger.warning(f"Could not delete text segment {segment}: {str(e)}")
+
+    def compact(self, min_garbage=0.5):
+        """Rewrite sealed segments that are at least ``min_garbage`` dead; returns the bytes reclaimed.
+
+        Live records are copied forward as they are (no recompression), and
+        the index is switched to the copies in the same transaction.
+        """
+        with self._lock:
+            usage = self._conn.execute(
+                "SELECT s.id, s.size, COALESCE(SUM(r.length), 0) FROM segments s "
+                "LEFT JOIN (SELECT DISTINCT segment, offset, length FROM texts) r ON r.segment = s.id "
+                "WHERE s.sealed = 1 GROUP BY s.id"
+            ).fetchall()
+        reclaimed = 0
+        for segment, size, live in usage:
+            if size == 0 or (size - live) / size < min_garbage:
+                continue
+            with self._lock:
+                with self._transaction() as conn:
+                    records = conn.execute(
+                        "SELECT DISTINCT offset, length, codec FROM texts WHERE segment = ? ORDER BY offset",
+                        (segment,)
+                    ).fetchall()
+                    blobs = [self._raw(segment, offset, length) for offset, length, _ in records]
+                    positions = self._append(conn, blobs) if blobs else []
+                    for (offset, _, _), (new_segment, new_offset) in zip(records, positions):
+                        conn.execute(
+                            "UPDATE texts SET segment = ?, offset = ? WHERE segment = ? AND offset = ?",
+                            (new_segment, new_offset, segment, offset)
+                        )
+                    conn.execute("DELETE FROM segments WHERE id = ?", (segment,))
+            self._forget_segment(segment)
+            reclaimed += size - live
+
+        # Segment files left behind by a failed delete or a crash. Writers create segment files inside
+        # their write transaction, so while this one holds the write lock no process is between creating
+        # a file and committing its row, and every file without a row really is an orphan.
+        with self._lock:
+            with self._transaction() as conn:
+                known = {row[0] for row in conn.execute("SELECT id FROM segments")}
+                for name in os.listdir(self.folder):
+                    match = re.fullmatch(r'segment-(\d+)\.dat', name)
+                    if match and int(match.group(1)) not in known:
+                        self._forget_segment(int(match.group(1)))
+        return reclaimed
+
+    def _raw(self, segment, offset, length):
+        """The compressed bytes of one record"""
+        with self._maps_lock:
+            view = self._maps.get(segment)
+            if view is None or len(view) < offset + length:
+                with open(self.segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    return f.read(length)
+            return view[offset:offset + length]
+
+    def close(self):
+        with self._maps_lock:
+            for view in self._maps.values():
+                view.close()
+            self._maps.clear()
+
+
+def open_text_store(backend, folder, index_path=None, segment_bytes=SEGMENT_BYTES):
+    """Create the OCR text store: 'archive' (segments in ``folder``) or 'files' (one file each in ``folder``)"""
+    if backend == 'archive':
+        return TextArchive(folder, index_path or os.path.join(folder, 'index.db'), segment_bytes=segment_bytes)
+    if backend == 'files':
+        return FileTextStore(folder)
+    raise ValueError(f"Unknown OCR text backend: {backend}")
+
+
+def migrate_files_to_archive(folder, archive, delete=False):
+    """Import the legacy text files of the upload folder into an archive.
+
+    Processed papers are split into pages when they have the standard
+    ``=== Page N ===`` layout. Files already imported and unchanged since
+    are skipped, and their original modification times are kept so that
+    raw OCR text still expires on time. With ``delete`` each file is removed
+    once its archived copy reads back identical. Returns the number of
+    files imported.
+    """
+    count = 0
+    files = FileTextStore(folder)
+    for name in files.names():
+        mtime = files.mtime(name)
+        if archive.mtime(name) != mtime:
+            text = files.get(name)
+            pages = split_pages(text) if name.endswith('_ocr.txt') else None
+            if pages is not None:
+                archive.put_pages(name, pages, mtime)
+            else:
+                archive.put(name, text, mtime)
+            count += 1
+        if delete and archive.get(name) == files.get(name):
+            files.delete(name)
+    return count
+
+
+class ArchiveCompactor:
+    """Background thread that expires raw OCR text and compacts the archive every ``interval`` seconds.
+
+    Raw texts older than ``max_age`` are dropped, and the oldest beyond
+    ``max_bytes`` of compressed text, the budget the upload sweeper keeps
+    for the same texts in the file layout.
+    """
+
+    def __init__(self, archive, max_age=24 * 3600, min_garbage=0.5, interval=3600, max_bytes=None):
+        self.archive = archive
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.min_garbage = min_garbage
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        expired = self.archive.expire(EXPIRING_PREFIXES, self.max_age, self.max_bytes)
+        reclaimed = self.archive.compact(self.min_garbage)
+        if expired or reclaimed:
+            logger.info(f"Expired {expired} raw OCR text(s), compaction reclaimed {reclaimed} bytes")
+        return expired, reclaimed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Text archive compaction failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='text-archive-compactor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,163 @@
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+
+# Encoded thumbnails are never taller than this many times their width
+MAX_ASPECT = 2.0
+
+# libwebp effort (0-6): 0 encodes several times faster than the default 4,
+# and for small scanned pages the files are only slightly larger
+WEBP_METHOD = 0
+
+MIME_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+EXTENSIONS = {'image/webp': '.webp', 'image/jpeg': '.jpg'}
+
+
+def thumbnail_format():
+    """WebP when Pillow was built with it, otherwise JPEG"""
+    from PIL import features
+    return 'WEBP' if features.check('webp') else 'JPEG'
+
+
+def make_thumbnails(image, widths, quality=60):
+    """Downscaled, compressed copies of a page image as ``[(width, mime, data)]``.
+
+    Each copy is at most ``width`` pixels wide (pages are never upscaled)
+    and ``MAX_ASPECT`` times as tall. Smaller sizes are scaled from the
+    next larger one rather than from the full page.
+    """
+    from PIL import Image
+    fmt = thumbnail_format()
+    source = image if image.mode in ('L', 'RGB') else image.convert('RGB')
+    thumbnails = []
+    for width in sorted(set(widths), reverse=True):
+        scale = min(1.0, width / source.width, width * MAX_ASPECT / source.height)
+        size = (max(1, round(source.width * scale)), max(1, round(source.height * scale)))
+        if size != source.size:
+            source = source.resize(size, Image.BILINEAR, reducing_gap=2.0)
+        buffer = io.BytesIO()
+        source.save(buffer, fmt, quality=quality, **({'method': WEBP_METHOD} if fmt == 'WEBP' else {}))
+        thumbnails.append((width, MIME_TYPES[fmt], buffer.getvalue()))
+    return thumbnails
+
+
+def paper_name(name):
+    """The paper a preview URL names: a processed PDF or OCR file name, with or without extension"""
+    for suffix in ('_ocr.txt', '.pdf'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+class ThumbnailStore:
+    """Page thumbnails in a content-addressed folder with a SQLite index.
+
+    Each encoded image is written once to ``folder/<ab>/<sha256><ext>``,
+    however many pages share it, and never changes afterwards. The index
+    maps a document (the SHA-256 of its PDF), page and width to an image,
+    and a processed paper's name to the document it was made from.
+    """
+
+    def __init__(self, folder, db_path):
+        self.folder = folder
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_thumbnails (
+                doc_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                width INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                mime TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (doc_hash, page, width)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS paper_documents (
+                paper TEXT PRIMARY KEY,
+                doc_hash TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def blob_path(self, digest, mime):
+        return os.path.join(self.folder, digest[:2], digest + EXTENSIONS[mime])
+
+    def _write_blob(self, data, mime):
+        """Store an encoded image under its SHA-256 (once) and return the digest"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest, mime)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return digest
+
+    def put(self, doc_hash, page, thumbnails):
+        """Save a page's ``[(width, mime, data)]`` from ``make_thumbnails``"""
+        rows = [(doc_hash, page, width, self._write_blob(data, mime), mime, len(data))
+                for width, mime, data in thumbnails]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO page_thumbnails (doc_hash, page, width, digest, mime, size) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+
+    def missing_pages(self, doc_hash, pages):
+        """The pages of a document that have no thumbnails yet"""
+        with self._lock:
+            done = {row[0] for row in self._conn.execute(
+                "SELECT DISTINCT page FROM page_thumbnails WHERE doc_hash = ?", (doc_hash,)
+            )}
+        return [page for page in pages if page not in done]
+
+    def link(self, paper, doc_hash):
+        """Serve the thumbnails of ``doc_hash`` as those of a processed paper"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO paper_documents (paper, doc_hash) VALUES (?, ?)",
+                    (paper_name(paper), doc_hash)
+                )
+
+    def paper_document(self, paper):
+        """Document hash behind a processed paper, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_hash FROM paper_documents WHERE paper = ?", (paper_name(paper),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, paper, page, width=None):
+        """The thumbnail of a paper's page as ``{width, digest, mime, path}``, or None.
+
+        Picks the narrowest thumbnail at least ``width`` wide, else the
+        widest there is (also when no width is asked for).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t.width, t.digest, t.mime FROM page_thumbnails t "
+                "JOIN paper_documents p ON p.doc_hash = t.doc_hash "
+                "WHERE p.paper = ? AND t.page = ? ORDER BY t.width",
+                (paper_name(paper), page)
+            ).fetchall()
+        if not rows:
+            return None
+        fitting = [row for row in rows if width is not None and row[0] >= width]
+        found_width, digest, mime = fitting[0] if fitting else rows[-1]
+        return {'width': found_width, 'digest': digest, 'mime': mime, 'path': self.blob_path(digest, mime)}
@@ -0,0 +1,30 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall-clock time spent in each named stage of a request, in milliseconds
+
+    ``observer(stage, seconds)``, if given, is told about every finished stage.
+    """
+
+    def __init__(self, observer=None):
+        self.stages = {}
+        self.observer = observer
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed * 1000
+            if self.observer is not None:
+                self.observer(name, elapsed)
+
+    def as_dict(self):
+        """Stage durations rounded to 0.1 ms, plus their total"""
+        timings = {name: round(ms, 1) for name, ms in self.stages.items()}
+        timings['total'] = round(sum(self.stages.values()), 1)
+        return timings
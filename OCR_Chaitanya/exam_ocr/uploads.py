@@ -0,0 +1,176 @@
+import fnmatch
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+from exam_ocr.cache import hash_bytes, hash_file
+
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are written to disk instead of being held in memory
+SPILL_THRESHOLD = 8 * 1024 * 1024
+
+# Artefacts the sweeper may delete; processed papers and their _ocr.txt are never touched
+SWEEP_PATTERNS = ('temp_*', 'raw_ocr_*')
+
+
+class PDFSource:
+    """A PDF to run detection on, held in memory or spilled to a file.
+
+    ``pdf`` is what the Poppler helpers and the OCR engine accept: the
+    bytes for small uploads, the file path otherwise. ``name`` is the
+    file name the document would have on disk and names its raw OCR file.
+    """
+
+    def __init__(self, name, data=None, path=None, spilled=False):
+        self.name = name
+        self.data = data
+        self.path = path
+        self.spilled = spilled
+        self._hash = None
+
+    @classmethod
+    def from_path(cls, path):
+        return cls(os.path.basename(path), path=path)
+
+    @classmethod
+    def from_upload(cls, file, spill_path, threshold=SPILL_THRESHOLD):
+        """Read an uploaded file into memory, spilling to ``spill_path`` above ``threshold`` bytes"""
+        head = file.stream.read(threshold + 1)
+        name = os.path.basename(spill_path)
+        if len(head) <= threshold:
+            return cls(name, data=head)
+        with open(spill_path, 'wb') as f:
+            f.write(head)
+            shutil.copyfileobj(file.stream, f)
+        return cls(name, path=spill_path, spilled=True)
+
+    @property
+    def pdf(self):
+        return self.data if self.data is not None else self.path
+
+    @property
+    def size(self):
+        return len(self.data) if self.data is not None else os.path.getsize(self.path)
+
+    def hash(self):
+        """SHA-256 of the document, computed once"""
+        if self._hash is None:
+            self._hash = hash_bytes(self.data) if self.data is not None else hash_file(self.path)
+        return self._hash
+
+    def save(self, path):
+        """Write the document to ``path`` (e.g. for a queued job) and return the path"""
+        if self.data is not None:
+            with open(path, 'wb') as f:
+                f.write(self.data)
+        elif os.path.abspath(path) != os.path.abspath(self.path):
+            shutil.copyfile(self.path, path)
+        return path
+
+    def discard(self):
+        """Remove the spill file, if there is one"""
+        if self.spilled and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def sweep_folder(folder, max_age, max_bytes, patterns=SWEEP_PATTERNS, now=None, keep=()):
+    """Delete stale upload artefacts; returns (files removed, bytes freed).
+
+    Matching files older than ``max_age`` seconds are removed, then the
+    oldest of the rest until together they fit in ``max_bytes``. Paths in
+    ``keep`` (uploads still being worked on) are never removed.
+    """
+    now = now or time.time()
+    keep = {os.path.abspath(path) for path in keep}
+    files = []
+    for name in os.listdir(folder):
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            continue
+        path = os.path.join(folder, name)
+        if os.path.abspath(path) in keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    total = sum(size for _, size, _ in files)
+    removed = freed = 0
+    for mtime, size, path in files:
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+class UploadSweeper:
+    """Background thread that runs ``sweep_folder`` every ``interval`` seconds.
+
+    Uploads registered with ``in_use`` while a request works on them are
+    left alone, as are the paths returned by ``keep()`` (e.g. the inputs
+    of queued jobs), if given.
+    """
+
+    def __init__(self, folder, max_age=24 * 3600, max_bytes=512 * 1024 * 1024, interval=600, keep=None):
+        self.folder = folder
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.keep = keep
+        self._in_use = set()
+        self._in_use_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def in_use(self, path):
+        """Keep ``path`` from being swept inside the ``with`` block"""
+        path = os.path.abspath(path)
+        with self._in_use_lock:
+            self._in_use.add(path)
+        try:
+            yield path
+        finally:
+            with self._in_use_lock:
+                self._in_use.discard(path)
+
+    def sweep(self):
+        with self._in_use_lock:
+            keep = set(self._in_use)
+        if self.keep is not None:
+            keep.update(self.keep())
+        removed, freed = sweep_folder(self.folder, self.max_age, self.max_bytes, keep=keep)
+        if removed:
+            logger.info(f"Swept {removed} stale upload file(s), {freed} bytes")
+        return removed, freed
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Upload sweep failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='upload-sweeper', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
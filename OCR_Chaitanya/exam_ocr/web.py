@@ -0,0 +1,274 @@
+import json
+import os
+import uuid
+
+from flask import Flask, Response, request, render_template, url_for, jsonify, send_file
+from flask_cors import CORS
+from werkzeug.utils import secure_filename
+
+from exam_ocr.admission import init_app as init_admission
+from exam_ocr.config import Config
+from exam_ocr.extract import normalise_exam_type, normalise_acad_year
+from exam_ocr.metrics import init_app as init_metrics, request_timer
+from exam_ocr.search import FILTER_FIELDS
+from exam_ocr.service import OCRService, allowed_file, detection_response, ocr_text_url
+from exam_ocr.uploads import PDFSource
+
+
+def create_app(config=None, service=None):
+    """Build the Flask app around an ``OCRService``.
+
+    ``config`` defaults to ``Config()`` (data next to the OCR service);
+    pass a ready ``service`` to share it with other code. Background
+    workers are not started here, see ``OCRService.start_background``.
+    """
+    if service is None:
+        service = OCRService(config or Config())
+    config = service.config
+
+    app = Flask(__name__, template_folder=config.TEMPLATE_FOLDER)
+    CORS(app)  # Enable CORS for all routes
+    app.config.from_object(config)
+    app.extensions['ocr_service'] = service
+
+    metrics, admission, detect_admission = service.metrics, service.admission, service.detect_admission
+    init_metrics(app, metrics)
+
+    # /health reports the OCR slots and the job backlog
+    init_admission(app, admission, service.health)
+
+    def wants_async():
+        """True if the client asked for a job ID instead of waiting for OCR"""
+        value = request.args.get('async') or request.form.get('async') or ''
+        return value.lower() in ('1', 'true', 'yes')
+
+    def upload_path(filename):
+        """A temp_ path in the upload folder for one upload; concurrent uploads of a file never share it"""
+        return os.path.join(config.UPLOAD_FOLDER, f"temp_{uuid.uuid4().hex}_{secure_filename(filename)}")
+
+    def job_accepted(job_id):
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202
+
+    # API Routes
+    @app.route('/detect_details', methods=['POST'])
+    def detect_details():
+        if 'file' not in request.files:
+            return jsonify({'success': False, 'error': 'No file part'}), 400
+
+        file = request.files['file']
+
+        if file.filename == '':
+            return jsonify({'success': False, 'error': 'No selected file'}), 400
+
+        if file and allowed_file(file.filename):
+            filepath = upload_path(file.filename)
+
+            if wants_async():
+                service.admit_job()
+                # Queued jobs may run in another process, so they need the file on disk
+                with service.upload_sweeper.in_use(filepath):
+                    file.save(filepath)
+                    return job_accepted(service.job_queue.submit('detect', {'pdf_path': filepath}))
+
+            # Detect from memory; only uploads above UPLOAD_SPILL_BYTES are written to disk.
+            # Detections have their own slots, so processing requests never keep the upload form waiting.
+            with detect_admission.slot():
+                source = PDFSource.from_upload(file, filepath, threshold=config.UPLOAD_SPILL_BYTES)
+                try:
+                    details = service.detect_document_details(source)
+                    return jsonify(detection_response(details))
+                except Exception as e:
+                    return jsonify({'success': False, 'error': str(e)}), 500
+                finally:
+                    source.discard()
+
+        return jsonify({'success': False, 'error': 'Invalid file type'}), 400
+
+    @app.route('/detect_details/batch', methods=['POST'])
+    def detect_details_batch():
+        """Detect details for many PDFs, streaming one NDJSON line per file as it finishes"""
+        files = request.files.getlist('files') + request.files.getlist('file')
+        if not files:
+            return jsonify({'success': False, 'error': 'No file part'}), 400
+
+        sources = {}
+        rejected = []
+        try:
+            for file in files:
+                if file.filename and allowed_file(file.filename):
+                    sources[PDFSource.from_upload(file, upload_path(file.filename),
+                                                  threshold=config.UPLOAD_SPILL_BYTES)] = file.filename
+                else:
+                    rejected.append(file.filename)
+
+            # The whole batch holds one OCR slot until the response is closed
+            started = admission.acquire()
+        except BaseException:
+            for source in sources:
+                source.discard()
+            raise
+
+        def generate():
+            for filename in rejected:
+                yield json.dumps({'file': filename, 'success': False, 'error': 'Invalid file type'}) + '\n'
+            try:
+                for source, details, error in service.detect_many(list(sources)):
+                    if error is not None:
+                        result = {'success': False, 'error': f"Failed to detect document details: {str(error)}"}
+                    else:
+                        result = detection_response(details)
+                    yield json.dumps({'file': sources[source], **result}) + '\n'
+            finally:
+                for source in sources:
+                    source.discard()
+
+        response = Response(generate(), mimetype='application/x-ndjson')
+        response.call_on_close(lambda: admission.release(started))
+        return response
+
+    @app.route('/process_file', methods=['POST'])
+    def process_file():
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+
+        file = request.files['file']
+
+        if file.filename == '':
+            return jsonify({'error': 'No selected file'}), 400
+
+        if file and allowed_file(file.filename):
+            # Get confirmed details; exam type and academic year spellings from either client are normalised
+            exam_type = request.form.get('confirmed_exam_type')
+            acad_year = request.form.get('confirmed_acad_year')
+            details = {
+                'course_code': request.form.get('confirmed_course_code'),
+                'exam_type': normalise_exam_type(exam_type) or exam_type,
+                'semester_type': request.form.get('confirmed_semester'),
+                'acad_year': normalise_acad_year(acad_year) or acad_year
+            }
+
+            # Validate details
+            if not all(details.values()):
+                return jsonify({'error': 'Missing required details'}), 400
+
+            # The upload is only written once the request is admitted, so a 429 or 503 leaves nothing on disk.
+            # The sweeper reclaims it if processing fails and is not retried.
+            filepath = upload_path(file.filename)
+            if wants_async():
+                service.admit_job()
+                file.save(filepath)
+                with service.upload_sweeper.in_use(filepath):
+                    return job_accepted(service.job_queue.submit('process', {'pdf_path': filepath,
+                                                                             'details': details}))
+
+            with admission.slot():
+                file.save(filepath)
+                with service.upload_sweeper.in_use(filepath):
+                    try:
+                        ocr_file = service.process_confirmed_pdf(filepath, details)
+                        return jsonify({
+                            'message': 'File processed successfully',
+                            'ocr_file': ocr_file,
+                            'ocr_url': ocr_text_url(ocr_file)
+                        })
+                    except Exception as e:
+                        return jsonify({'error': str(e)}), 500
+
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    @app.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        """Status, page progress and result of an async OCR job"""
+        job = service.job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job)
+
+    @app.route('/jobs/<job_id>/retry', methods=['POST'])
+    def retry_job(job_id):
+        """Requeue a failed job; a process job resumes from its checkpointed pages"""
+        job = service.job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if not service.job_queue.retry(job_id):
+            return jsonify({'error': f"Only failed jobs can be retried (job is {job['status']})"}), 409
+        return job_accepted(job_id)
+
+    @app.route('/search', methods=['GET'])
+    def search():
+        """Ranked full-text search over processed papers, with snippets and metadata filters"""
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'success': False, 'error': 'Missing q parameter'}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit and offset must be integers'}), 400
+
+        filters = {field: request.args.get(field) for field in FILTER_FIELDS}
+        with request_timer(metrics).stage('search'):
+            try:
+                results = service.search_index.search(query, limit=limit, offset=offset, **filters)
+            except ValueError as e:
+                return jsonify({'success': False, 'error': str(e)}), 400
+        return jsonify({'success': True, 'query': query, 'results': results})
+
+    @app.route('/preview/<paper>/<int:page>', methods=['GET'])
+    def preview(paper, page):
+        """Thumbnail of a processed paper's page; ``?width=`` picks the narrowest one at least that wide"""
+        thumbnail = service.thumbnails.get(paper, page, request.args.get('width', type=int))
+        if thumbnail is None or not os.path.isfile(thumbnail['path']):
+            return jsonify({'error': 'Preview not found'}), 404
+        # Stored images never change, so their SHA-256 is a strong ETag
+        return send_file(thumbnail['path'], mimetype=thumbnail['mime'], etag=thumbnail['digest'],
+                         max_age=config.PREVIEW_MAX_AGE, conditional=True)
+
+    @app.route('/ocr_text/<name>', methods=['GET'])
+    def ocr_text(name):
+        """Stored OCR text by file name (e.g. a paper's ``_ocr.txt``); ``?page=`` returns one page"""
+        page = request.args.get('page', type=int)
+        name = secure_filename(name)
+        text = service.text_store.get(name) if page is None else service.text_store.get_page(name, page)
+        if text is None:
+            return jsonify({'error': 'OCR text not found'}), 404
+        return Response(text, mimetype='text/plain')
+
+    @app.route('/cache/stats', methods=['GET'])
+    def cache_stats():
+        """Expose OCR cache hit/miss counters"""
+        return jsonify(service.ocr_cache.stats())
+
+    @app.route('/')
+    def upload_file():
+        return render_template('upload.html')
+
+    @app.route('/save_ocr_text', methods=['POST'])
+    def save_ocr_text():
+        """Route to save raw OCR text separately"""
+        try:
+            data = request.get_json()
+            if not data or 'text' not in data or 'filename' not in data:
+                return jsonify({'error': 'Missing text or filename parameter'}), 400
+
+            ocr_text = data['text']
+            filename = secure_filename(data['filename'])
+
+            # Save the OCR text under its own name in the text store
+            ocr_name = f"manual_ocr_{filename}.txt"
+            service.text_store.put(ocr_name, ocr_text)
+
+            return jsonify({
+                'message': 'OCR text saved successfully',
+                'ocr_file': ocr_name,
+                'ocr_url': ocr_text_url(ocr_name)
+            })
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    return app
@@ -0,0 +1,66 @@
+import os
+import random
+import string
+import sys
+
+import pytest
+
+# Run from OCR_Chaitanya or the repository root without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import exam_ocr.service as service_module  # noqa: E402
+from exam_ocr.config import Config  # noqa: E402
+from exam_ocr.service import OCRService  # noqa: E402
+
+
+def words(seed, count=120):
+    """Random but repeatable page text, long enough to fingerprint"""
+    rng = random.Random(seed)
+    return ' '.join(''.join(rng.choice(string.ascii_lowercase) for _ in range(6)) for _ in range(count))
+
+
+class FakeEngine:
+    """Stands in for OCREngine: the pages of each PDF path are given up front, no Poppler or Tesseract.
+
+    ``fail_on`` makes OCR of that page raise, like a worker dying mid-document.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.calls = []
+        self.fail_on = None
+
+    def ocr_pdf_pages(self, pdf_path, pages, **kwargs):
+        for page in pages:
+            if page == self.fail_on:
+                raise RuntimeError(f"OCR failed on page {page}")
+            self.calls.append(page)
+            yield page, self.documents[pdf_path][page - 1]
+
+    def thumbnail_pages(self, *args, **kwargs):
+        return iter(())
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """An ``OCRService`` under ``tmp_path`` with a ``FakeEngine`` and no background workers"""
+    service = OCRService(Config(str(tmp_path), JOB_WORKERS=0, THUMBNAIL_WIDTHS=()))
+    engine = service.ocr_engine = FakeEngine()
+    monkeypatch.setattr(service_module, 'page_count', lambda path, poppler_path=None: len(engine.documents[path]))
+    return service
+
+
+@pytest.fixture
+def upload(service):
+    """``upload(name, pages)`` writes a PDF stand-in to the upload folder and returns its path"""
+    def upload(name, pages):
+        path = os.path.join(service.config.UPLOAD_FOLDER, name)
+        with open(path, 'wb') as f:
+            # Every upload is another scan with its own bytes, even of the same pages
+            f.write('\n'.join([name] + list(pages)).encode('utf-8'))
+        service.ocr_engine.documents[path] = list(pages)
+        return path
+    return upload
@@ -0,0 +1,92 @@
+import io
+import os
+
+import pytest
+from flask import Flask, jsonify
+
+from exam_ocr.admission import AdmissionController, Saturated, init_app
+from exam_ocr.web import create_app
+
+
+def make_app(controller):
+    app = Flask(__name__)
+    init_app(app, controller, extra=lambda: {'jobs': {'queued': 0}})
+
+    @app.route('/ocr')
+    def ocr():
+        with controller.slot():
+            return jsonify({'success': True})
+
+    return app
+
+
+def test_free_slot_is_admitted():
+    controller = AdmissionController(max_active=1, max_waiting=1, wait_timeout=0.05)
+    response = make_app(controller).test_client().get('/ocr')
+    assert response.status_code == 200
+    assert controller.load()['admitted'] == 1
+    assert controller.load()['active'] == 0
+
+
+def test_full_waiting_room_is_turned_away_with_429():
+    controller = AdmissionController(max_active=1, max_waiting=0, wait_timeout=5)
+    started = controller.acquire()
+    response = make_app(controller).test_client().get('/ocr')
+    controller.release(started)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(response.get_json()['retry_after'])
+    assert response.get_json()['success'] is False
+    assert controller.load()['rejected'] == 1
+
+
+def test_wait_timeout_answers_503():
+    controller = AdmissionController(max_active=1, max_waiting=1, wait_timeout=0.05)
+    started = controller.acquire()
+    response = make_app(controller).test_client().get('/ocr')
+    controller.release(started)
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert controller.load()['waiting'] == 0
+
+
+def test_retry_after_follows_slot_hold_times():
+    controller = AdmissionController(max_active=2, max_waiting=4)
+    assert controller.retry_after() == 1
+    controller.avg_seconds = 10.0
+    controller.waiting = 3
+    assert controller.retry_after() == 20  # Four requests' worth of work shared by two slots
+    with pytest.raises(Saturated):
+        controller.waiting, controller.active = 4, 2
+        controller.acquire()
+
+
+def test_health_reports_load_and_saturation():
+    controller = AdmissionController(max_active=1, max_waiting=1, wait_timeout=5)
+    client = make_app(controller).test_client()
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ok'
+    assert response.get_json()['jobs'] == {'queued': 0}
+
+    controller.active, controller.waiting = 1, 1
+    response = client.get('/health')
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'saturated'
+    assert 'Retry-After' in response.headers
+
+
+@pytest.mark.parametrize('use_async', [False, True])
+def test_refused_upload_is_not_saved(service, use_async):
+    service.config.MAX_QUEUED_JOBS = 1
+    service.job_queue.submit('process', {})
+    service.admission.max_waiting = 0
+    for _ in range(service.admission.max_active):
+        service.admission.acquire()
+    form = {'file': (io.BytesIO(b'%PDF-1.4'), 'scan.pdf'), 'confirmed_course_code': 'CSC208',
+            'confirmed_exam_type': 'Quiz', 'confirmed_semester': 'Winter', 'confirmed_acad_year': '2023-24'}
+    if use_async:
+        form['async'] = '1'
+
+    response = create_app(service=service).test_client().post('/process_file', data=form)
+    assert response.status_code == (503 if use_async else 429)
+    assert os.listdir(service.config.UPLOAD_FOLDER) == []
@@ -0,0 +1,48 @@
+import json
+
+import benchmark
+
+
+def test_summarize():
+    stats = benchmark.summarize([float(ms) for ms in range(1, 101)])
+    assert stats == {'n': 100, 'mean_ms': 50.5, 'median_ms': 50.5, 'p95_ms': 96.0, 'max_ms': 100.0}
+    assert benchmark.summarize([2.0])['p95_ms'] == 2.0
+
+
+def test_timed_records_each_call():
+    samples = {}
+    assert benchmark.timed(samples, 'extract', lambda x: x * 2, 21) == 42
+    benchmark.timed(samples, 'extract', lambda: None)
+    assert len(samples['extract']) == 2
+    assert all(ms >= 0 for ms in samples['extract'])
+
+
+def test_stored_text_run_scores_the_golden_set():
+    with open(benchmark.GOLDEN_FILE, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    report = benchmark.run_benchmark(golden, repeat=2, use_ocr=False)
+
+    assert set(report['stages']) == {'extract', 'metadata_write'}
+    assert report['stages']['extract']['n'] == 2 * len(golden)
+    assert report['stages']['metadata_write']['n'] == 2 * len(golden)
+    assert {document['text_source'] for document in report['documents']} == {'stored'}
+
+    for field in benchmark.SCORED_FIELDS:
+        labelled = sum(1 for entry in golden if entry['expected'].get(field) is not None)
+        score = report['accuracy'][field]
+        assert score['total'] == labelled
+        assert score['correct'] + sum(field in document['mismatches'] for document in report['documents']) == labelled
+    # Course codes and exam types are printed on every sample paper
+    assert report['accuracy']['course_code']['accuracy'] == 1.0
+    assert report['accuracy']['exam_type']['accuracy'] == 1.0
+    json.dumps(report)  # The report is written as JSON
+
+
+def test_compare_reports_stage_changes(capsys):
+    report = {'stages': {'extract': {'median_ms': 1.5}}, 'accuracy': {'overall': 0.8}}
+    baseline = {'git_commit': 'abc123', 'stages': {'extract': {'median_ms': 1.0}}, 'accuracy': {'overall': 0.7}}
+    benchmark.compare(report, baseline)
+    output = capsys.readouterr().out
+    assert 'abc123' in output
+    assert '+50.0%' in output
+    assert '0.7 -> 0.8' in output
@@ -0,0 +1,38 @@
+import json
+import sqlite3
+
+from exam_ocr.cache import OCRCache
+
+
+def stored_bytes(cache):
+    return cache._conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_cache").fetchone()[0]
+
+
+def test_running_total_follows_puts_replaces_and_evictions(tmp_path):
+    cache = OCRCache(str(tmp_path / 'cache.db'), max_bytes=100)
+    cache.put('a', 'page:1', 'x' * 30)
+    cache.put('a', 'page:2', 'y' * 30)
+    cache.put('a', 'page:1', 'z' * 10)  # Replaced by a smaller value
+    assert cache.stats()['bytes'] == stored_bytes(cache) == 12 + 32
+
+    cache.get('a', 'page:1')
+    cache.put('b', 'page:1', 'w' * 60)  # Over budget: the least recently used entry goes
+    assert cache.get('a', 'page:2') is None
+    assert cache.get('a', 'page:1') == 'z' * 10
+    assert cache.stats()['bytes'] == stored_bytes(cache) == 12 + 62
+
+    # Another process sharing the database sees the same total
+    assert OCRCache(cache.db_path, max_bytes=100).stats()['bytes'] == 12 + 62
+
+
+def test_total_of_an_existing_cache_is_counted_once(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE ocr_cache (doc_hash TEXT NOT NULL, entry_key TEXT NOT NULL, value TEXT NOT NULL, "
+                 "size INTEGER NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (doc_hash, entry_key))")
+    conn.execute("INSERT INTO ocr_cache VALUES ('a', 'page:1', ?, 7, 1)", (json.dumps('hello'),))
+    conn.commit()
+    conn.close()
+
+    assert OCRCache(path).stats()['bytes'] == 7
+    assert OCRCache(path).stats()['bytes'] == 7
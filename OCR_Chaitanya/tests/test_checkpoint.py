@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+from exam_ocr.checkpoint import PageCheckpoints
+from exam_ocr.uploads import hash_file
+
+from conftest import words
+
+DETAILS = {'course_code': 'CSC208', 'exam_type': 'Quiz', 'semester_type': 'Winter', 'acad_year': '2023-24'}
+TEXT_NAME = 'CSC208_Quiz_Winter_2023-24_ocr.txt'
+
+
+def test_saved_pages_load_until_cleared(tmp_path):
+    checkpoints = PageCheckpoints(str(tmp_path / 'checkpoints.db'))
+    checkpoints.save('doc', 1, 'one')
+    checkpoints.save('doc', 2, 'two')
+    checkpoints.save('doc', 2, 'two again')
+    checkpoints.save('other', 1, 'x')
+    assert checkpoints.load('doc') == {1: 'one', 2: 'two again'}
+    checkpoints.clear('doc')
+    assert checkpoints.load('doc') == {}
+    assert checkpoints.load('other') == {1: 'x'}
+
+
+def test_prune_drops_abandoned_documents(tmp_path):
+    checkpoints = PageCheckpoints(str(tmp_path / 'checkpoints.db'))
+    checkpoints.save('abandoned', 1, 'one')
+    checkpoints.save('abandoned', 2, 'two')
+    checkpoints.save('active', 1, 'one')
+    assert checkpoints.prune(max_age=3600, now=time.time() + 7200) == 3
+    checkpoints.save('active', 1, 'one')
+    assert checkpoints.prune(max_age=3600) == 0
+    assert checkpoints.load('active') == {1: 'one'}
+
+
+def test_failed_run_resumes_from_checkpoints(service, upload, monkeypatch):
+    pages = [words(f"page {page}") for page in range(1, 5)]
+    pdf = upload('scan.pdf', pages)
+    doc_hash = hash_file(pdf)
+    # Only the checkpoints may supply finished pages, not the OCR cache
+    monkeypatch.setattr(service.ocr_cache, 'get', lambda doc_hash, key: None)
+    engine = service.ocr_engine
+
+    engine.fail_on = 3
+    with pytest.raises(Exception, match='OCR failed on page 3'):
+        service.process_confirmed_pdf(pdf, DETAILS)
+    assert sorted(service.page_checkpoints.load(doc_hash)) == [1, 2]
+    assert os.path.exists(pdf)
+    assert not service.text_store.exists(TEXT_NAME)
+
+    engine.fail_on = None
+    engine.calls.clear()
+    assert service.process_confirmed_pdf(pdf, DETAILS) == TEXT_NAME
+    assert engine.calls == [3, 4]
+    assert [service.text_store.get_page(TEXT_NAME, page) for page in range(1, 5)] == pages
+    assert service.page_checkpoints.load(doc_hash) == {}
+    assert not os.path.exists(pdf)  # Committed under the paper's name
+
+
+def test_failed_commit_keeps_the_existing_paper(service, upload, monkeypatch):
+    old_pages = [words('old 1'), words('old 2')]
+    service.process_confirmed_pdf(upload('old.pdf', old_pages), DETAILS)
+    stored_pdf = os.path.join(service.config.UPLOAD_FOLDER, 'CSC208_Quiz_Winter_2023-24.pdf')
+    with open(stored_pdf, 'rb') as f:
+        old_pdf = f.read()
+
+    new_pdf = upload('new.pdf', [words('new 1'), words('new 2')])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('metadata store is down')
+
+    monkeypatch.setattr(service, 'save_document_metadata', fail)
+    with pytest.raises(Exception, match='metadata store is down'):
+        service.process_confirmed_pdf(new_pdf, DETAILS)
+
+    assert [service.text_store.get_page(TEXT_NAME, page) for page in (1, 2)] == old_pages
+    with open(stored_pdf, 'rb') as f:
+        assert f.read() == old_pdf
+    assert not [name for name in service.text_store.names() if name.startswith('temp_')]
+    assert sorted(os.listdir(service.config.UPLOAD_FOLDER)) == ['CSC208_Quiz_Winter_2023-24.pdf', 'new.pdf']
@@ -0,0 +1,79 @@
+import os
+
+from exam_ocr.catalogue import CourseCatalogue
+from exam_ocr.course_codes import CourseCodeMatcher, code_prefix, code_variants, standardize_code
+
+CODES = ['CSC201', 'CSC208', 'CSD405', 'CSO302', 'CSI101', 'CSE201']
+
+
+def test_direct_code_wins_over_earlier_variant():
+    matcher = CourseCodeMatcher(CODES)
+    assert matcher.match('C5C208 retake of CSO 302') == ('CSO302', 17, 24, 'direct')
+
+
+def test_variants_rank_by_position_then_list_order():
+    matcher = CourseCodeMatcher(CODES)
+    # The original parser returned the first code of the list with a variant anywhere in the text
+    assert matcher.find('C5D405 and C5C201 later') == 'CSD405'
+    assert matcher.variant_candidates('C5D405 and C5C201 later') == [(0, 'CSD405'), (11, 'CSC201')]
+    # ...but a correctly printed code is direct and beats both
+    assert matcher.match('C5D405 and CSC201 later') == ('CSC201', 11, 17, 'direct')
+
+    # A spelling that is a variant of two codes belongs to the earlier one
+    assert CourseCodeMatcher(['CSO302', 'CS0302']).variants['CS0302'] == 'CSO302'
+
+
+def test_variant_how_and_span():
+    matcher = CourseCodeMatcher(CODES)
+    text = 'Code: C5C2O8 (Theory)'
+    code, start, end, how = matcher.match(text)
+    assert (code, how) == ('CSC208', 'variant')
+    assert text[start:end] == 'C5C2O8' and text[start:end] in code_variants(code)
+
+
+def test_partial_match_is_the_last_resort():
+    matcher = CourseCodeMatcher(CODES)
+    assert matcher.match('Paper MAT 101') == ('MAT101', 6, 13, 'partial')
+    assert matcher.match('Paper MAT 101', variants=False) == ('MAT101', 6, 13, 'partial')
+    assert matcher.find('no code here') is None
+
+
+def test_variants_can_be_disabled():
+    matcher = CourseCodeMatcher(CODES)
+    assert matcher.find('C5D405') == 'CSD405'
+    assert matcher.find('C5D405', variants=False) is None
+
+
+def test_standardize_code():
+    assert standardize_code('CSO 302') == 'CSO302'
+    assert standardize_code('EEE\n202') == 'EEE202'
+    assert standardize_code('CSX') is None
+    assert code_prefix('CSD405') == 'CSD'
+    assert code_prefix('405') is None
+
+
+def test_direct_prefixes_come_from_the_codes():
+    matcher = CourseCodeMatcher(CODES + ['EEE202', 'MA101'])
+    assert matcher.prefixes == {'CSC', 'CSD', 'CSO', 'CSI', 'CSE', 'EEE', 'MA'}
+    assert matcher.match('Course: EEE 202') == ('EEE202', 8, 15, 'direct')
+    assert matcher.match('MA 101 and MA 102') == ('MA101', 0, 6, 'direct')
+    assert CourseCodeMatcher(CODES).match('Course: EEE 202') == ('EEE202', 8, 15, 'partial')
+    assert CourseCodeMatcher([]).find('Course: EEE 202') == 'EEE202'
+
+
+def test_reload_publishes_a_new_snapshot(tmp_path):
+    path = tmp_path / 'course_codes.csv'
+    path.write_text('code,title,department\nCSC208,Theory of Computation,CS\n')
+    catalogue = CourseCatalogue(str(path), check_interval=0)
+    old = catalogue.snapshot
+
+    path.write_text('code,title,department\nEEE202,Signals and Systems,EE\n')
+    os.utime(path, (old.mtime + 10, old.mtime + 10))
+    assert catalogue.match_course_code('Course: EEE 202') == ('EEE202', 8, 15, 'direct')
+    assert catalogue.title('EEE202') == 'Signals and Systems'
+    assert 'CSC208' not in catalogue and catalogue.codes_with_prefix('EE') == ['EEE202']
+
+    # Whoever still holds the old snapshot sees the old catalogue, whole
+    assert old.codes == ('CSC208',) and old.titles == {'CSC208': 'Theory of Computation'}
+    assert old.matcher.find('CSC208') == 'CSC208'
+    assert catalogue.version != f"{old.mtime:.6f}"
@@ -0,0 +1,181 @@
+import glob
+import os
+import re
+from datetime import datetime
+
+import pytest
+
+from exam_ocr.catalogue import CourseCatalogue
+from exam_ocr.extract import determine_academic_year, extract_fields, extract_year
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The course codes and parsers of the original single-file app, kept as the reference the
+# single-pass extractor must agree with
+
+LEGACY_COURSE_CODES = [
+    "CSI101", "CSI102", "CSC201", "CSC202", "CSC203", "CSC204", "CSC205", "CSC206",
+    "CSC207", "CSC208", "CSC209", "CSC210", "CSC211", "CSC301", "CSC302", "CSC303",
+    "CSC304", "CSC305", "CSC306", "CSC307", "CSC308", "CSC401", "CSC402", "CSC501",
+    "CSC502", "CSC503", "CSC504", "CSC505", "CSC506", "CSC507", "CSC508", "CSC509",
+    "CSC510", "CSC516", "CSC517", "CSC518", "CSC597", "CSC598", "CSC599", "CSS401",
+    "CSE201", "CSE202",
+    "CSD401", "CSD402", "CSD403", "CSD404", "CSD405", "CSD406", "CSD407", "CSD408",
+    "CSD409", "CSD410", "CSD501", "CSD502", "CSD503", "CSD504", "CSD505", "CSD506",
+    "CSD507", "CSD508", "CSD509", "CSD510", "CSD511", "CSD513", "CSD514", "CSD515",
+    "CSD516", "CSD517", "CSD518", "CSD519", "CSD520", "CSD521",
+    "CSO302", "CSO303", "CSO304", "CSO403", "CSO404", "CSO501", "CSO502", "CSO503",
+    "CSO504", "CSO505", "CSO506", "CSO507", "CSO508", "CSO509", "CSO801"
+]
+
+
+def legacy_detect_exam_type(text):
+    text = text.lower()
+    if any(term in text for term in ['end sem', 'end semester', 'end-sem', 'endsem']):
+        return 'End_Semester'
+    elif any(term in text for term in ['mid sem', 'mid semester', 'mid-sem', 'midsem']):
+        return 'Mid_Semester'
+    elif any(term in text for term in ['quiz', 'quizz']):
+        return 'Quiz'
+    return 'End_Semester'
+
+
+def legacy_detect_semester_type(text):
+    text = text.lower()
+    if any(term in text for term in ['winter sem', 'winter semester']):
+        return 'Winter'
+    elif any(term in text for term in ['summer sem', 'summer semester']):
+        return 'Summer'
+    elif any(term in text for term in ['monsoon sem', 'monsoon semester']):
+        return 'Monsoon'
+    return 'Winter'
+
+
+def legacy_extract_date(text):
+    date_patterns = [
+        r'Date:?\s*(\d{1,2})[\s-]*([A-Za-z]+)[\s-]*(\d{4})',
+        r'(\d{1,2})[-/](\d{1,2})[-/](\d{4})',
+        r'(\d{1,2})(?:st|nd|rd|th)?\s+([A-Za-z]+)\s+(\d{4})'
+    ]
+    for pattern in date_patterns:
+        for match in re.findall(pattern, text):
+            try:
+                if len(match[1]) <= 2:
+                    return datetime.strptime(f"{match[0]}/{match[1]}/{match[2]}", "%d/%m/%Y")
+                return datetime.strptime(f"{match[0]} {match[1]} {match[2]}", "%d %B %Y")
+            except ValueError:
+                continue
+    return None
+
+
+def legacy_find_course_code(text):
+    text = ' '.join(text.split())
+    for raw_code in re.findall(r'(?:CS[ODIE]|CSD|CSE)\s*\d{3}', text):
+        cleaned_code = ''.join(raw_code.split())
+        numeric_part = re.search(r'\d{3}', cleaned_code)
+        prefix = cleaned_code[:cleaned_code.index(numeric_part.group())]
+        if re.match(r'CS[0O]', prefix):
+            std_prefix = 'CSO'
+        elif re.match(r'CS[1I]', prefix):
+            std_prefix = 'CSI'
+        elif re.match(r'CSD', prefix):
+            std_prefix = 'CSD'
+        elif re.match(r'CSE', prefix):
+            std_prefix = 'CSE'
+        else:
+            std_prefix = 'CSC'
+        if std_prefix + numeric_part.group() in LEGACY_COURSE_CODES:
+            return std_prefix + numeric_part.group()
+    for code in LEGACY_COURSE_CODES:
+        dept_code, number_part = code[:3], code[3:]
+        for dept_var in [dept_code, dept_code.replace('S', '5'), dept_code.replace('S', '$'),
+                         dept_code.replace('O', '0'), dept_code.replace('I', '1'), dept_code.replace('C', 'G')]:
+            for num_var in [number_part, number_part.replace('0', 'O'), number_part.replace('1', 'I'),
+                            number_part.replace('1', 'l')]:
+                if dept_var + num_var in text:
+                    return code
+    potential_codes = re.findall(r'[A-Z]{2,3}\s*\d{3}', text)
+    if potential_codes:
+        return ''.join(potential_codes[0].split())
+    return None
+
+
+def legacy_details(text):
+    return (legacy_find_course_code(text), legacy_detect_exam_type(text),
+            legacy_detect_semester_type(text), legacy_extract_date(text))
+
+
+def fields_details(fields):
+    return tuple(fields[name]['value'] for name in ('course_code', 'exam_type', 'semester_type', 'date'))
+
+
+@pytest.fixture(scope='module')
+def catalogue(tmp_path_factory):
+    path = tmp_path_factory.mktemp('catalogue') / 'course_codes.csv'
+    path.write_text('code,title,department\n' + ''.join(f"{code},,\n" for code in LEGACY_COURSE_CODES))
+    return CourseCatalogue(str(path))
+
+
+CORPUS = sorted(glob.glob(os.path.join(SERVICE_DIR, 'uploads', '*.txt')) +
+                glob.glob(os.path.join(SERVICE_DIR, 'benchmark_samples', '*.txt')))
+
+
+@pytest.mark.parametrize('path', CORPUS, ids=os.path.basename)
+def test_corpus_matches_legacy_parsers(path, catalogue):
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert fields_details(extract_fields(text, catalogue)) == legacy_details(text)
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    'Quiz 2 of the MID SEMESTER exam, End-Sem next week',
+    'Monsoon Semester and winter sem both mentioned',
+    'Summer Semester 2021',
+    'Date: 31 February 2023, held on 12/05/2023',
+    'Date 5-March-2024 and 01/02/2024',
+    '13/13/2023 then 3rd June 2022 and 4 Junly 2022',
+    'Held 12/05/2023 or 11/05/2023',
+    'Dated 7th may 2023',
+    'Course: CSC 208 Theory of Computation',
+    'CSC201 and C5D405 later',
+    'CSO 302 or CS0 303',
+    'Paper code XYZ 123 only',
+    'Paper code\nCSD\n501 split over lines',
+])
+def test_examples_match_legacy_parsers(text, catalogue):
+    assert fields_details(extract_fields(text, catalogue)) == legacy_details(text)
+
+
+def test_academic_year_follows_date_and_semester(catalogue):
+    fields = extract_fields('Monsoon Semester\nDate: 21 November 2023', catalogue)
+    assert fields['acad_year']['value'] == determine_academic_year(datetime(2023, 11, 21), 'Monsoon') == '2023-24'
+    assert fields['year']['value'] == 2023
+
+    fields = extract_fields('Winter Semester\nDate: 2 March 2024', catalogue)
+    assert fields['acad_year']['value'] == '2023-24'
+
+
+def test_spans_point_at_the_source_text(catalogue):
+    text = 'CSC208 Mid Semester Exam, Winter Semester\nDate: 12 May 2023'
+    fields = extract_fields(text, catalogue)
+    for name, source in [('course_code', 'CSC208'), ('exam_type', 'Mid Sem'), ('semester_type', 'Winter Sem'),
+                         ('date', 'Date: 12 May 2023')]:
+        start, end = fields[name]['span']
+        assert text[start:end] == source
+
+
+def test_conflicting_keywords_lower_the_confidence(catalogue):
+    single = extract_fields('End Semester Examination', catalogue)['exam_type']
+    conflict = extract_fields('End Semester Examination (replaces Quiz 2)', catalogue)['exam_type']
+    default = extract_fields('Examination', catalogue)['exam_type']
+    assert single['value'] == conflict['value'] == default['value'] == 'End_Semester'
+    assert single['confidence'] > conflict['confidence'] > default['confidence']
+
+
+def test_year_without_a_date(catalogue):
+    fields = extract_fields('Question paper 2019, revised 2022, valid until 2099', catalogue)
+    assert fields['date']['value'] is None
+    assert fields['year']['value'] == 2022
+    assert extract_year('printed 2030', now=datetime(2029, 6, 1)) == 2030
+    assert extract_year('printed 2031', now=datetime(2029, 6, 1)) is None
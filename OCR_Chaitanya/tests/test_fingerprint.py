@@ -0,0 +1,145 @@
+import random
+import sqlite3
+
+import pytest
+
+from exam_ocr.fingerprint import (DuplicateIndex, MIN_SHINGLES, first_page, jaccard, minhash_signature, shingles,
+                                  similarity)
+from exam_ocr.text_store import FileTextStore
+
+from conftest import words
+
+DETAILS = {'course_code': 'CSC208', 'exam_type': 'Quiz', 'semester_type': 'Winter', 'acad_year': '2023-24'}
+TEXT_NAME = 'CSC208_Quiz_Winter_2023-24_ocr.txt'
+METADATA = {'course_code': 'CSC208', 'exam_type': 'Quiz', 'ocr_file': TEXT_NAME}
+
+
+def details(course_code):
+    return {**DETAILS, 'course_code': course_code}
+
+
+def misread(text, rate, seed=0):
+    """The text with about ``rate`` of its letters replaced, like another scan's OCR errors"""
+    rng = random.Random(seed)
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') if char.isalpha() and rng.random() < rate else char
+                   for char in text)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'), threshold=0.5)
+    index.add('CSC208_Quiz_Winter_2023-24_ocr.txt', 'page', words('paper', 200), METADATA)
+    return index
+
+
+def test_rescan_is_found(index):
+    match = index.find(misread(words('paper', 200), 0.01))
+    assert match['paper'] == 'CSC208_Quiz_Winter_2023-24_ocr.txt'
+    assert match['metadata'] == METADATA
+    assert match['similarity'] >= index.threshold
+
+
+def test_unrelated_and_heavily_misread_pages_are_not_duplicates(index):
+    assert index.find(words('other', 200)) is None
+    assert index.find(misread(words('paper', 200), 0.2)) is None
+
+
+def test_threshold_is_configurable(tmp_path):
+    text = misread(words('paper', 200), 0.03)
+    strict = DuplicateIndex(str(tmp_path / 'strict.db'), threshold=0.95)
+    strict.add('a_ocr.txt', 'page', words('paper', 200), {})
+    assert strict.find(text) is None
+    strict.threshold = 0.5
+    assert strict.find(text)['paper'] == 'a_ocr.txt'
+
+
+def test_kinds_are_not_compared_with_each_other(index):
+    assert index.find(words('paper', 200), kinds=('header',)) is None
+    assert index.find(words('paper', 200), kinds=('header', 'page'))['kind'] == 'page'
+
+
+def test_short_texts_are_not_fingerprinted(index):
+    short = 'CSC208 Quiz'
+    assert len(shingles(short)) < MIN_SHINGLES
+    assert minhash_signature(short) is None
+    assert not index.add('short_ocr.txt', 'page', short, {})
+    assert index.find(short) is None
+
+
+def test_signature_similarity_estimates_jaccard():
+    text = words('paper', 300)
+    for rate in (0.01, 0.05, 0.1):
+        other = misread(text, rate)
+        assert abs(similarity(minhash_signature(text), minhash_signature(other)) - jaccard(text, other)) < 0.15
+    assert jaccard(text, text) == 1.0
+    assert jaccard(text, '') == 0.0
+
+
+def test_backfill_indexes_first_pages(tmp_path):
+    store = FileTextStore(str(tmp_path))
+    store.put_pages('CSC208_Quiz_Winter_2023-24_ocr.txt', [words('paper', 200), words('paper 2', 200)])
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'))
+    assert index.backfill(store, [METADATA]) == 1
+    assert index.backfill(store, [METADATA]) == 0
+    assert index.find(words('paper', 200))['metadata'] == METADATA
+    assert first_page(store.get('CSC208_Quiz_Winter_2023-24_ocr.txt')).strip() == words('paper', 200)
+
+
+def test_backfill_refingerprints_changed_texts(tmp_path):
+    store = FileTextStore(str(tmp_path))
+    store.put_pages(TEXT_NAME, [words('paper', 200)], mtime=1000)
+    index = DuplicateIndex(str(tmp_path / 'fingerprints.db'))
+    assert index.backfill(store, [METADATA]) == 1
+
+    # The paper was re-OCR'd outside the app
+    store.put_pages(TEXT_NAME, [words('corrected', 200)], mtime=2000)
+    assert index.backfill(store, [METADATA]) == 1
+    assert index.backfill(store, [METADATA]) == 0
+    assert index.find(words('paper', 200)) is None
+    assert index.find(words('corrected', 200))['paper'] == TEXT_NAME
+
+    index.add(TEXT_NAME, 'page', words('corrected', 200), METADATA, store.mtime(TEXT_NAME))
+    assert index.backfill(store, [METADATA]) == 0
+
+
+def test_signatures_from_before_source_mtimes_are_refreshed(tmp_path):
+    path = str(tmp_path / 'fingerprints.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE signatures (id INTEGER PRIMARY KEY AUTOINCREMENT, paper TEXT NOT NULL, "
+                 "kind TEXT NOT NULL, signature BLOB NOT NULL, metadata TEXT NOT NULL, created_at REAL NOT NULL, "
+                 "UNIQUE (paper, kind))")
+    conn.commit()
+    conn.close()
+
+    store = FileTextStore(str(tmp_path))
+    store.put_pages(TEXT_NAME, [words('paper', 200)])
+    index = DuplicateIndex(path)
+    assert index.backfill(store, [METADATA]) == 1
+    assert index.backfill(store, [METADATA]) == 0
+
+
+def test_rescan_reuses_the_stored_text(service, upload):
+    pages = [words('cover'), words('questions'), words('last page')]
+    service.process_confirmed_pdf(upload('first.pdf', pages), details('CSC208'))
+
+    engine = service.ocr_engine
+    engine.calls.clear()
+    assert service.process_confirmed_pdf(upload('rescan.pdf', pages), details('CSC209')) == \
+        'CSC209_Quiz_Winter_2023-24_ocr.txt'
+    assert engine.calls == [1, 3]  # Page 1 to find the paper, the last page to confirm it
+    assert service.text_store.get('CSC209_Quiz_Winter_2023-24_ocr.txt') == service.text_store.get(TEXT_NAME)
+
+
+@pytest.mark.parametrize('pages', [
+    [words('cover'), words('other questions'), words('other last page')],  # Same cover and length
+    [words('cover'), words('other questions')]  # Same cover, fewer pages
+])
+def test_shared_cover_page_is_not_a_duplicate(service, upload, pages):
+    service.process_confirmed_pdf(upload('first.pdf', [words('cover'), words('questions'), words('last page')]),
+                                  details('CSC208'))
+
+    engine = service.ocr_engine
+    engine.calls.clear()
+    service.process_confirmed_pdf(upload('second.pdf', pages), details('CSC209'))
+    assert sorted(engine.calls) == list(range(1, len(pages) + 1))
+    assert service.text_store.get_page('CSC209_Quiz_Winter_2023-24_ocr.txt', 2) == pages[1]
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+from exam_ocr.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobWorkerPool
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'), priorities={'detect': 0, 'process': 1})
+
+
+def test_claim_takes_best_rank_then_oldest(queue):
+    first_process = queue.submit('process', {'n': 1})
+    other = queue.submit('reindex', {'n': 2})
+    second_process = queue.submit('process', {'n': 3})
+    detect = queue.submit('detect', {'n': 4})
+
+    assert queue.depth() == 4
+    assert [queue.claim()[0] for _ in range(4)] == [detect, first_process, second_process, other]
+    assert queue.claim() is None
+    assert queue.get(detect)['status'] == RUNNING
+
+
+def test_claim_returns_kind_and_payload(queue):
+    job_id = queue.submit('detect', {'pdf_path': '/tmp/a.pdf'})
+    assert queue.claim() == (job_id, 'detect', {'pdf_path': '/tmp/a.pdf'})
+
+
+def test_only_failed_jobs_can_be_retried(queue):
+    job_id = queue.submit('process', {})
+    assert not queue.retry(job_id)  # Still queued
+
+    queue.claim()
+    queue.fail(job_id, 'Tesseract crashed')
+    job = queue.get(job_id)
+    assert (job['status'], job['error']) == (FAILED, 'Tesseract crashed')
+
+    assert queue.retry(job_id)
+    job = queue.get(job_id)
+    assert (job['status'], job['error']) == (QUEUED, None)
+    assert queue.claim()[0] == job_id
+
+    queue.complete(job_id, {'ocr_file': 'x_ocr.txt'})
+    assert not queue.retry(job_id)
+    assert queue.get(job_id)['result'] == {'ocr_file': 'x_ocr.txt'}
+
+
+def test_recover_interrupted_requeues_running_jobs(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(path, lease_seconds=60)
+    running = queue.submit('process', {'pdf_path': 'a.pdf'})
+    done = queue.submit('process', {'pdf_path': 'b.pdf'})
+    queue.claim()
+    queue.claim()
+    queue.complete(done, {})
+    queue.set_progress(running, 3, 10)
+
+    # Another process starting its workers leaves a job with a live lease alone
+    other = JobQueue(path, lease_seconds=60)
+    assert other.recover_interrupted() == 0
+    assert other.claim() is None
+    assert other.get(running)['status'] == RUNNING
+
+    # Once the owner stops renewing the lease, the job is requeued
+    assert other.recover_interrupted(now=time.time() + 61) == 1
+    job = other.get(running)
+    assert job['status'] == QUEUED
+    assert job['progress'] == {'done': 3, 'total': 10}
+    assert other.get(done)['status'] == DONE
+    assert other.claim()[0] == running
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    queue = JobQueue(path, lease_seconds=60)
+    job_id = queue.submit('process', {})
+    queue.claim()
+    other = JobQueue(path, lease_seconds=60)
+
+    assert queue.heartbeat([job_id]) == []
+    assert other.heartbeat([job_id]) == [job_id]  # Not its job
+    assert other.recover_interrupted(now=time.time() + 30) == 0
+
+
+def test_result_of_a_lost_lease_is_not_stored(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    stalled = JobQueue(path, lease_seconds=60)
+    job_id = stalled.submit('process', {})
+    stalled.claim()
+
+    other = JobQueue(path, lease_seconds=60)
+    other.recover_interrupted(now=time.time() + 61)
+    assert other.claim()[0] == job_id
+    assert stalled.heartbeat([job_id]) == [job_id]
+    stalled.complete(job_id, {'ocr_file': 'stale'})
+    assert other.get(job_id)['status'] == RUNNING
+
+    other.complete(job_id, {'ocr_file': 'fresh'})
+    assert other.get(job_id)['result'] == {'ocr_file': 'fresh'}
+
+
+def test_jobs_from_before_leases_are_recovered(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE jobs (id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, "
+                 "payload TEXT NOT NULL, result TEXT, error TEXT, pages_done INTEGER NOT NULL DEFAULT 0, "
+                 "pages_total INTEGER, created_at REAL NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) "
+                 "VALUES ('old', 'process', 'running', '{}', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    queue = JobQueue(path)
+    assert queue.recover_interrupted() == 1
+    assert queue.claim() == ('old', 'process', {})
+
+
+def test_prune_drops_old_finished_jobs(queue):
+    finished = queue.submit('detect', {})
+    failed = queue.submit('detect', {})
+    pending = queue.submit('process', {})
+    queue.claim()
+    queue.claim()
+    queue.complete(finished, {})
+    queue.fail(failed, 'bad PDF')
+
+    assert queue.prune(max_age=3600) == 0
+    assert queue.prune(max_age=3600, now=time.time() + 7200) == 2
+    assert queue.get(finished) is None and queue.get(failed) is None
+    assert queue.get(pending)['status'] == QUEUED
+
+
+def test_active_payloads_cover_queued_and_running_jobs(queue):
+    queue.submit('process', {'pdf_path': 'a.pdf'})
+    queue.submit('process', {'pdf_path': 'b.pdf'})
+    finished = queue.submit('detect', {'pdf_path': 'c.pdf'})
+    assert queue.claim()[0] == finished
+    queue.complete(finished, {})
+    queue.claim()
+    assert sorted(payload['pdf_path'] for payload in queue.active_payloads()) == ['a.pdf', 'b.pdf']
+
+
+def test_worker_pool_runs_handlers(queue):
+    ok = queue.submit('detect', {'value': 2})
+    broken = queue.submit('process', {})
+    unknown = queue.submit('other', {})
+
+    def detect(payload, progress):
+        progress(1, 1)
+        return {'double': payload['value'] * 2}
+
+    def process(payload, progress):
+        raise ValueError('bad PDF')
+
+    pool = JobWorkerPool(queue, {'detect': detect, 'process': process})
+    while (job := queue.claim()) is not None:
+        pool.run_job(*job)
+
+    assert queue.get(ok)['result'] == {'double': 4}
+    assert queue.get(ok)['progress'] == {'done': 1, 'total': 1}
+    assert (queue.get(broken)['status'], queue.get(broken)['error']) == (FAILED, 'bad PDF')
+    assert queue.get(unknown)['error'] == 'Unknown job type: other'
+
+
+def test_worker_pool_renews_leases_of_running_jobs(queue):
+    job_id = queue.submit('process', {})
+    pool = JobWorkerPool(queue, {})
+    seen = []
+
+    def process(payload, progress):
+        pool.heartbeat()
+        seen.append(queue.heartbeat([job_id]))
+        return {}
+
+    pool.handlers['process'] = process
+    pool.run_job(*queue.claim())
+    assert seen == [[]]
+    assert queue.get(job_id)['status'] == DONE
+    assert queue.heartbeat([job_id]) == [job_id]  # Finished jobs hold no lease
+
+
+@pytest.mark.parametrize('fails', [False, True])
+def test_detect_job_removes_its_upload(service, upload, monkeypatch, fails):
+    pdf = upload('temp_x_scan.pdf', ['CSC208 Quiz'])
+
+    def detect(path, priority=None):
+        if fails:
+            raise RuntimeError('bad PDF')
+        return {'course_code': 'CSC208'}
+
+    monkeypatch.setattr(service, 'detect_document_details', detect)
+    monkeypatch.setattr('exam_ocr.service.detection_response', lambda details: details)
+    if fails:
+        with pytest.raises(RuntimeError):
+            service.run_detect_job({'pdf_path': pdf}, lambda done, total: None)
+    else:
+        assert service.run_detect_job({'pdf_path': pdf}, lambda done, total: None) == {'course_code': 'CSC208'}
+    assert not os.path.exists(pdf)
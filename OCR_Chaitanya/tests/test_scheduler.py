@@ -0,0 +1,81 @@
+import threading
+import time
+
+from exam_ocr.scheduler import BULK, INTERACTIVE, PriorityClass, PriorityScheduler
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def grant_order(scheduler, waiting):
+    """Queue ``waiting`` pages per class behind a busy bulk page, then return the classes in the order they start"""
+    order = [BULK]
+
+    def page(name):
+        scheduler.acquire(name)
+        order.append(name)
+        scheduler.release(name)
+
+    scheduler.acquire(BULK)  # Every worker is busy while the others queue
+    threads = [threading.Thread(target=page, args=(name,)) for name, count in waiting.items() for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: sum(c['waiting'] for c in scheduler.stats()['classes'].values()) == len(threads))
+    scheduler.release(BULK)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_backlogged_classes_share_workers_by_weight():
+    scheduler = PriorityScheduler(1, {INTERACTIVE: PriorityClass(weight=3), BULK: PriorityClass(weight=1)})
+    order = grant_order(scheduler, {INTERACTIVE: 12, BULK: 12})
+    for end in (4, 8, 12, 16):
+        assert order[:end].count(INTERACTIVE) == end * 3 // 4
+    assert order[16:] == [BULK] * 9
+
+
+def test_equal_weights_alternate():
+    scheduler = PriorityScheduler(1, {INTERACTIVE: PriorityClass(), BULK: PriorityClass()})
+    order = grant_order(scheduler, {INTERACTIVE: 4, BULK: 4})
+    for end in range(2, len(order) + 1, 2):
+        assert order[:end].count(INTERACTIVE) == end // 2
+
+
+def test_max_wait_starts_a_page_beside_busy_workers():
+    scheduler = PriorityScheduler(1, {INTERACTIVE: PriorityClass(weight=3, max_wait=0.05), BULK: PriorityClass()})
+    scheduler.acquire(BULK)
+    waited = scheduler.acquire(INTERACTIVE)
+    stats = scheduler.stats()
+    assert waited >= 0.05
+    assert stats['active'] == 2  # One above the capacity
+    assert stats['classes'][INTERACTIVE]['overdue'] == 1
+    scheduler.release(INTERACTIVE)
+    scheduler.release(BULK)
+    assert scheduler.stats()['active'] == 0
+
+
+def test_without_max_wait_a_page_waits_for_a_worker():
+    scheduler = PriorityScheduler(1, {INTERACTIVE: PriorityClass(), BULK: PriorityClass()})
+    scheduler.acquire(BULK)
+    started = threading.Event()
+    thread = threading.Thread(target=lambda: (scheduler.acquire(BULK), started.set()))
+    thread.start()
+    assert not started.wait(0.1)
+    scheduler.release(BULK)
+    assert started.wait(5)
+    thread.join()
+    assert scheduler.stats()['classes'][BULK]['overdue'] == 0
+
+
+def test_observer_receives_waits():
+    waits = []
+    scheduler = PriorityScheduler(2, {BULK: PriorityClass()}, observer=lambda name, seconds: waits.append(name))
+    with scheduler.slot(BULK):
+        pass
+    assert waits == [BULK]
+    assert scheduler.stats()['classes'][BULK]['started'] == 1
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+
+import pytest
+
+from exam_ocr.text_store import FileTextStore, TextArchive, format_pages, split_pages
+
+from conftest import words
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = TextArchive(str(tmp_path / 'texts'), str(tmp_path / 'texts.db'), segment_bytes=4096)
+    yield archive
+    archive.close()
+
+
+@pytest.fixture(params=['archive', 'files'])
+def store(request, tmp_path):
+    if request.param == 'files':
+        return FileTextStore(str(tmp_path))
+    return request.getfixturevalue('archive')
+
+
+def test_put_and_get(store):
+    store.put('raw_ocr_a.txt', 'first page text')
+    assert store.get('raw_ocr_a.txt') == 'first page text'
+    assert store.exists('raw_ocr_a.txt')
+    assert store.get('missing.txt') is None
+    assert not store.exists('missing.txt')
+
+    store.put('raw_ocr_a.txt', 'replaced')
+    assert store.get('raw_ocr_a.txt') == 'replaced'
+
+
+def test_pages(store):
+    pages = ['page one', 'page two', 'page three']
+    store.put_pages('CSC208_Quiz_Winter_2023-24_ocr.txt', pages)
+    assert store.get('CSC208_Quiz_Winter_2023-24_ocr.txt') == format_pages(pages)
+    assert split_pages(format_pages(pages)) == pages
+    assert store.get_page('CSC208_Quiz_Winter_2023-24_ocr.txt', 2) == 'page two'
+    assert store.get_page('CSC208_Quiz_Winter_2023-24_ocr.txt', 4) is None
+    assert store.page_count('CSC208_Quiz_Winter_2023-24_ocr.txt') == 3
+    assert store.page_count('missing_ocr.txt') is None
+
+
+def test_copy_rename_delete(store):
+    store.put_pages('temp_x_ocr.txt', ['one', 'two'])
+    store.put_pages('paper_ocr.txt', ['old'])
+    store.copy('temp_x_ocr.txt', 'copy_ocr.txt')
+    store.rename('temp_x_ocr.txt', 'paper_ocr.txt')
+    assert not store.exists('temp_x_ocr.txt')
+    assert store.get_page('paper_ocr.txt', 2) == store.get_page('copy_ocr.txt', 2) == 'two'
+    assert store.page_count('paper_ocr.txt') == 2
+    assert store.names('_ocr.txt') == ['copy_ocr.txt', 'paper_ocr.txt']
+
+    store.delete('copy_ocr.txt')
+    assert store.get('copy_ocr.txt') is None
+
+
+def test_archive_survives_reopening(archive):
+    archive.put_pages('paper_ocr.txt', ['one', 'two'])
+    archive.close()
+    reopened = TextArchive(archive.folder, archive.index_path)
+    assert reopened.get_page('paper_ocr.txt', 2) == 'two'
+    reopened.close()
+
+
+def test_compact_reclaims_dead_segments(archive):
+    # Random words barely compress, so a few texts fill several small segments
+    texts = {f"raw_ocr_{i}.txt": words(i, 400) for i in range(6)}
+    for name, text in texts.items():
+        archive.put(name, text)
+    for name in list(texts)[:4]:
+        archive.delete(name)
+        del texts[name]
+
+    before = archive.stats()
+    assert before['segments'] > 1
+    reclaimed = archive.compact()
+    after = archive.stats()
+    assert reclaimed > 0
+    assert after['bytes'] == before['bytes'] - reclaimed
+    assert after['live_bytes'] == before['live_bytes']
+    assert len(os.listdir(archive.folder)) == after['segments']
+    for name, text in texts.items():
+        assert archive.get(name) == text
+
+
+def test_compact_keeps_shared_copies(archive):
+    archive.put_pages('a_ocr.txt', [words(1, 400), words(2, 400)])
+    archive.copy('a_ocr.txt', 'b_ocr.txt')
+    archive.put('filler.txt', words(3, 400))
+    archive.delete('a_ocr.txt')
+    archive.compact(min_garbage=0.0)
+    assert archive.get_page('b_ocr.txt', 2) == words(2, 400)
+
+
+def test_compact_sweeps_only_orphan_segments(archive):
+    archive.put('raw_ocr_a.txt', words(1, 400))
+    stray = archive.segment_path(999)
+    with open(stray, 'wb') as f:
+        f.write(b'left by a crashed writer')
+
+    # A writer in another process creates its segment file while it holds the write lock
+    writer = sqlite3.connect(archive.index_path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO segments (id, size) VALUES (1000, 0)")
+    with open(archive.segment_path(1000), 'wb') as f:
+        f.write(b'not committed yet')
+    archive._conn.execute("PRAGMA busy_timeout = 100")
+    with pytest.raises(sqlite3.OperationalError, match='locked'):
+        archive.compact()
+    assert os.path.exists(archive.segment_path(1000))
+    writer.execute("COMMIT")
+    writer.close()
+
+    archive.compact()
+    assert not os.path.exists(stray)
+    assert os.path.exists(archive.segment_path(1000))
+    assert archive.get('raw_ocr_a.txt') == words(1, 400)
+
+
+def test_expire_by_age_and_prefix(archive):
+    archive.put('raw_ocr_old.txt', 'old', mtime=1000)
+    archive.put('temp_old_ocr.txt', 'staged', mtime=1000)
+    archive.put('raw_ocr_new.txt', 'new', mtime=5000)
+    archive.put('paper_ocr.txt', 'kept', mtime=1000)
+    assert archive.expire(('raw_ocr_', 'temp_'), max_age=100, now=5050) == 2
+    assert archive.names() == ['paper_ocr.txt', 'raw_ocr_new.txt']
+
+
+def test_expire_by_size_drops_oldest_first(archive):
+    sizes = []
+    for i in range(4):
+        live = archive.stats()['live_bytes']
+        archive.put(f"raw_ocr_{i}.txt", words(i, 100), mtime=1000 + i)
+        sizes.append(archive.stats()['live_bytes'] - live)
+    budget = sizes[3] + sizes[2]
+    assert archive.expire(('raw_ocr_',), max_age=10 ** 6, max_bytes=budget, now=2000) == 2
+    assert archive.names() == ['raw_ocr_2.txt', 'raw_ocr_3.txt']
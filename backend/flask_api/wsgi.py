@@ -0,0 +1,28 @@
+"""Production entry point for the metadata extraction API.
+
+    python wsgi.py                          # waitress on HOST:PORT (default 0.0.0.0:5001)
+    waitress-serve --port=5001 wsgi:app     # or any WSGI server pointed at wsgi:app
+
+Importing this module starts the background job workers and the upload
+sweeper, which `python app.py` only starts under the debug reloader.
+"""
+import logging
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, '..', '..', 'OCR_Chaitanya'))
+
+from exam_ocr.config import Config
+from exam_ocr.service import OCRService
+from exam_ocr.web import create_app
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+service = OCRService(Config(BASE_DIR))
+app = create_app(service=service)
+service.start_background()
+
+if __name__ == '__main__':
+    from exam_ocr.cli import serve_waitress
+    serve_waitress(app, service)
@@ -7,6 +7,93 @@ const config = require('../../config/config');
 // Flask API URL - this should be configured in your config file
 const FLASK_API_URL = config.flaskApiUrl || 'http://localhost:5001';
 
+// Async OCR jobs are polled until they finish or this deadline passes
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_TIMEOUT_MS = 5 * 60 * 1000;
+
+// Uploads turned away with 429/503 are retried after the Retry-After delay this many times
+const MAX_SUBMIT_ATTEMPTS = 4;
+const MAX_RETRY_AFTER_MS = 60 * 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Milliseconds to wait before retrying, from a Retry-After header (seconds)
+ * @param {Object} response - Axios response
+ * @returns {number}
+ */
+const retryAfterMs = (response) => {
+  const seconds = parseInt(response.headers['retry-after'], 10);
+  return Math.min(Number.isNaN(seconds) ? 5000 : seconds * 1000, MAX_RETRY_AFTER_MS);
+};
+
+/**
+ * Current load of the Flask API
+ * @returns {Promise<Object>} - The /health body; status is 'ok', 'busy', 'saturated' or 'down'
+ */
+exports.checkHealth = async () => {
+  try {
+    const response = await axios.get(`${FLASK_API_URL}/health`, {
+      timeout: 5000,
+      validateStatus: (status) => status === 200 || status === 503
+    });
+    return response.data;
+  } catch (error) {
+    return { status: 'down', error: error.message };
+  }
+};
+
+/**
+ * Upload a PDF, backing off while the Flask API is saturated
+ * @param {string} url - Endpoint to post to
+ * @param {string} filePath - Path to the PDF file
+ * @returns {Promise<Object>} - Axios response
+ */
+const postPdfWithBackoff = async (url, filePath) => {
+  for (let attempt = 1; ; attempt++) {
+    // The form wraps a read stream, so it is rebuilt for every attempt
+    const formData = new FormData();
+    formData.append('file', fs.createReadStream(filePath));
+    const response = await axios.post(url, formData, {
+      headers: {
+        ...formData.getHeaders(),
+      },
+      timeout: 30000, // 30 seconds timeout for the upload itself
+      validateStatus: (status) => status < 400 || status === 429 || status === 503
+    });
+    if (response.status !== 429 && response.status !== 503) {
+      return response;
+    }
+    if (attempt >= MAX_SUBMIT_ATTEMPTS) {
+      throw new Error(response.data.error || 'OCR service is busy');
+    }
+    const delay = retryAfterMs(response);
+    console.log(`OCR service busy (${response.status}), retrying in ${delay / 1000}s`);
+    await sleep(delay);
+  }
+};
+
+/**
+ * Poll an async OCR job until it is done or failed
+ * @param {string} jobId - Job ID returned by the Flask API
+ * @returns {Promise<Object>} - The job result
+ */
+const waitForJob = async (jobId) => {
+  const deadline = Date.now() + JOB_TIMEOUT_MS;
+  while (Date.now() < deadline) {
+    const { data: job } = await axios.get(`${FLASK_API_URL}/jobs/${jobId}`, { timeout: 10000 });
+    if (job.status === 'done') {
+      return job.result;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'OCR job failed');
+    }
+    console.log(`OCR job ${jobId} ${job.status}: ${job.progress.done}/${job.progress.total || '?'} pages`);
+    await sleep(JOB_POLL_INTERVAL_MS);
+  }
+  throw new Error(`OCR job ${jobId} did not finish in time`);
+};
+
 /**
  * Extract metadata from a PDF file using the Flask OCR API
  * @param {string} filePath - Path to the PDF file
@@ -16,31 +103,41 @@ exports.extractMetadataFromPDF = async (filePath) => {
   try {
     console.log(`Extracting metadata from PDF: ${filePath}`);
     
-    // Create form data
-    const formData = new FormData();
-    formData.append('file', fs.createReadStream(filePath));
+    // Wait out a saturated service instead of adding to its backlog
+    const health = await exports.checkHealth();
+    if (health.status === 'saturated') {
+      const delay = Math.min((health.ocr.retry_after || 5) * 1000, MAX_RETRY_AFTER_MS);
+      console.log(`OCR service saturated, waiting ${delay / 1000}s before uploading`);
+      await sleep(delay);
+    }
     
-    // Send the file to Flask API for metadata extraction
-    const response = await axios.post(`${FLASK_API_URL}/detect_details`, formData, {
-      headers: {
-        ...formData.getHeaders(),
-      },
-      timeout: 30000, // 30 seconds timeout for OCR processing
-    });
+    // Submit the file as an async OCR job; the upload returns immediately
+    const response = await postPdfWithBackoff(`${FLASK_API_URL}/detect_details?async=1`, filePath);
+    
+    // Services without job support answer synchronously
+    const result = response.data.job_id ? await waitForJob(response.data.job_id) : response.data;
     
-    console.log('Metadata extraction response:', response.data);
+    console.log('Metadata extraction response:', result);
     
-    if (!response.data.success) {
-      throw new Error(response.data.error || 'Failed to extract metadata');
+    if (!result.success) {
+      throw new Error(result.error || 'Failed to extract metadata');
     }
     
+    // The OCR service reports exam types as Mid_Semester, End_Semester or Quiz
+    const examTypeMap = {
+      'Mid_Semester': 'mid-semester',
+      'End_Semester': 'end-semester',
+      'Quiz': 'quiz'
+    };
+    
     // Map Flask API response to our application's format
     const metadata = {
-      courseCode: response.data.course_code || '',
-      subject: '', // Subject should be determined based on course code
-      examType: response.data.exam_type || 'other',
-      year: response.data.year || new Date().getFullYear(),
-      rawOcrText: response.data.raw_ocr_text || ''
+      courseCode: result.course_code || '',
+      subject: result.subject || '', // Course title from the course catalogue
+      examType: examTypeMap[result.exam_type] || 'other',
+      year: result.year || new Date().getFullYear(),
+      rawOcrText: result.raw_ocr_text || '',
+      duplicateOf: result.duplicate_of || null // Already processed paper this upload matches
     };
     
     console.log('Mapped metadata:', metadata);
@@ -53,7 +150,8 @@ exports.extractMetadataFromPDF = async (filePath) => {
       subject: '',
       examType: '',
       year: new Date().getFullYear(),
-      rawOcrText: ''
+      rawOcrText: '',
+      duplicateOf: null
     };
   }
 }; 
\ No newline at end of file
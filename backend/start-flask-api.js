@@ -28,8 +28,10 @@ function findPythonExecutable() {
   return 'python'; // Default to just 'python' and hope it works
 }
 
-// Path to the Flask API
-const flaskApiPath = path.join(__dirname, 'flask_api', 'app.py');
+// Path to the Flask API; production mode serves it with waitress instead of the dev server
+const productionMode = (process.env.FLASK_API_MODE || process.env.NODE_ENV) === 'production';
+const flaskApiPath = path.join(__dirname, 'flask_api', productionMode ? 'wsgi.py' : 'app.py');
+const flaskApiUrl = process.env.FLASK_API_URL || 'http://localhost:5001';
 
 // Check if virtual environment exists
 const venvPythonPath = path.join(__dirname, 'flask_api', 'venv', 'Scripts', 'python.exe');
@@ -51,6 +53,35 @@ flaskApi.on('error', (error) => {
 // Keep track of the API process
 let apiRunning = true;
 
+// Report when the API answers /health, or that it never came up
+const waitForHealth = async (attempts = 30) => {
+  const http = require('http');
+  for (let i = 0; i < attempts && apiRunning; i++) {
+    const health = await new Promise((resolve) => {
+      http.get(`${flaskApiUrl}/health`, (res) => {
+        let body = '';
+        res.on('data', (chunk) => { body += chunk; });
+        res.on('end', () => {
+          try {
+            resolve(JSON.parse(body));
+          } catch (error) {
+            resolve(null);
+          }
+        });
+      }).on('error', () => resolve(null));
+    });
+    if (health) {
+      console.log(`Flask API is up (${health.status}) at ${flaskApiUrl}`);
+      return;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+  if (apiRunning) {
+    console.error(`Flask API did not answer ${flaskApiUrl}/health`);
+  }
+};
+waitForHealth();
+
 flaskApi.on('close', (code) => {
   console.log(`Flask API process exited with code ${code}`);
   apiRunning = false;